@@ -1,130 +1,400 @@
 # app/agents/llm_agent.py
+import io
+import re
 import json
-from openai import OpenAI
+import string
+import hashlib
+import logging
+import mimetypes
+import unicodedata
+import functools
+import time
+import threading
+import atexit
+import random
+import asyncio
+import inspect
+import httpx
+import orjson
+from typing import List, Tuple, Dict, Any, AsyncIterator, Callable
+import openai
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient
 from app.core import config
-
-class LLMAgent:
-    def __init__(self):
-        if not config.OPENAI_API_KEY: raise ValueError("OPENAI_API_KEY is not set.")
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
-
-    def _get_json_response(self, system_prompt: str, user_prompt: str, max_retries: int = 3):
-        # Use GPT-5 with minimal reasoning for fast, instruction-following JSON generation
-        # GPT-5 is better at following instructions than GPT-4-turbo
-        combined_prompt = f"{system_prompt}\n\n{user_prompt}\n\nIMPORTANT: Return ONLY a valid JSON object, no other text. Ensure all JSON is properly formatted with correct commas, brackets, and quotes."
-
-        for attempt in range(max_retries):
-            try:
-                response = self.client.responses.create(
-                    model="gpt-5",
-                    input=combined_prompt,
-                    reasoning={"effort": "minimal"},  # Fast, instruction-following mode
-                    text={"verbosity": "low"}  # Concise output
-                )
-
-                # Try to parse the JSON
-                output_text = response.output_text.strip()
-
-                # Log the raw output for debugging
-                print(f"📝 Raw LLM output (attempt {attempt + 1}):")
-                print(output_text[:500] + "..." if len(output_text) > 500 else output_text)
-
-                # Attempt to parse
-                parsed_json = json.loads(output_text)
-                print(f"✅ Successfully parsed JSON on attempt {attempt + 1}")
-                return parsed_json
-
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON parsing error on attempt {attempt + 1}/{max_retries}: {str(e)}")
-                print(f"❌ Error at line {e.lineno}, column {e.colno}: {e.msg}")
-
-                # Show the problematic part of the JSON
-                if hasattr(response, 'output_text'):
-                    lines = response.output_text.split('\n')
-                    if e.lineno <= len(lines):
-                        print(f"❌ Problematic line: {lines[e.lineno - 1]}")
-
-                # If this was the last attempt, raise the error
-                if attempt == max_retries - 1:
-                    print(f"❌ Failed to get valid JSON after {max_retries} attempts")
-                    print(f"❌ Full output text:\n{response.output_text}")
-                    raise
-
-                # Otherwise, retry with a more explicit prompt
-                print(f"🔄 Retrying with enhanced JSON formatting instructions...")
-                combined_prompt = f"{system_prompt}\n\n{user_prompt}\n\nCRITICAL: Your previous response had a JSON syntax error at line {e.lineno}, column {e.colno}: {e.msg}\n\nReturn ONLY a valid JSON object with:\n- Proper commas between all key-value pairs\n- All strings properly quoted with double quotes\n- No trailing commas\n- Properly closed brackets and braces\n- No comments or extra text"
-
-            except Exception as e:
-                print(f"❌ Unexpected error on attempt {attempt + 1}/{max_retries}: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
-
-    def describe_uploaded_character(self, image_url: str) -> str:
-        """
-        Use GPT-4 Vision to analyze an uploaded character image and return a detailed description.
-        This description is used to create better prompts for character generation.
-        """
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Please describe what you see in this image in detail. Focus on the character's type (human/animal/creature), appearance, features, clothing, and pose."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": image_url
-                                }
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=300
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            print(f"❌ Error in describe_uploaded_character: {str(e)}")
-            print(f"❌ Error type: {type(e).__name__}")
-            raise
-
-    # ===== MULTI-AGENT SYSTEM =====
-
-    def create_story_summary(self, character_name: str, character_type: str, personality: str, themes: str, num_scenes: int) -> dict:
+from app.services.cache_service import cache_service
+from app.config.narration_examples import NARRATION_EXAMPLE_POOL
+
+try:
+    # SIMD base64 for image data URLs (drop-in for base64.b64encode)
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+logger = logging.getLogger(__name__)
+
+JSON_ONLY_INSTRUCTION = "IMPORTANT: Return ONLY a valid JSON object, no other text. Ensure all JSON is properly formatted with correct commas, brackets, and quotes."
+
+CHARACTER_DESCRIPTION_REQUEST = "Please describe what you see in this image in detail. Focus on the character's type (human/animal/creature), appearance, features, clothing, and pose."
+
+# Rough output budget used when estimating a request's token cost for the TPM limiter
+ESTIMATED_OUTPUT_TOKENS = 2000
+# Leading characters of a prompt that identify its static prefix for prompt_cache_key
+PROMPT_CACHE_PREFIX_CHARS = 1024
+# Korean narration length window (characters incl. spaces), enforced locally after generation
+NARRATION_MIN_CHARS = 23
+NARRATION_MAX_CHARS = 28
+NARRATION_TARGET_CHARS = 26
+# Redis counter (per quality model and narration rules version) of consecutive fresh narration outputs that passed the local check without repair
+NARRATION_COMPLIANCE_KEY_TMPL = "compliance:{model}:{version}:write_scene_narrations"
+# Reference lines picked from NARRATION_EXAMPLE_POOL per story
+NARRATION_REFERENCE_COUNT = 3
+# Extra attempts for a narration window that comes back without some of its scenes
+NARRATION_WINDOW_RETRIES = 1
+
+# Transient API errors (429/5xx/timeouts) are retried with exponential backoff + jitter
+MAX_API_RETRIES = 5
+RETRY_INITIAL_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+
+# Consecutive 429s before the circuit breaker opens, and how long it stays open (seconds)
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Connection pool shared by every OpenAI call (keep-alive + HTTP/2 multiplexing)
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=40, keepalive_expiry=60)
+# Fail fast on a dead connection, but leave room for long reasoning responses
+HTTP_TIMEOUT = httpx.Timeout(120.0, connect=5.0)
+
+_http_client = DefaultHttpxClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+atexit.register(_http_client.close)
+_openai_singleton = None
+
+
+def _shared_openai_client() -> OpenAI:
+    """Process-wide sync OpenAI client, so extra LLMAgent instances don't open new TLS sessions"""
+    global _openai_singleton
+    if _openai_singleton is None:
+        _openai_singleton = OpenAI(api_key=config.OPENAI_API_KEY, http_client=_http_client)
+    return _openai_singleton
+
+
+class TokenRateLimiter:
+    """
+    Leaky bucket that keeps estimated token usage under a tokens-per-minute budget
+    (same approach as the openai-cookbook api_request_parallel_processor).
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.tokens_per_minute = tokens_per_minute
+        self.available = float(tokens_per_minute)
+        self.last_update = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.tokens_per_minute,
+            self.available + (now - self.last_update) * self.tokens_per_minute / 60
+        )
+        self.last_update = now
+
+    async def acquire(self, tokens: int):
+        if not self.tokens_per_minute:
+            return
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            self._refill()
+            if self.available >= tokens:
+                self.available -= tokens
+                return
+            await asyncio.sleep((tokens - self.available) * 60 / self.tokens_per_minute)
+
+
+class CircuitOpenError(Exception):
+    """Raised while the OpenAI circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive rate-limit errors so callers fail fast instead of
+    hammering an exhausted quota. After `cooldown` seconds a single probe request is let through
+    (half-open): its success closes the breaker, a 429 re-opens it. A probe that never reports
+    back (cancelled, non-429 error) is replaced by a new one after another cooldown.
+    Shared by the event loop and the worker threads that run sync calls, hence the lock.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        if self.opened_at is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.opened_at is None:
+                return
+            if now - self.opened_at >= self.cooldown and (self.probe_at is None or now - self.probe_at >= self.cooldown):
+                self.probe_at = now
+                return
+        raise CircuitOpenError(f"OpenAI circuit breaker open after {self.threshold} consecutive rate limits")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_at = None
+
+    def record_rate_limit(self):
+        with self._lock:
+            self.failures += 1
+            if self.probe_at is not None:
+                # Failed probe: stay open for another cooldown
+                self.opened_at = time.monotonic()
+                self.probe_at = None
+                logger.error("OpenAI circuit breaker probe rate-limited, re-opened for %.0fs", self.cooldown)
+            elif self.failures >= self.threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                logger.error("OpenAI circuit breaker opened for %.0fs", self.cooldown)
+
+
+def _is_transient(e: Exception) -> bool:
+    if isinstance(e, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+class JsonArrayStreamParser:
+    """
+    Incrementally extracts complete objects from one array (e.g. "scene_blueprints")
+    of a JSON document that is still being streamed, so items can be used before the response ends.
+    """
+
+    def __init__(self, array_key: str):
+        self._marker = f'"{array_key}"'
+        self._buffer = ""
+        self._pos = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def feed(self, text: str) -> list:
+        """Add streamed text and return any array items that are now complete"""
+        self._buffer += text
+        items = []
+
+        if not self._in_array:
+            key_pos = self._buffer.find(self._marker)
+            if key_pos == -1:
+                return items
+            bracket_pos = self._buffer.find("[", key_pos + len(self._marker))
+            if bracket_pos == -1:
+                return items
+            self._in_array = True
+            self._pos = bracket_pos + 1
+
+        buffer = self._buffer
+        while self._pos < len(buffer) and not self._done:
+            ch = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0 and ch == "{":
+                    self._item_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    self._done = True  # closing bracket of the array itself
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._item_start is not None:
+                        items.append(orjson.loads(buffer[self._item_start:self._pos + 1]))
+                        self._item_start = None
+            self._pos += 1
+
+        return items
+
+
+class JsonCall:
+    """
+    State of one _get_json_response / a_get_json_response call: the prompt, the request,
+    its LLM cache key and the two retry budgets (JSON fix-ups and transient API errors).
+    The sync and async methods only differ in how they run the I/O steps around it.
+    """
+
+    def __init__(self, agent: "LLMAgent", system_prompt: str, user_prompt: str, max_retries: int, text_format: dict, store: bool, previous_response_id: str, model: str):
+        self.agent = agent
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.max_retries = max_retries
+        self.text_format = text_format
+        self.store = store
+        self.combined_prompt = f"{system_prompt}\n\n{user_prompt}" if text_format else f"{system_prompt}\n\n{user_prompt}\n\n{JSON_ONLY_INSTRUCTION}"
+        self.chain = {"model": model or agent.quality_model, "store": store, "previous_response_id": previous_response_id}
+        # Identical prompts (re-runs, retried workflows) are served from cache
+        self.cache_key = cache_service.make_key("llm", self.request())
+        self.json_attempt = 0
+        self.api_attempt = 0
+        self.output_text = ""
+
+    def request(self) -> dict:
+        return self.agent._json_request(self.combined_prompt, self.text_format, **self.chain)
+
+    def from_cache(self, cached):
+        """Return value for a cache entry, or None on a miss"""
+        if cached is None:
+            return None
+        logger.debug("LLM cache hit %s", self.cache_key)
+        return (cached["result"], cached["response_id"]) if self.store else cached
+
+    def parse(self, response) -> tuple:
+        """(return value, cache entry) for a response; raises json.JSONDecodeError on malformed output"""
+        self.output_text = response.output_text.strip()
+        parsed_json = self.agent._parse_json_output(self.output_text, self.json_attempt)
+        if self.store:
+            return (parsed_json, response.id), {"result": parsed_json, "response_id": response.id}
+        return parsed_json, parsed_json
+
+    def retry_delay(self, e: Exception):
         """
-        AGENT 0.5: Story Planner - Creates a complete story summary BEFORE breaking into scenes
-        This ensures story cohesion and prevents random elements from appearing
+        Seconds to wait before the next attempt after e (0 for a JSON fix-up with the stricter prompt),
+        or None if e should be raised
         """
-
-        # Determine story complexity based on scene count
-        if num_scenes <= 6:
-            complexity = "SHORT & SIMPLE"
-            detail_level = "Keep it very simple - straightforward beginning, middle, end with minimal complications"
-        elif num_scenes <= 10:
-            complexity = "MEDIUM DETAIL"
-            detail_level = "Include some challenges and development, but keep plot manageable"
-        else:  # 12-15 scenes
-            complexity = "MORE DETAILED"
-            detail_level = "Can include more plot points and character development, but still clear and followable"
-
-        system_prompt = f"""You are a children's story writer creating a complete story for a {num_scenes}-scene animated video.
-
-**CHARACTER:**
-- Name: {character_name}
-- Type: {character_type}
-- Personality: {personality}
-
-**STORY THEME/IDEA:** {themes}
-
-**STORY COMPLEXITY:** {complexity}
-{detail_level}
+        if isinstance(e, json.JSONDecodeError):
+            self.agent._log_json_error(e, self.output_text, self.json_attempt, self.max_retries)
+            # Last attempt (or schema mode, where this means truncated output): give up
+            if self.text_format or self.json_attempt == self.max_retries - 1:
+                return None
+            logger.info("Retrying with enhanced JSON formatting instructions")
+            self.combined_prompt = self.agent._json_retry_prompt(self.system_prompt, self.user_prompt, e)
+            self.json_attempt += 1
+            self.output_text = ""
+            return 0
+
+        delay = self.agent._retry_delay(e, self.api_attempt)
+        if delay is None:
+            return None
+        self.api_attempt += 1
+        logger.warning("Transient OpenAI error (attempt %d/%d), retrying in %.1fs: %s", self.api_attempt, MAX_API_RETRIES, delay, e)
+        return delay
+
+
+# ===== STRUCTURED OUTPUT SCHEMAS =====
+# Strict json_schema mode: the model can only emit JSON matching these shapes
+
+
+def json_schema_format(name: str, schema: dict) -> dict:
+    """Responses API text.format for strict structured output"""
+    return {"type": "json_schema", "name": name, "schema": schema, "strict": True}
+
+
+def _object(properties: dict) -> dict:
+    """Strict-mode object: every property required, no extras"""
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+
+STRING = {"type": "string"}
+STRING_LIST = {"type": "array", "items": STRING}
+INTEGER = {"type": "integer"}
+INTEGER_LIST = {"type": "array", "items": INTEGER}
+SCENE_TYPE = {"type": "string", "enum": ["character", "scenery"]}
+
+STORY_SUMMARY_SCHEMA = _object({
+    "story_summary": STRING,
+    "key_story_elements": _object({
+        "main_goal": STRING,
+        "main_challenge": STRING,
+        "resolution": STRING,
+        "lesson": STRING
+    }),
+    "locations_to_use": STRING_LIST,
+    "side_characters": {"type": "array", "items": _object({
+        "name_or_type": STRING,
+        "role": STRING,
+        "appears_when": STRING
+    })},
+    "story_flow": STRING
+})
+
+STORY_BLUEPRINT_SCHEMA = _object({
+    "story_summary": STRING,
+    "side_characters": {"type": "array", "items": _object({
+        "name": STRING,
+        "type": STRING,
+        "description": STRING
+    })},
+    "scene_blueprints": {"type": "array", "items": _object({
+        "scene_number": INTEGER,
+        "scene_type": SCENE_TYPE,
+        "what_happens": STRING,
+        "characters_in_scene": STRING_LIST
+    })}
+})
+
+# Field descriptions carry the hints the removed OUTPUT FORMAT blocks used to give
+NARRATION_SCHEMA = _object({
+    "story_title": {"type": "string", "description": "Short title in Korean"},
+    "scenes": {"type": "array", "items": _object({
+        "scene_number": INTEGER,
+        "scene_type": SCENE_TYPE,
+        "narration_text": {"type": "string", "description": "26-character Korean narration ending with a period"}
+    })}
+})
+
+VISUAL_BLUEPRINT_SCHEMA = _object({
+    "locations": {"type": "array", "items": _object({
+        "location_id": STRING,
+        "location_name": STRING,
+        "description": {"type": "string", "description": "Visual description following the guidelines"},
+        "appears_in_scenes": INTEGER_LIST
+    })},
+    "objects": {"type": "array", "items": _object({
+        "object_id": STRING,
+        "object_name": STRING,
+        "description": {"type": "string", "description": "Visual description following the guidelines"},
+        "appears_in_scenes": INTEGER_LIST
+    })},
+    "visual_notes": _object({
+        "time_of_day_progression": STRING,
+        "weather": STRING,
+        "color_palette": STRING,
+        "overall_mood": STRING
+    })
+})
+
+VISUAL_PROMPTS_SCHEMA = _object({
+    "image_prompts": {"type": "array", "items": _object({
+        "scene_number": INTEGER,
+        "scene_type": SCENE_TYPE,
+        "prompt": {"type": "string", "description": "Complete detailed prompt starting with the art style"}
+    })}
+})
+
+
+# ===== STATIC PROMPT PREFIXES =====
+# No per-request values here: keeping the long rule blocks byte-identical lets OpenAI prompt caching hit
+
+STORY_SUMMARY_RULES = """You are a children's story writer creating a complete story for a multi-scene animated video.
 
 **YOUR JOB:**
-Write a complete, cohesive children's story from beginning to end. This story will later be broken into {num_scenes} scenes.
+Write a complete, cohesive children's story from beginning to end. This story will later be broken into the number of scenes given in the story request below.
 
 **CRITICAL RULES:**
 
@@ -140,10 +410,10 @@ Write a complete, cohesive children's story from beginning to end. This story wi
    - Nothing should appear randomly or without setup
 
 3. **STORY LENGTH GUIDELINES:**
-   - **{num_scenes} scenes = {complexity}**
-   - 3-6 scenes: Very simple story (one clear problem → solution)
-   - 6-10 scenes: Medium story (problem → journey → solution)
-   - 12-15 scenes: More detailed (setup → multiple challenges → resolution)
+   - **Use the STORY COMPLEXITY given in the story request below**
+   - 3-6 scenes: Very simple story (one clear problem -> solution)
+   - 6-10 scenes: Medium story (problem -> journey -> solution)
+   - 12-15 scenes: More detailed (setup -> multiple challenges -> resolution)
    - Even with more scenes, keep each event simple and clear
 
 4. **LIMIT LOCATIONS**
@@ -162,8 +432,8 @@ Write a complete, cohesive children's story from beginning to end. This story wi
    **CRITICAL RULE: Every side character MUST have a visual introduction/encounter scene BEFORE they interact or speak.**
 
    **The Problem We're Solving:**
-   ❌ Characters appearing suddenly and speaking without the audience seeing them first
-   ❌ "Scene 10: Tom runs. Scene 11: The bird tells Tom..." ← WHO IS THIS BIRD?!
+   BAD: Characters appearing suddenly and speaking without the audience seeing them first
+   BAD: "Scene 10: Tom runs. Scene 11: The bird tells Tom..." <- WHO IS THIS BIRD?!
 
    **The Solution - Two-Scene Pattern:**
 
@@ -188,14 +458,14 @@ Write a complete, cohesive children's story from beginning to end. This story wi
    ```
    Scene 10: Tom runs around the room and notices a bird on the window ledge watching him
    Scene 11: The bird chirps urgently and tells Tom to prop the vase with a cushion
-   ← Bird was visually introduced first! ✅
+   <- Bird was visually introduced first! (OK)
    ```
 
    **WRONG Example:**
    ```
    Scene 10: Tom runs lightly around the room
    Scene 11: The bird urgently chirps and tells Tom to use a cushion
-   ← No visual introduction! Who is this bird?! ❌
+   <- No visual introduction! Who is this bird?! (BAD)
    ```
 
    **This Applies to ALL Side Characters:**
@@ -205,9 +475,9 @@ Write a complete, cohesive children's story from beginning to end. This story wi
    - Creates smooth, natural flow instead of jarring "who's that?" moments
 
 **Story-Based Approach:**
-   - A journey through a forest → may naturally encounter animals, travelers
-   - A story about family → may include mother, father as a package
-   - A solo adventure → may not need any side characters at all
+   - A journey through a forest -> may naturally encounter animals, travelers
+   - A story about family -> may include mother, father as a package
+   - A solo adventure -> may not need any side characters at all
    - Let the STORY determine who appears, not a formula
 
 6. **STORY STRUCTURE:**
@@ -218,24 +488,24 @@ Write a complete, cohesive children's story from beginning to end. This story wi
 7. **COHESION - CRITICAL:**
    - Everything connects logically with proper setup
    - **NEVER introduce elements suddenly without preparation:**
-     * New character appears → needs setup scene showing hints first
-     * New location appears → needs transition or mention beforehand
-     * New object appears → needs context or foreshadowing
+     * New character appears -> needs setup scene showing hints first
+     * New location appears -> needs transition or mention beforehand
+     * New object appears -> needs context or foreshadowing
    - Every scene flows naturally from the previous one
    - Clear cause and effect relationships
    - **Think: "Will the audience be confused by this sudden element?"**
 
 **OUTPUT FORMAT:**
 
-{{
+{
   "story_summary": "A complete 3-5 sentence summary of the entire story from beginning to end. Include: who the character is, what they want/need, what challenges they face, how they overcome it, and what they learn.",
 
-  "key_story_elements": {{
+  "key_story_elements": {
     "main_goal": "What the character wants or needs",
     "main_challenge": "The primary obstacle",
     "resolution": "How it's resolved",
     "lesson": "What the character learns"
-  }},
+  },
 
   "locations_to_use": [
     "Location 1 name and brief description",
@@ -243,19 +513,19 @@ Write a complete, cohesive children's story from beginning to end. This story wi
   ],
 
   "side_characters": [
-    {{
+    {
       "name_or_type": "Either a name (if natural) or type like 'Fox', 'Bird', 'Dog'",
       "role": "How they help the story",
       "appears_when": "Brief note on when they appear (beginning/middle/end)"
-    }}
+    }
   ],
 
   "story_flow": "A paragraph describing the complete story flow - what happens in order from start to finish"
-}}
+}
 
 **REMEMBER:**
 - This is a PLANNING stage - you're creating a roadmap for a cohesive story
-- Every element you include will need to fit into {num_scenes} scenes
+- Every element you include will need to fit into the requested number of scenes
 - **Side characters depend on the story** - some stories need them, some don't
 - **Technical limit:** Maximum 4 total characters in any single scene
 - **CRITICAL: Every side character needs a visual introduction scene BEFORE they interact**
@@ -266,55 +536,18 @@ Write a complete, cohesive children's story from beginning to end. This story wi
 - Some characters come as a package (e.g., mother + father together)
 """
 
-        user_prompt = f"Create a complete story plan for a {num_scenes}-scene children's story about {character_name} (a {character_type}) with the theme: {themes}"
-
-        return self._get_json_response(system_prompt, user_prompt)
-
-    def create_story_blueprint(self, character_name: str, character_type: str, character_prompt: str, personality: str, themes: str, num_scenes: int, story_summary: dict = None, language: str = "English") -> dict:
-        """
-        AGENT 1: Story Director - Creates detailed scene-by-scene story breakdown
-        This is the MOST IMPORTANT agent - it creates the foundation for all others
-        """
-        character_visual_context = f"\n- Visual Details: {character_prompt}" if character_prompt else ""
-
-        # Include story summary if provided (from Agent 0.5)
-        story_context = ""
-        if story_summary:
-            import json
-            story_context = f"""
-**COMPLETE STORY PLAN (from Story Planner):**
-
-{json.dumps(story_summary, indent=2, ensure_ascii=False)}
-
-**YOUR JOB:** Break this planned story into exactly {num_scenes} scenes. Follow the story plan precisely - don't add random elements or characters not in the plan.
-"""
-        else:
-            story_context = "**YOUR JOB:** Create an original story and break it into scenes."
-
-        system_prompt = f"""You are creating a {num_scenes}-scene story blueprint for a children's animated video.
-
-**CHARACTER:**
-- Name: {character_name}
-- Type: {character_type}{character_visual_context}
-- Personality: {personality}
-
-**STORY THEME:** {themes}
-
-{story_context}
+STORY_BLUEPRINT_RULES = """You are creating a scene-by-scene story blueprint for a children's animated video.
+The character, theme, story plan and number of scenes are given in the STORY REQUEST at the end.
 
-═══════════════════════════════════════════════════════════════
-CRITICAL #1: UNDERSTANDING "STORY THEME"
-═══════════════════════════════════════════════════════════════
+### CRITICAL #1: UNDERSTANDING "STORY THEME"
 
 **IF you see "User's story idea:" - That's the EXACT plot they want. Build your ENTIRE story around it.**
 **IF you only see "Generic theme:" - Create an original story using those themes.**
 
 Example: "User's story idea: chef learning grandmother's recipe | Generic theme: family"
-→ Story MUST be about: chef + grandmother + learning recipe (NOT just a generic family story)
+-> Story MUST be about: chef + grandmother + learning recipe (NOT just a generic family story)
 
-═══════════════════════════════════════════════════════════════
-CRITICAL #2: SCENE LENGTH (15-20 WORDS)
-═══════════════════════════════════════════════════════════════
+### CRITICAL #2: SCENE LENGTH (15-20 WORDS)
 
 **WHY THIS MATTERS:**
 Your scene descriptions will be converted to 26-27 Korean characters for narration.
@@ -328,52 +561,50 @@ If your scenes are too long/complex, the narration will be vague or incomplete.
 - **Use COMMON, EASY words** that translate easily to Korean
 
 **VOCABULARY GUIDELINES:**
-✅ Use simple verbs children understand
-✅ Use common, everyday words
-✅ Keep descriptions straightforward and clear
-✅ Avoid literary or poetic language
+OK: Use simple verbs children understand
+OK: Use common, everyday words
+OK: Keep descriptions straightforward and clear
+OK: Avoid literary or poetic language
 
-❌ Avoid sophisticated vocabulary
-❌ Avoid complex descriptive phrases
-❌ Avoid multiple adverbs and adjectives in one sentence
-❌ Avoid overly detailed actions
+BAD: Avoid sophisticated vocabulary
+BAD: Avoid complex descriptive phrases
+BAD: Avoid multiple adverbs and adjectives in one sentence
+BAD: Avoid overly detailed actions
 
 **WHAT TO INCLUDE:**
-✅ WHO does WHAT (always)
-✅ WHERE (when location changes)
-✅ Main action or event
-✅ Enough detail for story flow and connection between scenes
+OK: WHO does WHAT (always)
+OK: WHERE (when location changes)
+OK: Main action or event
+OK: Enough detail for story flow and connection between scenes
 
 **WHAT TO REMOVE:**
-❌ Multiple complex actions in one scene
-❌ Overly detailed descriptions
-❌ Poetic or flowery language
-❌ Unnecessary adverbs that add complexity
+BAD: Multiple complex actions in one scene
+BAD: Overly detailed descriptions
+BAD: Poetic or flowery language
+BAD: Unnecessary adverbs that add complexity
 
 **EXAMPLES:**
 
-❌ TOO COMPLEX: Uses multiple fancy adverbs and sophisticated verbs that make translation difficult
-→ Problem: Won't fit naturally in Korean narration
+BAD: TOO COMPLEX: Uses multiple fancy adverbs and sophisticated verbs that make translation difficult
+-> Problem: Won't fit naturally in Korean narration
 
-✅ SIMPLE: Uses basic verbs and clear descriptions
-→ Easy to translate and fits Korean character limits
+OK: SIMPLE: Uses basic verbs and clear descriptions
+-> Easy to translate and fits Korean character limits
 
-❌ TOO POETIC: Uses flowery, literary descriptions with many adjectives
-→ Problem: Overly descriptive for children's story
+BAD: TOO POETIC: Uses flowery, literary descriptions with many adjectives
+-> Problem: Overly descriptive for children's story
 
-✅ SIMPLE: Uses straightforward descriptions
-→ Clear and age-appropriate
+OK: SIMPLE: Uses straightforward descriptions
+-> Clear and age-appropriate
 
-═══════════════════════════════════════════════════════════════
-CRITICAL #3: STORY STRUCTURE
-═══════════════════════════════════════════════════════════════
+### CRITICAL #3: STORY STRUCTURE
 
 **SCENE 1 FORMAT (MANDATORY):**
-"There was a [type] named {character_name} who [trait/habit] in/at [location] and [goal]"
+"There was a [type] named [main character name] who [trait/habit] in/at [location] and [goal]"
 
 Must include:
 - Character type (rabbit, chef, boy, etc.)
-- Character name ({character_name})
+- Character name (the main character's name)
 - Where they live/work
 - What they want (their goal)
 
@@ -390,20 +621,20 @@ Examples:
 - Scene 2: "Ben packs his bag at dawn and sets off on the forest trail toward the falls" (17 words)
 
 **MIDDLE (Most scenes, ~60% of story):**
-Create 2-4 challenges/obstacles based on {num_scenes}:
+Create 2-4 challenges/obstacles based on the number of scenes:
 - For 6 scenes: 2-3 challenges in scenes 3-5
 - For 9 scenes: 3-4 challenges in scenes 3-7
 - For 12 scenes: 4-5 challenges in scenes 3-10
 
 Each challenge must be:
-✅ SPECIFIC and concrete (not vague)
-✅ Related to achieving the goal
-✅ An obstacle that tests the character
+OK: SPECIFIC and concrete (not vague)
+OK: Related to achieving the goal
+OK: An obstacle that tests the character
 
 Challenge examples:
-- ✅ "Ben reaches a wide river with no bridge and must find a way across" (15 words)
-- ✅ "Ben encounters heavy fog and loses sight of the mountain path ahead" (13 words)
-- ❌ "Ben faces difficulties" (too vague - what difficulties?)
+- OK: "Ben reaches a wide river with no bridge and must find a way across" (15 words)
+- OK: "Ben encounters heavy fog and loses sight of the mountain path ahead" (13 words)
+- BAD: "Ben faces difficulties" (too vague - what difficulties?)
 
 **END (Final 1-2 scenes, ~20% of story):**
 - Second-to-last scene: Character overcomes final obstacle / achieves goal
@@ -413,9 +644,7 @@ Ending examples:
 - "Ben and Mira reach Whispering Falls and see the beautiful cascade together" (12 words)
 - "Ben realizes having a friend made the dangerous journey safer and more enjoyable" (13 words)
 
-═══════════════════════════════════════════════════════════════
-CRITICAL #4: SIDE CHARACTERS (3-STEP INTRODUCTION)
-═══════════════════════════════════════════════════════════════
+### CRITICAL #4: SIDE CHARACTERS (3-STEP INTRODUCTION)
 
 **SIDE CHARACTERS - Natural Integration:**
 
@@ -442,8 +671,8 @@ Side characters may or may not be needed - let the story determine this naturall
   * "The bird chirps and tells Tom to use the cushion"
   * "The fox offers to show Ben the shortcut"
 
-**❌ WRONG:** Side character suddenly speaks with no prior visual introduction
-**✅ CORRECT:** Side character is seen first, then interacts in next scene(s)
+**WRONG:** Side character suddenly speaks with no prior visual introduction
+**CORRECT:** Side character is seen first, then interacts in next scene(s)
 
 **Naming Guidelines:**
 - **Use descriptive terms when names aren't needed**: "a fox", "an owl", "a dog", "a bird"
@@ -455,52 +684,52 @@ Side characters may or may not be needed - let the story determine this naturall
 
 **Examples of Natural Handling:**
 
-✅ **Without name (simple encounter):**
+OK: **Without name (simple encounter):**
 "Ben walks down the path and sees a dog in the bushes"
-→ Later: "The dog barks and runs ahead"
-→ characters_in_scene: ["Dog"] (use generic "Dog" as identifier)
+-> Later: "The dog barks and runs ahead"
+-> characters_in_scene: ["Dog"] (use generic "Dog" as identifier)
 
-✅ **With name (if natural):**
+OK: **With name (if natural):**
 "An old owl appears and calls itself Oliver"
-→ Later: "Oliver gives Ben advice about the journey"
-→ characters_in_scene: ["Oliver"]
+-> Later: "Oliver gives Ben advice about the journey"
+-> characters_in_scene: ["Oliver"]
 
-✅ **Descriptive only (brief role):**
+OK: **Descriptive only (brief role):**
 "A bird chirps urgently from the window"
-→ characters_in_scene: ["Bird"]
+-> characters_in_scene: ["Bird"]
 
 **CRITICAL - WHEN TO INCLUDE IN characters_in_scene:**
 
 The rule is simple: **Include ALL characters PHYSICALLY PRESENT in the scene - both main character AND side characters.**
 
-✅ Include {character_name} (main character) if present
-✅ Include side characters from their FIRST appearance (even if no name mentioned yet)
-✅ Use actual character names in the array
-✅ Include in EVERY scene where they appear
-⚠️ **MAXIMUM 4 characters total in any scene** (technical limitation)
+OK: Include the main character (by name) if present
+OK: Include side characters from their FIRST appearance (even if no name mentioned yet)
+OK: Use actual character names in the array
+OK: Include in EVERY scene where they appear
+WARNING: **MAXIMUM 4 characters total in any scene** (technical limitation)
 
 **Note on "package" characters:**
 - Some characters naturally appear together (e.g., "Mother" and "Father")
 - Count each as a separate character in the array
 - Still must respect 4-character maximum
-- Example: ["{character_name}", "Mother", "Father"] = 3 characters ✅
+- Example: ["[main character name]", "Mother", "Father"] = 3 characters (OK)
 
 **Examples:**
 
 Scene with only main character:
-→ characters_in_scene: ["{character_name}"]
+-> characters_in_scene: ["[main character name]"]
 
 Scene with main character + side character (no name):
 "Ben walks through the forest and encounters a fox"
-→ characters_in_scene: ["{character_name}", "Fox"]
+-> characters_in_scene: ["[main character name]", "Fox"]
 
 Scene with main character + named side character:
 "The owl introduces itself as Oliver and offers wisdom"
-→ characters_in_scene: ["{character_name}", "Oliver"]
+-> characters_in_scene: ["[main character name]", "Oliver"]
 
 Scene with ONLY side character (rare but allowed):
 "A wise owl watches over the forest alone"
-→ characters_in_scene: ["Owl"]  ← Main character not present!
+-> characters_in_scene: ["Owl"]  <- Main character not present!
 
 **Think of it this way:**
 - "what_happens" = what the STORY says (may use "the fox", "a bird", or names like "Oliver")
@@ -514,7 +743,7 @@ Scene with ONLY side character (rare but allowed):
 
 **CRITICAL - HOW TO DESCRIBE SIDE CHARACTERS:**
 
-❌ NEVER use generic "human" - be SPECIFIC about what type of person/animal they are!
+BAD: NEVER use generic "human" - be SPECIFIC about what type of person/animal they are!
 
 **For human characters, specify:**
 - Age/role: "young girl", "elderly man", "teenage boy", "wise woman", "kind shopkeeper"
@@ -525,169 +754,113 @@ Scene with ONLY side character (rare but allowed):
 - NOT just: "an animal", "a creature"
 
 **Examples:**
-✅ GOOD: "Ben meets a young girl wearing a red scarf on the trail"
-✅ GOOD: "A wise old owl perches on a branch and calls out to Luna"
-✅ GOOD: "An elderly shopkeeper shows Milo an ancient map"
+GOOD: "Ben meets a young girl wearing a red scarf on the trail"
+GOOD: "A wise old owl perches on a branch and calls out to Luna"
+GOOD: "An elderly shopkeeper shows Milo an ancient map"
 
-❌ BAD: "Ben meets a human on the trail" (too generic!)
-❌ BAD: "An animal appears in the tree" (what kind of animal?)
-❌ BAD: "Someone shows Milo a map" (who? what type of person?)
+BAD: "Ben meets a human on the trail" (too generic!)
+BAD: "An animal appears in the tree" (what kind of animal?)
+BAD: "Someone shows Milo a map" (who? what type of person?)
 
-═══════════════════════════════════════════════════════════════
-CRITICAL #5: SCENE TYPES
-═══════════════════════════════════════════════════════════════
+### CRITICAL #5: SCENE TYPES
 
 **ONLY TWO VALID VALUES:**
 
 1. **"character"** - One or more characters appear in the scene
-   → Can be: main character only, side character(s) only, or main + side characters together
-   → Use this for MOST scenes
+   -> Can be: main character only, side character(s) only, or main + side characters together
+   -> Use this for MOST scenes
 
 2. **"scenery"** - Wide environment shot, NO characters visible
-   → Used for establishing locations, transitions, atmosphere
-   → MINIMUM scenery scenes required:
-     * 6 scenes total → at least 1 scenery scene
-     * 9 scenes total → at least 1 scenery scene
-     * 12 scenes total → at least 2 scenery scenes
-     * 15 scenes total → at least 3 scenery scenes
+   -> Used for establishing locations, transitions, atmosphere
+   -> MINIMUM scenery scenes required:
+     * 6 scenes total -> at least 1 scenery scene
+     * 9 scenes total -> at least 1 scenery scene
+     * 12 scenes total -> at least 2 scenery scenes
+     * 15 scenes total -> at least 3 scenery scenes
 
 **FORBIDDEN VALUES:**
-❌ "main_character", "setup", "challenge", "climax", "resolution", "introduction", "conclusion"
-→ These describe story structure, NOT scene types! Use "character" instead of "main_character"
+BAD: "main_character", "setup", "challenge", "climax", "resolution", "introduction", "conclusion"
+-> These describe story structure, NOT scene types! Use "character" instead of "main_character"
 
-═══════════════════════════════════════════════════════════════
-EXAMPLE STORY (6 SCENES)
-═══════════════════════════════════════════════════════════════
+### EXAMPLE STORY (6 SCENES)
 
 Character: Ben (kind boy)
 Theme: User's story idea - boy searching for legendary Whispering Falls
 Num scenes: 6
 
 **Scene 1 (20 words):** "There was a kind boy named Ben who lived in Pine Valley and dreamed of finding the legendary Whispering Falls"
-→ Has: character intro, location, concrete goal
-→ Scene type: "character"
-→ characters_in_scene: ["Ben"]
+-> Has: character intro, location, concrete goal
+-> Scene type: "character"
+-> characters_in_scene: ["Ben"]
 
 **Scene 2 (17 words):** "Ben packs his bag at dawn and begins hiking up the forest trail toward the falls"
-→ Has: action starts, connection to Scene 1
-→ Scene type: "character"
-→ characters_in_scene: ["Ben"]
+-> Has: action starts, connection to Scene 1
+-> Scene type: "character"
+-> characters_in_scene: ["Ben"]
 
 **Scene 3 (18 words):** "Ben meets a cloaked traveler on the misty forest path who seems to know the area well"
-→ Has: first challenge/helper appears (NO NAME yet - step 1)
-→ Scene type: "character"
-→ characters_in_scene: ["Ben", "Mira"]  ← CRITICAL: Include BOTH even though Mira's name not used yet!
+-> Has: first challenge/helper appears (NO NAME yet - step 1)
+-> Scene type: "character"
+-> characters_in_scene: ["Ben", "Mira"]  <- CRITICAL: Include BOTH even though Mira's name not used yet!
 
 **Scene 4 (16 words):** "The traveler introduces himself as Mira and shows Ben a shortcut through the rocky terrain"
-→ Has: name revealed (step 2), helper offers aid
-→ Scene type: "character"
-→ characters_in_scene: ["Ben", "Mira"]
+-> Has: name revealed (step 2), helper offers aid
+-> Scene type: "character"
+-> characters_in_scene: ["Ben", "Mira"]
 
 **Scene 5 (17 words):** "Ben and Mira reach the waterfall together and Ben sees the beautiful cascade for the first time"
-→ Has: goal achieved, teamwork
-→ Scene type: "character"
-→ characters_in_scene: ["Ben", "Mira"]
+-> Has: goal achieved, teamwork
+-> Scene type: "character"
+-> characters_in_scene: ["Ben", "Mira"]
 
 **Scene 6 (18 words):** "Ben thanks Mira and realizes that having a friend made the journey safer and more enjoyable than alone"
-→ Has: lesson learned (friendship/companionship)
-→ Scene type: "character"
-→ characters_in_scene: ["Ben", "Mira"]
+-> Has: lesson learned (friendship/companionship)
+-> Scene type: "character"
+-> characters_in_scene: ["Ben", "Mira"]
 
 **Why this works:**
-✅ All scenes 16-20 words
-✅ Scene 1 follows mandatory format
-✅ Clear goal in Scene 1 (find Whispering Falls)
-✅ Side character follows 3-step rule (describe → name → use)
-✅ **Side character included in array from Scene 3 onwards** (even when name not used!)
-✅ Natural flow - each scene leads to next
-✅ Satisfying ending with lesson learned
-
-═══════════════════════════════════════════════════════════════
-OUTPUT FORMAT
-═══════════════════════════════════════════════════════════════
+OK: All scenes 16-20 words
+OK: Scene 1 follows mandatory format
+OK: Clear goal in Scene 1 (find Whispering Falls)
+OK: Side character follows 3-step rule (describe -> name -> use)
+OK: **Side character included in array from Scene 3 onwards** (even when name not used!)
+OK: Natural flow - each scene leads to next
+OK: Satisfying ending with lesson learned
 
-{{
+### OUTPUT FORMAT
+
+{
   "story_summary": "One sentence summary",
   "side_characters": [
-    {{"name": "Character name", "type": "type", "description": "visual details"}}
+    {"name": "Character name", "type": "type", "description": "visual details"}
   ],
   "scene_blueprints": [
-    {{
+    {
       "scene_number": 1,
       "scene_type": "character",
       "what_happens": "15-20 word description",
       "characters_in_scene": []
-    }}
+    }
   ]
-}}
-
-═══════════════════════════════════════════════════════════════
-CHECKLIST BEFORE SUBMITTING
-═══════════════════════════════════════════════════════════════
-
-☐ Scene 1: Starts with "There was a [type] named {character_name}..."?
-☐ Scene 1: Includes location AND concrete goal?
-☐ Every scene: 15-20 words? (COUNT THEM!)
-☐ User's story idea: If provided, did I build ENTIRE story around it?
-☐ Side characters: Follow 3-step rule? Appear in 2-3+ scenes?
-☐ **Side characters: Included in characters_in_scene array for EVERY scene they appear (even Step 1)?**
-☐ **Side characters: Described specifically (NOT "human" or "animal" - use "young girl", "wise owl", etc.)?**
-☐ Scene types: Only "character" or "scenery"?
-☐ **Scenery scenes: Have minimum required (6→1, 9→1, 12→2, 15→3)?**
-☐ Story flow: Does each scene lead naturally to the next?
-☐ Ending: Goal resolved + lesson learned?
-
-**NOW:** Create your {num_scenes}-scene story following ALL requirements above.
-"""
-
-        user_prompt = f"""Create a {num_scenes}-scene story for {character_name} the {character_type}.
-
-**CHARACTER INFO:**
-- Name: {character_name}
-- Type: {character_type}
-- Personality: {personality}
-
-**STORY DIRECTION:** {themes}
-
-**LANGUAGE:** {language}
-
-**YOUR MISSION:**
-Follow the detailed instructions in the system prompt EXACTLY.
-
-**CRITICAL REMINDERS:**
-1. If "User's story idea" appears in Story Direction → that IS the plot!
-2. Scene 1 MUST start: "There was a [type] named {character_name} who..."
-3. Every scene: 15-18 words (COUNT THEM!)
-4. **USE SIMPLE, KID-FRIENDLY WORDS** - This is a children's book!
-5. Avoid sophisticated or literary vocabulary
-6. Keep scenes simple - ONE action, not multiple complicated things happening
-7. Side character visual introduction: Must have bridge scene BEFORE they interact
-8. Natural flow: NO gaps between scenes
-9. Scene type: ONLY "character" or "scenery" (use these exact values!)
-10. **Scenery scenes: Minimum required - 6 scenes→1 scenery, 9→1, 12→2, 15→3**
-11. Validate with checklist before submitting!
-
-**REMEMBER:** Your scenes will be converted to 26-27 character Korean narration. Simple English makes translation easier!
-
-Create exactly {num_scenes} scenes following ALL requirements.
+}
+
+### CHECKLIST BEFORE SUBMITTING
+
+- [ ] Scene 1: Starts with "There was a [type] named [main character name]..."?
+- [ ] Scene 1: Includes location AND concrete goal?
+- [ ] Every scene: 15-20 words? (COUNT THEM!)
+- [ ] User's story idea: If provided, did I build ENTIRE story around it?
+- [ ] Side characters: Follow 3-step rule? Appear in 2-3+ scenes?
+- [ ] **Side characters: Included in characters_in_scene array for EVERY scene they appear (even Step 1)?**
+- [ ] **Side characters: Described specifically (NOT "human" or "animal" - use "young girl", "wise owl", etc.)?**
+- [ ] Scene types: Only "character" or "scenery"?
+- [ ] **Scenery scenes: Have minimum required (6->1, 9->1, 12->2, 15->3)?**
+- [ ] Story flow: Does each scene lead naturally to the next?
+- [ ] Ending: Goal resolved + lesson learned?
 """
-        return self._get_json_response(system_prompt, user_prompt)
-
-    def write_scene_narrations(self, blueprint: dict, character_name: str, character_type: str, character_prompt: str, personality: str, language: str = "Korean") -> dict:
-        """
-        AGENT 2: Script Writer - Converts story scenes into TTS-ready narration
-        Takes the "what_happens" from Agent 1 and turns it into spoken storytelling
-
-        THIS IS A CRITICAL AGENT - The narration is the ONLY way listeners understand the story!
-        """
-        character_visual_context = f"\n- Visual Details: {character_prompt}" if character_prompt else ""
 
-        system_prompt = f"""You are creating Korean narration for a children's story video.
 
-**CHARACTER:**
-- Name: {character_name}
-- Type: {character_type}{character_visual_context}
-- Personality: {personality}
+NARRATION_CORE_RULES = """You are creating Korean narration for a children's story video.
 
 **YOUR JOB:**
 Turn each scene description into clear Korean narration that tells listeners EXACTLY what happens.
@@ -704,8 +877,6 @@ Turn each scene description into clear Korean narration that tells listeners EXA
    - Target: 26 Korean characters (including spaces)
    - Acceptable range: 23-28 characters
    - **HARD LIMIT: NEVER exceed 28 characters**
-   - Count characters for EVERY line you write
-   - If over 28 characters, you MUST shorten it
 
 **3. CHARACTER NAMES IN KOREAN**
    - Convert ALL names to Korean: "Luna" → "루나", "Ben" → "벤", "Mira" → "미라"
@@ -771,10 +942,15 @@ Turn each scene description into clear Korean narration that tells listeners EXA
       - Only use names when it flows naturally in the story
       - Don't force formal introductions unless it makes sense
 
+**7. NEVER USE A NAME BEFORE IT IS INTRODUCED**
+   - Scene N: "작은 새를 만났어요" (met a small bird) - no name
+   - Scene N+1: "그 새는 미라라고 했어요" (the bird said her name was Mira) - NOW introduce name
+   - Scene N+2: "미라와 함께 갔어요" (went with Mira) - NOW can use name
+
 **HOW TO WRITE EACH SCENE:**
 
 **SCENE 1:** Character Introduction
-Blueprint format: "There was a [type] named {{name}} who [lived] at [location] and [goal]"
+Blueprint format: "There was a [type] named {name} who [lived] at [location] and [goal]"
 Extract: character type + name + where + goal
 ✅ GOOD (26 chars): "상냥한 소년 벤이 소나무골에서 폭포를 꿈꿨어요"
 ✅ GOOD (26 chars): "소나무골에 사는 소년 벤은 폭포를 보고 싶었어요"
@@ -805,7 +981,10 @@ Extract: WHO (Ben) + WHAT (walks through misty forest) + HOW (carefully)
 Skip: thinking about grandmother (not critical)
 ✅ Write (26 chars): "벤은 안개 낀 숲길을 조심스럽게 걸어갔답니다"
 
-**COMPLETE STORY FLOW EXAMPLE (6 SCENES):**
+"""
+
+# Few-shot block: dropped from the slim prompt once the model has a clean streak (see NARRATION_SLIM_AFTER)
+NARRATION_EXAMPLES = """**COMPLETE STORY FLOW EXAMPLE (6 SCENES):**
 
 When read together, these should sound like ONE connected story:
 
@@ -840,114 +1019,25 @@ When read together, these should sound like ONE connected story:
 - Side character (fox) integrated naturally without forced name introduction
 - Clear beginning → middle → end with lesson
 
-**INDIVIDUAL EXAMPLES:**
-
-Blueprint: "There was a kind boy named Ben who lived in Pine Valley and dreamed of seeing Whispering Falls"
-✅ GOOD (26 chars): "상냥한 소년 벤이 소나무골에서 폭포를 꿈꿨어요"
-✅ GOOD (26 chars): "소나무골에 사는 소년 벤은 폭포를 보고 싶었어요"
-❌ BAD (17 chars): "벤은 폭포를 보고 싶었어요" (too short - missing character type and location!)
-
-Blueprint: "Ben meets a cloaked traveler on forest path"
-✅ GOOD (26 chars): "벤은 숲길에서 망토 입은 나그네를 만났답니다"
-✅ GOOD (26 chars): "숲길에서 망토 두른 나그네와 마주쳤답니다"
-❌ BAD (9 chars): "망토의 나그네와" (incomplete sentence!)
-
-Blueprint: "Traveler introduces himself as Mira"
-✅ GOOD (26 chars): "나그네가 자신을 미라라고 소개하며 웃었어요"
-✅ GOOD (26 chars): "그 나그네는 미라라는 이름을 알려 주었어요"
-
-Blueprint: "Ben and Mira cross stepping stones together"
-✅ GOOD (26 chars): "벤과 미라가 함께 징검다리를 건넜답니다"
-✅ GOOD (26 chars): "벤과 미라는 함께 징검다리를 건넜어요"
-
-**OUTPUT FORMAT:**
-{{
-  "story_title": "Short title in Korean",
-  "scenes": [
-    {{
-      "scene_number": 1,
-      "scene_type": "character",
-      "narration_text": "26-27 char narration"
-    }}
-  ]
-}}
-
-**NOW:** Read the blueprint scenes. Extract the key facts. Write clear, specific narrations that tell the story.
 """
 
-        # Format blueprint for context
-        blueprint_str = json.dumps(blueprint, indent=2, ensure_ascii=False)
-
-        user_prompt = f"""Transform this story blueprint into beautiful, engaging children's storybook narration.
-
-STORY BLUEPRINT:
-{blueprint_str}
-
-Character: {character_name}
-Language: {language}
-
-**YOUR TASK:**
-Write narration for each scene that creates ONE CONTINUOUS FLOWING STORY.
+NARRATION_CLOSING = """**NOW:** Read ALL blueprint scenes first. Extract the key facts. Write clear, specific narrations that tell the story.
+"""
 
-**CRITICAL REQUIREMENTS:**
+NARRATION_RULES = NARRATION_CORE_RULES + NARRATION_EXAMPLES + NARRATION_CLOSING
+NARRATION_RULES_SLIM = NARRATION_CORE_RULES + NARRATION_CLOSING
 
-**1. READ THE ENTIRE STORY FIRST:**
-- Read ALL scenes before writing any narration
-- Understand how scenes connect to each other
-- Identify: What elements are introduced? What gets referenced later?
-
-**2. PRIORITIZE CLARITY AND FLOW:**
-- **NARRATION IS THE ONLY WAY LISTENERS UNDERSTAND THE STORY**
-- Write natural, flowing children's storybook narration
-- Avoid overly decorative or literary expressions that obscure meaning
-- Focus on STORY CONTINUITY - how each scene connects to the next
-- CLARITY and CONNECTION are more important than decorative beauty
-
-**3. MAINTAIN NARRATIVE CONTINUITY:**
-- Use "그 (the)" for elements already introduced: "그 꽃" (THE flower), not just "꽃" (a flower)
-- Reference previous scenes when relevant: "강에서" (at the river), "그때" (at that moment)
-- Each line should flow naturally from the previous one
-
-**4. CHARACTER NAME RULES:**
-- NEVER use a character's name before they're introduced in the story
-- Scene N: "작은 새를 만났어요" (met a small bird) - no name
-- Scene N+1: "그 새는 미라라고 했어요" (the bird said her name was Mira) - NOW introduce name
-- Scene N+2: "미라와 함께 갔어요" (went with Mira) - NOW can use name
-
-**5. CREATE OVERALL STORY CONSISTENCY:**
-- Think: "How does this scene connect to what came before?"
-- When read 1→2→3→4..., it should sound like ONE cohesive story, not disconnected sentences
-- Each line advances the story and connects logically to previous line
-- Listeners should always know: WHERE we are, WHAT is happening, WHY it matters
-- No sudden jumps or confusing transitions
-
-**6. MAXIMIZE CLARITY IN LIMITED SPACE:**
-- With only 25-30 characters, CLARITY and FLOW > Decorative words
-- Action Priority: WHO did WHAT (and WHY/HOW if space allows)
-- Be CONCRETE and SPECIFIC - avoid vague or abstract language
-- Each line must be INFORMATIVE - listeners depend on your words alone
-- Maintain consistent 26-27 character length for all narrations
-
-**GOAL:** Create narration that:
-1. Reads like a COMPLETE, CONNECTED STORY (not isolated sentences)
-2. Is CRYSTAL CLEAR - listeners understand the full story from audio alone
-3. FLOWS NATURALLY from scene to scene with smooth transitions
-4. Maintains proper length (26-27 chars) while staying clear and connected
+NARRATION_REPAIR_RULES = f"""You are fixing Korean narration lines for a children's story video that is read aloud by TTS.
 
-Return your response as a JSON object with the format specified in the system prompt.
+Rewrite each line so that it:
+- Is {NARRATION_TARGET_CHARS} Korean characters long, including spaces (allowed range {NARRATION_MIN_CHARS}-{NARRATION_MAX_CHARS})
+- Ends with a period (.)
+- Keeps the same meaning, names and story details
+- Writes every name in Korean (Hangul), never in Latin letters
+- Uses proper, child-friendly Korean grammar
 """
-        return self._get_json_response(system_prompt, user_prompt)
-
-    def create_visual_blueprint(self, story_blueprint: dict, style: str) -> dict:
-        """
-        AGENT 2.5: Visual Blueprint Director - Creates detailed visual asset library
-        Analyzes the full story and identifies all locations, objects, and visual elements
-        Creates reusable, consistent descriptions for visual consistency
-        """
 
-        blueprint_str = json.dumps(story_blueprint, indent=2, ensure_ascii=False)
-
-        system_prompt = f"""
+VISUAL_BLUEPRINT_RULES = """
 You are a Visual Blueprint Director for an animation studio. Your job is to analyze a complete story and create a detailed VISUAL ASSET LIBRARY for consistent animation.
 
 **YOUR CRITICAL ROLE:**
@@ -1045,178 +1135,98 @@ Look for:
 - If a scene isn't covered by defined locations, create a new location for it
 - Every scene number from 1 to N must appear in at least one location's "appears_in_scenes" array
 
-**OUTPUT FORMAT:**
-
-{{
-  "locations": [
-    {{
-      "location_id": "kitchen_1",
-      "location_name": "Family Kitchen",
-      "description": "Detailed visual description following guidelines above",
-      "appears_in_scenes": [1, 3, 7, 9]
-    }}
-  ],
-  "objects": [
-    {{
-      "object_id": "cake_1",
-      "object_name": "Birthday Cake",
-      "description": "Detailed visual description following guidelines above",
-      "appears_in_scenes": [5, 7, 9]
-    }}
-  ],
-  "visual_notes": {{
-    "time_of_day_progression": "Story progresses from morning to evening",
-    "weather": "Sunny throughout",
-    "color_palette": "Warm tones, focus on yellows and oranges",
-    "overall_mood": "Cheerful and hopeful"
-  }}
-}}
-
 **CRITICAL RULES:**
 1. **EVERY SCENE MUST HAVE A LOCATION**: Ensure all scenes (especially Scene 1) are assigned to a location
 2. **SIMPLE BUT SPECIFIC**: Include colors and type, but don't overdo details
 3. **Be CONSISTENT**: Same description = same visuals across scenes
-4. **NO STYLE TAG**: Do NOT add "{style} art style" - the style is added later
+4. **NO STYLE TAG**: Do NOT add "[style] art style" - the style is added later
 5. **USE COMMON TERMS**: AI understands "house", "kitchen", "garden" - use clear, well-known words
-6. **BALANCE**: Specific enough for consistency, simple enough for AI to generate
+6. **BALANCE**: Specific enough for consistency, simple enough for AI to generate - COLOR + TYPE + 1-2 key features max
+
+**SIMPLE vs OVERLY DETAILED:**
+- ✅ GOOD: "Cozy kitchen with cream walls, green cabinets, wooden table, large window"
+- ❌ BAD: "Victorian-style kitchen with butter-cream walls, sage-green lower cabinets, white tile backsplash with tiny blue accent squares..."
+- ✅ GOOD: "Three-layer pink cake with rainbow sprinkles"
+- ❌ BAD: "Three-layer chocolate cake with dark chocolate frosting, covered in white chocolate shavings, sitting on white ceramic cake stand with scalloped edges..."
 
 **EXAMPLE (for a baking story):**
 
-{{
+{
   "locations": [
-    {{
+    {
       "location_id": "kitchen_main",
       "location_name": "Grandma's Kitchen",
       "description": "Cozy kitchen with cream walls, green cabinets, wooden table, large window, warm afternoon light",
       "appears_in_scenes": [1, 2, 5, 6, 8]
-    }},
-    {{
+    },
+    {
       "location_id": "garden_back",
       "location_name": "Backyard Garden",
       "description": "Small garden with stone path, vegetable beds, white fence, apple tree",
       "appears_in_scenes": [3, 4]
-    }}
+    }
   ],
   "objects": [
-    {{
+    {
       "object_id": "cake_birthday",
       "object_name": "Birthday Cake",
       "description": "Three-layer pink cake with rainbow sprinkles",
       "appears_in_scenes": [5, 6, 7, 8]
-    }},
-    {{
+    },
+    {
       "object_id": "mixing_bowl",
       "object_name": "Mixing Bowl",
       "description": "Large blue ceramic bowl with floral pattern",
       "appears_in_scenes": [2, 5]
-    }}
+    }
   ],
-  "visual_notes": {{
+  "visual_notes": {
     "time_of_day_progression": "Morning (scenes 1-3) to afternoon (scenes 4-6) to evening (scenes 7-8)",
     "weather": "Sunny and warm throughout",
     "color_palette": "Warm and inviting - focus on creams, soft greens, pinks, natural wood tones",
     "overall_mood": "Heartwarming and nostalgic"
-  }}
-}}
+  }
+}
 """
 
-        user_prompt = f"""Analyze this complete story and create a SIMPLE, CLEAR visual asset library.
+VISUAL_PROMPTS_RULES = """
+You are a Visual Prompt Composer creating image generation prompts for animated storytelling.
 
-STORY BLUEPRINT:
-{blueprint_str}
+**CRITICAL**: You have access to a VISUAL ASSET LIBRARY with pre-defined locations and objects. Your job is to COMPOSE prompts by REFERENCING these assets, not creating new descriptions.
 
-Art Style: {style}
+**YOUR JOB:**
+Compose image prompts by REFERENCING the asset library provided below. DO NOT create new descriptions - USE what's provided!
 
-**YOUR TASK:**
-1. Read through ALL scenes carefully
-2. Identify every unique location (scenes in same place = same location)
-3. Identify important objects (appears multiple times OR crucial to story)
-4. Write SIMPLE, CLEAR descriptions - NOT overly complicated!
-5. Note which scenes use which assets
+**HOW TO USE THE ASSET LIBRARY:**
 
-**CRITICAL - KEEP DESCRIPTIONS SIMPLE:**
-- ✅ GOOD: "Cozy kitchen with cream walls, green cabinets, wooden table, large window"
-- ❌ BAD: "Victorian-style kitchen with butter-cream walls, sage-green lower cabinets, white tile backsplash with tiny blue accent squares..."
-- ✅ GOOD: "Three-layer pink cake with rainbow sprinkles"
-- ❌ BAD: "Three-layer chocolate cake with dark chocolate frosting, covered in white chocolate shavings, sitting on white ceramic cake stand with scalloped edges..."
+1. **For each scene, check:**
+   - Which location does this scene use? (look at location's "appears_in_scenes")
+   - Which objects are in this scene? (look at object's "appears_in_scenes")
+   - Use the EXACT descriptions from the library
 
-**WHY SIMPLE?**
-- AI needs to actually GENERATE these - overly complicated = AI confusion
-- Use well-known terms everyone understands ("house", "garden", "ball")
-- Include COLORS for consistency, but keep other details minimal
+2. **Compose the prompt:**
+   - Start with location description (if location identified)
+   - Add object descriptions (if objects present)
+   - Add character actions/poses (for character scenes)
+   - Add lighting/camera angle
 
-**BALANCE:**
-- Specific enough: Same description = same visuals
-- Simple enough: AI can actually generate it
-- Focus on: COLOR + TYPE + 1-2 key features max
+**EXAMPLE:**
+If scene 5 uses location "kitchen_main" and object "cake_birthday":
+- Location description: "Cozy rustic kitchen with cream walls, vintage green cabinets..."
+- Object description: "Three-layer pink cake with rainbow sprinkles..."
+- Character action: "the curious cat reaching toward the cake"
+- Result prompt: "[STYLE], Cozy rustic kitchen with cream walls, vintage green cabinets, checkered curtains, the curious orange cat with white paws reaching toward the three-layer pink cake with rainbow sprinkles on glass cake stand, warm afternoon sunlight – medium shot"
 
-Return your response as a JSON object with the format specified in the system prompt.
-"""
+**SCENE TYPE HANDLING:**
 
-        return self._get_json_response(system_prompt, user_prompt)
-
-    def create_visual_prompts(self, blueprint: dict, visual_blueprint: dict, scenes_with_narration: list, character_name: str, character_type: str, character_prompt: str, style: str) -> dict:
-        """
-        AGENT 3: Visual Prompt Composer - Creates image generation prompts using visual asset library
-        Composes prompts by referencing pre-defined locations, objects from visual blueprint
-        """
-        character_visual_context = f"\n- Visual Details: {character_prompt}\n  (For character scenes, this will be added via img2img)" if character_prompt else ""
-
-        # Extract side characters info
-        side_characters = blueprint.get("side_characters", [])
-        side_characters_context = ""
-        if side_characters:
-            side_char_list = "\n".join([f"  * {char['name']}: {char['type']} - {char['description']}" for char in side_characters])
-            side_characters_context = f"\n\n**SIDE CHARACTERS IN THIS STORY:**\n{side_char_list}\n  (Use these EXACT descriptions when these characters appear in scenes)"
-
-        # Format visual blueprint for reference
-        visual_blueprint_str = json.dumps(visual_blueprint, indent=2, ensure_ascii=False)
-
-        system_prompt = f"""
-You are a Visual Prompt Composer creating image generation prompts for animated storytelling.
-
-**CRITICAL**: You have access to a VISUAL ASSET LIBRARY with pre-defined locations and objects. Your job is to COMPOSE prompts by REFERENCING these assets, not creating new descriptions.
-
-**MAIN CHARACTER:**
-- Name: {character_name}
-- Type: {character_type}{character_visual_context}{side_characters_context}
-
-**VISUAL ASSET LIBRARY (USE THESE EXACT DESCRIPTIONS!):**
-{visual_blueprint_str}
-
-**YOUR JOB:**
-Compose image prompts by REFERENCING the asset library above. DO NOT create new descriptions - USE what's provided!
-
-**HOW TO USE THE ASSET LIBRARY:**
-
-1. **For each scene, check:**
-   - Which location does this scene use? (look at location's "appears_in_scenes")
-   - Which objects are in this scene? (look at object's "appears_in_scenes")
-   - Use the EXACT descriptions from the library
-
-2. **Compose the prompt:**
-   - Start with location description (if location identified)
-   - Add object descriptions (if objects present)
-   - Add character actions/poses (for character scenes)
-   - Add lighting/camera angle
-
-**EXAMPLE:**
-If scene 5 uses location "kitchen_main" and object "cake_birthday":
-- Location description: "Cozy rustic kitchen with cream walls, vintage green cabinets..."
-- Object description: "Three-layer pink cake with rainbow sprinkles..."
-- Character action: "the curious cat reaching toward the cake"
-- Result prompt: "{style}, Cozy rustic kitchen with cream walls, vintage green cabinets, checkered curtains, the curious orange cat with white paws reaching toward the three-layer pink cake with rainbow sprinkles on glass cake stand, warm afternoon sunlight – medium shot"
-
-**SCENE TYPE HANDLING:**
-
-**"character" scenes (img2img generation):**
-- **Location**: Use EXACT location description from asset library (if scene uses a defined location)
-- **Objects**: Include EXACT object descriptions from asset library (if scene includes defined objects)
-- **Characters**: Describe actions/poses of characters present
-  * DO NOT use character NAMES - use type descriptions: "the cat", "the fox", "the mouse"
-  * Example: "the cat reaches toward the cake"
-  * If multiple characters: "the cat and the mouse play together"
-- **Composition**: Add camera angle, lighting
+**"character" scenes (img2img generation):**
+- **Location**: Use EXACT location description from asset library (if scene uses a defined location)
+- **Objects**: Include EXACT object descriptions from asset library (if scene includes defined objects)
+- **Characters**: Describe actions/poses of characters present
+  * DO NOT use character NAMES - use type descriptions: "the cat", "the fox", "the mouse"
+  * Example: "the cat reaches toward the cake"
+  * If multiple characters: "the cat and the mouse play together"
+- **Composition**: Add camera angle, lighting
 
 **"scenery" scenes (txt2img generation):**
 - **Location**: Use EXACT location description from asset library
@@ -1244,7 +1254,7 @@ If scene 5 uses location "kitchen_main" and object "cake_birthday":
 5. **NO OVERLAY TEXT**: Do NOT add dialogue text, subtitles, captions, or decorative text overlays to any prompts. Text that's naturally part of scene objects (posters, signs, books, newspapers, letters) is acceptable if relevant to the story
 
 **PROMPT STRUCTURE:**
-`{style}, [EXACT location description from library], [EXACT object descriptions from library], [character action/pose], [lighting], no text – [camera angle]`
+`[STYLE], [EXACT location description from library], [EXACT object descriptions from library], [character action/pose], [lighting], no text – [camera angle]`
 
 **IMPORTANT:** Always include "no text" in every prompt to prevent unwanted text generation in images
 
@@ -1270,49 +1280,223 @@ Scene: "Blue the bird sits on branch feeling lonely"
 Character Prompt: "curious blue bird with silver pendant, expressive eyes"
 Type: character
 Emotion: loneliness
-CORRECT Prompt: "{style}, tree branch in sunny park, the bird perched alone looking down, warm afternoon sunlight – medium shot from slightly above"
+CORRECT Prompt: "[STYLE], tree branch in sunny park, the bird perched alone looking down, warm afternoon sunlight – medium shot from slightly above"
 WRONG: "Blue sitting on branch" ❌ (Don't use name!)
 
 Scene: "Mimi meets a friendly butterfly in the garden"
 Character Prompt: "curious orange fox with white paws, wearing blue scarf"
 Type: character
-CORRECT Prompt: "{style}, blooming flower garden, the fox reaching toward a small yellow butterfly hovering nearby, bright daylight – close-up shot"
+CORRECT Prompt: "[STYLE], blooming flower garden, the fox reaching toward a small yellow butterfly hovering nearby, bright daylight – close-up shot"
 WRONG: "Mimi meeting butterfly" ❌ (Don't use name!)
 
 Scene: "Peaceful garden full of flowers"
 Type: scenery
 Emotion: tranquility
-Prompt: "{style}, vibrant flower garden with stone pathway, butterflies fluttering, soft golden hour lighting – wide establishing shot"
-
-
-**OUTPUT FORMAT:**
-{{
-  "image_prompts": [
-    {{
-      "scene_number": 1,
-      "scene_type": "character" or "scenery",
-      "prompt": "Complete detailed prompt starting with {style}"
-    }}
-  ]
-}}
+Prompt: "[STYLE], vibrant flower garden with stone pathway, butterflies fluttering, soft golden hour lighting – wide establishing shot"
 
 **CRITICAL REQUIREMENTS:**
-- ALL prompts MUST start with: "{style}"
+- ALL prompts MUST start with: "[STYLE]"
 - **USE ASSET LIBRARY**: Copy exact location/object descriptions from the visual blueprint
 - For "character" scenes: Location + Objects (from library) + Character actions
 - For "scenery" scenes: Location + Objects (from library) + Atmosphere
 - Maintain visual continuity by reusing exact asset descriptions
 """
 
-        # Format context for the agent
-        context = {
-            "scene_blueprints": blueprint.get("scene_blueprints", []),
-            "side_characters": blueprint.get("side_characters", []),
-            "scenes_narration": scenes_with_narration
-        }
-        context_str = json.dumps(context, indent=2, ensure_ascii=False)
+MASTER_STORYBOARD_RULES = """
+You are a world-class Director of Photography for an AI animation studio. Your task is to take a complete story script and a style guide and generate a full storyboard with all the necessary prompts.
+
+**CRITICAL GOAL: VISUAL COHESION & CHARACTER CONSISTENCY**
+The prompts must create a sequence of images and videos that feel like they are from the SAME film. Lighting and color must transition logically.
+
+**SCENE TYPE HANDLING:**
+
+1. **"character" scene (uses img2img with character reference):**
+   - Character reference images will be provided to the AI
+   - Your prompt should describe the SCENE, ENVIRONMENT, and ACTIONS
+   - DO NOT describe character appearances (they're in the reference images)
+   - You can mention generic background elements: "surrounded by butterflies", "trees swaying", "flowers blooming"
+   - Example GOOD: "[STYLE], Character playing in a sunny meadow with butterflies flying around – Bright daylight – Medium shot; Character jumping joyfully among wildflowers."
+
+2. **"scenery" scene (pure environment, NO img2img):**
+   - NO characters should be visible AT ALL
+   - Focus only on environment, mood, atmosphere
+   - Sets up the location/mood for the next scene
+   - Example: "[STYLE], Deep forest with sunlight filtering through leaves – Dappled light – Wide shot; Peaceful forest clearing with morning mist."
+
+**IMAGE PROMPT FORMAT:**
+-   You MUST generate one image prompt for every scene provided.
+-   The art style is fixed: **[STYLE]**. This MUST be the first part of every prompt.
+-   Format: `[STYLE], [Setting/Action] – [Lighting] – [Camera Shot]; [Composition details].`
+-   Keep prompts focused on environment and mood
+-   Avoid introducing secondary characters that would appear across multiple scenes
+
+**VIDEO PROMPT RULES:**
+-   You MUST generate one video prompt for every scene provided.
+-   The prompt must describe a SINGLE, simple, continuous camera movement
+-   Focus on camera motion, not character actions
+-   Examples: "The camera slowly dollies forward", "The camera gently pans right", "The camera tilts up to reveal the sky"
+-   Keep it simple and cinematic
+
+**CONSISTENCY RULES:**
+-   Maintain consistent lighting mood throughout the story (unless intentional transition)
+-   Color palette should feel cohesive across all scenes
+-   Camera shot variety: mix wide shots, medium shots, and close-ups
+-   Transitions should feel natural (don't jump from night to day abruptly)
+
+**Your output MUST be a single, valid JSON object with two keys:**
+1.  `image_prompts`: A list of strings, one for each scene.
+2.  `video_prompts`: A list of strings, one for each scene.
+"""
+
+# Changes whenever the visual blueprint rules or schema change, invalidating memoized asset libraries
+VISUAL_BLUEPRINT_VERSION = hashlib.sha256(orjson.dumps([VISUAL_BLUEPRINT_RULES, VISUAL_BLUEPRINT_SCHEMA])).hexdigest()[:12]
+
+
+# ===== PER-REQUEST TEMPLATES =====
+# Built once at import; only the small dynamic values are substituted per call (str.format_map)
+
+STORY_SUMMARY_REQUEST_TMPL = """
+**STORY REQUEST:**
+- Number of scenes: {num_scenes}
+
+**CHARACTER:**
+- Name: {character_name}
+- Type: {character_type}
+- Personality: {personality}
+
+**STORY THEME/IDEA:** {themes}
 
-        user_prompt = f"""Compose detailed image prompts for each scene using the VISUAL ASSET LIBRARY provided above.
+**STORY COMPLEXITY:** {complexity}
+{detail_level}
+"""
+
+STORY_SUMMARY_USER_TMPL = "Create a complete story plan for a {num_scenes}-scene children's story about {character_name} (a {character_type}) with the theme: {themes}"
+
+STORY_CONTEXT_TMPL = """
+**COMPLETE STORY PLAN (from Story Planner):**
+
+{story_summary_json}
+
+**YOUR JOB:** Break this planned story into exactly {num_scenes} scenes. Follow the story plan precisely - don't add random elements or characters not in the plan.
+"""
+
+STORY_CONTEXT_CHAINED_TMPL = """
+**COMPLETE STORY PLAN:** Use the story plan you returned in the previous response (from Story Planner).
+
+**YOUR JOB:** Break this planned story into exactly {num_scenes} scenes. Follow the story plan precisely - don't add random elements or characters not in the plan.
+"""
+
+STORY_BLUEPRINT_REQUEST_TMPL = """
+### STORY REQUEST
+
+**NUMBER OF SCENES:** {num_scenes}
+
+**CHARACTER:**
+- Name: {character_name}
+- Type: {character_type}{character_visual_context}
+- Personality: {personality}
+
+**STORY THEME:** {themes}
+
+{story_context}
+
+**NOW:** Create your {num_scenes}-scene story following ALL requirements above.
+"""
+
+STORY_BLUEPRINT_USER_TMPL = """Create a {num_scenes}-scene story for {character_name} the {character_type}.
+
+**CHARACTER INFO:**
+- Name: {character_name}
+- Type: {character_type}
+- Personality: {personality}
+
+**STORY DIRECTION:** {themes}
+
+**LANGUAGE:** {language}
+
+**YOUR MISSION:**
+Follow the detailed instructions in the system prompt EXACTLY.
+
+**CRITICAL REMINDERS:**
+1. If "User's story idea" appears in Story Direction -> that IS the plot!
+2. Scene 1 MUST start: "There was a [type] named {character_name} who..."
+3. Every scene: 15-18 words (COUNT THEM!)
+4. **USE SIMPLE, KID-FRIENDLY WORDS** - This is a children's book!
+5. Avoid sophisticated or literary vocabulary
+6. Keep scenes simple - ONE action, not multiple complicated things happening
+7. Side character visual introduction: Must have bridge scene BEFORE they interact
+8. Natural flow: NO gaps between scenes
+9. Scene type: ONLY "character" or "scenery" (use these exact values!)
+10. **Scenery scenes: Minimum required - 6 scenes->1 scenery, 9->1, 12->2, 15->3**
+11. Validate with checklist before submitting!
+
+**REMEMBER:** Your scenes will be converted to 26-27 character Korean narration. Simple English makes translation easier!
+
+Create exactly {num_scenes} scenes following ALL requirements.
+"""
+
+NARRATION_REQUEST_TMPL = """
+**CHARACTER:**
+- Name: {character_name}
+- Type: {character_type}{character_visual_context}
+- Personality: {personality}
+{reference_examples}"""
+
+NARRATION_REFERENCE_TMPL = """
+**REFERENCE EXAMPLES (similar characters):**
+{examples}
+"""
+
+VISUAL_PROMPTS_REQUEST_TMPL = """
+**MAIN CHARACTER:**
+- Name: {character_name}
+- Type: {character_type}{character_visual_context}{side_characters_context}
+
+**VISUAL ASSET LIBRARY (USE THESE EXACT DESCRIPTIONS!):**
+{visual_blueprint_str}
+
+**ART STYLE:** {style}
+(Use this exact text wherever [STYLE] appears above.)
+"""
+
+NARRATION_USER_TMPL = """Write the narration for this story blueprint, following the system rules.
+
+STORY BLUEPRINT:
+{blueprint_str}
+
+Character: {character_name}
+Language: {language}
+
+**REMEMBER:** ONE connected story, read line by line - every line clear, 26 characters, ending with a period.
+"""
+
+NARRATION_WINDOW_TMPL = """
+**THIS REQUEST:** Write narration ONLY for scenes {first_scene}-{last_scene}. The other scenes are written separately.
+Use the full blueprint above as context so your lines connect naturally with the scenes before and after them.
+Still return "story_title", and a "scenes" array containing only scenes {first_scene}-{last_scene}.
+"""
+
+NARRATION_WINDOW_MISSING_TMPL = """
+**IMPORTANT:** Your previous answer left out scene(s) {missing_scenes}. Return EVERY scene from {first_scene} to {last_scene}, one entry per scene_number.
+"""
+
+# Changes whenever the narration rules, templates or schema change, resetting the compliance streak
+NARRATION_RULES_VERSION = hashlib.sha256(orjson.dumps([
+    NARRATION_RULES, NARRATION_RULES_SLIM, NARRATION_REQUEST_TMPL, NARRATION_USER_TMPL, NARRATION_WINDOW_TMPL,
+    NARRATION_WINDOW_MISSING_TMPL, NARRATION_SCHEMA
+])).hexdigest()[:12]
+
+VISUAL_BLUEPRINT_USER_TMPL = """Create the visual asset library for this story, following the system rules.
+
+STORY BLUEPRINT:
+{blueprint_str}
+
+Art Style: {style}
+
+**REMEMBER:** Every location and object once, with SIMPLE, CLEAR descriptions and the scenes it appears in.
+"""
+
+VISUAL_PROMPTS_USER_TMPL = """Compose the image prompts for this story, following the system rules and the VISUAL ASSET LIBRARY provided above.
 
 STORY CONTEXT:
 {context_str}
@@ -1320,38 +1504,1100 @@ STORY CONTEXT:
 Art Style: {style}
 Character: {character_name} (a {character_type})
 
-**YOUR PROCESS FOR EACH SCENE:**
+Generate {num_scenes} detailed image prompts, one for each scene.
 
-**Step 1: Identify Assets**
-- Check which location this scene uses (look at location "appears_in_scenes")
-- Check which objects appear in this scene (look at object "appears_in_scenes")
+**REMEMBER:** Copy library descriptions WORD-FOR-WORD - same location/object ID = identical description in every scene.
+"""
 
-**Step 2: Copy Exact Descriptions - NO TRUNCATION!**
-- If scene uses location from library → copy THE COMPLETE location description WORD-FOR-WORD
-- If scene includes objects from library → copy THE COMPLETE object descriptions WORD-FOR-WORD
-- **CRITICAL**: DO NOT use "..." or shorten descriptions - copy EVERYTHING exactly as written!
+MASTER_STORYBOARD_REQUEST_TMPL = """
+**ART STYLE:** {style}
+(Use this exact text wherever [STYLE] appears above.)
+"""
 
-**Step 3: Add Character Actions (for character scenes)**
-- Describe what characters are doing (actions, poses, expressions)
-- DO NOT use character NAMES - use types: "the cat", "the fox", "the mouse"
-- Keep character actions SEPARATE from object/location descriptions
+MASTER_STORYBOARD_USER_TMPL = """Here is the complete story data and style guide. Generate the master storyboard JSON based on it.
 
-**Step 4: Compose Final Prompt**
-Format: "{style}, [COMPLETE location description], [COMPLETE object descriptions], [character action], [lighting] – [camera angle]"
+CRITICAL REMINDERS:
+- main_character scenes: Focus on environment and action, NOT character appearance (reference image provides that)
+- scenery scenes: Pure environment only, NO characters
+- NO secondary characters that need visual consistency
+- Generic elements only (butterflies, trees, flowers, etc.)
 
-**CRITICAL RULES:**
-- **NO TRUNCATION**: Copy the FULL description - if it's 200 characters, copy all 200!
-- **NO PARAPHRASING**: Use the exact words from the asset library
-- **NO "..." ELLIPSIS**: Never use "..." to shorten descriptions
-- **CONSISTENCY**: Same location/object = IDENTICAL description every time
+Story Data:
+```json
+{full_context}
+```"""
 
-Generate {len(scenes_with_narration)} detailed image prompts, one for each scene.
 
-**REMEMBER**: The asset library ensures consistency - same location/object ID = same visual description = identical appearance across scenes!
+def _narration_length(text: str) -> int:
+    """Korean narration length as TTS reads it: NFC-composed characters, spaces included"""
+    return len(unicodedata.normalize("NFC", text))
+
+
+# One scan per narration: romanized names leaking through ("Luna" instead of "루나") and a missing final period
+_NARRATION_CHECK = re.compile(r"(?P<latin>[A-Za-z]{2,})|(?P<no_period>[^.]\Z)")
+
+NARRATION_CHECK_REASONS = {
+    "latin": "contains Latin letters - write names in Korean",
+    "no_period": "missing final period"
+}
+
+
+def _check_narration(text: str) -> Tuple[bool, List[str]]:
+    """
+    Validate one narration line against the local rules
+
+    Args:
+        text: narration_text as returned by the Script Writer
+
+    Returns:
+        (ok, reasons): reasons lists every rule the line breaks (empty when ok)
+    """
+    text = unicodedata.normalize("NFC", text.strip())
+    flags = {match.lastgroup for match in _NARRATION_CHECK.finditer(text)}
+    reasons = [reason for flag, reason in NARRATION_CHECK_REASONS.items() if flag in flags]
+    if not NARRATION_MIN_CHARS <= len(text) <= NARRATION_MAX_CHARS:
+        reasons.append(f"{len(text)} chars, needs {NARRATION_MIN_CHARS}-{NARRATION_MAX_CHARS}")
+    return not reasons, reasons
+
+
+@functools.lru_cache(maxsize=None)
+def _parsed_template(template: str) -> tuple:
+    """(literal, field) pieces of a *_TMPL string, parsed once per template"""
+    return tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+
+
+def _render_prompt(*parts) -> str:
+    """
+    Assemble a large prompt in a single buffer. Plain strings are written as-is and
+    (template, values) pairs are expanded field by field, so multi-KB embedded JSON is
+    copied once instead of through format_map and then again through + concatenation.
+    """
+    buf = io.StringIO()
+    for part in parts:
+        if isinstance(part, str):
+            buf.write(part)
+            continue
+        template, values = part
+        for literal, field in _parsed_template(template):
+            buf.write(literal)
+            if field is not None:
+                buf.write(str(values[field]))
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=256)
+def _narration_reference_block(character_type: str, personality: str) -> str:
+    """
+    Pick the NARRATION_REFERENCE_COUNT pool examples closest to this character:
+    a character type match counts double, each shared personality word once.
+    """
+    target_type = character_type.lower()
+    traits = set(personality.lower().replace(",", " ").split())
+
+    def score(example: dict) -> int:
+        type_match = any(t in target_type for t in example["character_types"])
+        return (2 if type_match else 0) + len(traits & set(example["personality"].split()))
+
+    # sorted is stable, so ties keep pool order
+    picked = sorted(NARRATION_EXAMPLE_POOL, key=score, reverse=True)[:NARRATION_REFERENCE_COUNT]
+    if not picked:
+        return ""
+
+    examples = "\n\n".join(
+        f'Blueprint: "{example["blueprint"]}"\n✅ GOOD ({_narration_length(example["narration"])} chars): "{example["narration"]}"'
+        for example in picked
+    )
+    return NARRATION_REFERENCE_TMPL.format_map({"examples": examples})
+
+
+def _prompt_json(value: Any, sort_keys: bool = False) -> str:
+    """
+    Compact JSON for embedding in a prompt. Indentation is billed as input tokens
+    and the model reads compact JSON just as well; non-ASCII text is kept as-is.
+    """
+    option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return orjson.dumps(value, option=option).decode()
+
+
+def _without_urls(value: Any) -> Any:
+    """Drop *_url / *_urls fields (generated asset links) the model can't use from a prompt payload"""
+    if isinstance(value, dict):
+        return {key: _without_urls(item) for key, item in value.items() if not str(key).endswith(("_url", "_urls"))}
+    if isinstance(value, list):
+        return [_without_urls(item) for item in value]
+    return value
+
+
+@functools.lru_cache(maxsize=64)
+def _build_story_context(story_summary_json: str, num_scenes: int) -> str:
+    """Story Planner context block for the Story Director, keyed on the canonical summary JSON"""
+    return STORY_CONTEXT_TMPL.format_map({"story_summary_json": story_summary_json, "num_scenes": num_scenes})
 
-Return your response as a JSON object with the format specified in the system prompt.
-"""
-        return self._get_json_response(system_prompt, user_prompt)
+
+class LLMAgent:
+    def __init__(self):
+        if not config.OPENAI_API_KEY: raise ValueError("OPENAI_API_KEY is not set.")
+        self.client = _shared_openai_client()
+        # The backoff loops in _get_json_response/a_get_json_response retry on their own, so they
+        # use copies without SDK retries; every other call keeps the SDK's default retries
+        self._client_no_retry = self.client.with_options(max_retries=0)
+        # Async resources are created lazily per event loop (Celery tasks run a fresh loop per asyncio.run)
+        self._loop = None
+        self._aclient = None
+        self._aclient_no_retry = None
+        self._http = None
+        self._sem = None
+        self._rate_limiter = TokenRateLimiter(config.OPENAI_TPM_LIMIT)
+        self._breaker = CircuitBreaker()
+        # Flagship model for writing/composition, smaller tier for extract/summarize agents
+        self.quality_model = config.OPENAI_QUALITY_MODEL
+        self.fast_model = config.OPENAI_FAST_MODEL
+
+    def _bind_loop(self):
+        """(Re)create loop-bound async resources when the running event loop changes"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._aclient = AsyncOpenAI(
+                api_key=config.OPENAI_API_KEY,
+                http_client=DefaultAsyncHttpxClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+            )
+            self._aclient_no_retry = self._aclient.with_options(max_retries=0)
+            # Plain HTTP client for fetching images we inline into vision requests
+            self._http = httpx.AsyncClient(timeout=30.0, limits=HTTP_LIMITS, follow_redirects=True)
+            self._sem = asyncio.Semaphore(config.OPENAI_MAX_CONCURRENCY or 8)
+            self._loop = loop
+
+    async def aclose(self):
+        """Close the loop-bound clients before the event loop that owns them shuts down"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        await self._aclient.close()
+        await self._http.aclose()
+        self._loop = None
+        self._aclient = None
+        self._aclient_no_retry = None
+        self._http = None
+        self._sem = None
+
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """AsyncOpenAI client bound to the currently running event loop"""
+        self._bind_loop()
+        return self._aclient
+
+    def _json_request(self, combined_prompt: str, text_format: dict = None, model: str = None, store: bool = False, previous_response_id: str = None) -> dict:
+        """Keyword arguments shared by the sync and async responses.create calls (model defaults to self.quality_model)"""
+        model = model or self.quality_model
+        reasoning_model = model.startswith("gpt-5")
+        text = {"verbosity": "low"} if reasoning_model else {}  # Concise output (GPT-5 only)
+        if text_format:
+            text["format"] = text_format
+        request = {"model": model, "input": combined_prompt}
+        if reasoning_model:
+            request["reasoning"] = {"effort": "minimal"}  # Fast, instruction-following mode
+        if text:
+            request["text"] = text
+        # Requests sharing a static prefix hash to the same key, so they are routed to the same prompt cache
+        request["prompt_cache_key"] = hashlib.sha256(combined_prompt[:PROMPT_CACHE_PREFIX_CHARS].encode("utf-8")).hexdigest()[:32]
+        if store:
+            request["store"] = True  # Keep the response server-side so a later call can chain on it
+        if previous_response_id:
+            request["previous_response_id"] = previous_response_id
+        return request
+
+    def _json_retry_prompt(self, system_prompt: str, user_prompt: str, e: json.JSONDecodeError) -> str:
+        return f"{system_prompt}\n\n{user_prompt}\n\nCRITICAL: Your previous response had a JSON syntax error at line {e.lineno}, column {e.colno}: {e.msg}\n\nReturn ONLY a valid JSON object with:\n- Proper commas between all key-value pairs\n- All strings properly quoted with double quotes\n- No trailing commas\n- Properly closed brackets and braces\n- No comments or extra text"
+
+    def _parse_json_output(self, output_text: str, attempt: int) -> dict:
+        # Raw output is only logged at DEBUG level (lazy formatting keeps this off the hot path)
+        logger.debug("Raw LLM output (attempt %d): %s", attempt + 1, output_text[:500])
+
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers keep line/column diagnostics
+        parsed_json = orjson.loads(output_text)
+        logger.debug("Parsed JSON on attempt %d", attempt + 1)
+        return parsed_json
+
+    def _log_json_error(self, e: json.JSONDecodeError, output_text: str, attempt: int, max_retries: int):
+        logger.warning("JSON parsing error on attempt %d/%d at line %d, column %d: %s",
+                       attempt + 1, max_retries, e.lineno, e.colno, e.msg)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            # Show the problematic part of the JSON
+            lines = output_text.split('\n')
+            if e.lineno <= len(lines):
+                logger.debug("Problematic line: %s", lines[e.lineno - 1])
+            if attempt == max_retries - 1:
+                logger.debug("Full output text:\n%s", output_text)
+
+        if attempt == max_retries - 1:
+            logger.error("Failed to get valid JSON after %d attempts", max_retries)
+
+    def _retry_delay(self, e: Exception, api_attempt: int):
+        """Seconds to wait before retrying an API error, or None if it should be raised"""
+        if isinstance(e, openai.RateLimitError):
+            self._breaker.record_rate_limit()
+        if not _is_transient(e) or api_attempt >= MAX_API_RETRIES - 1:
+            return None
+        return min(RETRY_MAX_DELAY, RETRY_INITIAL_DELAY * 2 ** api_attempt) + random.uniform(0, 1)
+
+    def _get_json_response(self, system_prompt: str, user_prompt: str, max_retries: int = 3, text_format: dict = None, store: bool = False, previous_response_id: str = None, model: str = None):
+        # Use GPT-5 with minimal reasoning for fast, instruction-following JSON generation
+        # GPT-5 is better at following instructions than GPT-4-turbo
+        # With a text_format schema the output is guaranteed valid JSON, so no formatting reminder/retry is needed
+        # With store=True the result is (parsed_json, response_id) so the caller can chain a follow-up request
+        # model defaults to self.quality_model
+        call = JsonCall(self, system_prompt, user_prompt, max_retries, text_format, store, previous_response_id, model)
+        cached = call.from_cache(cache_service.get_json(call.cache_key))
+        if cached is not None:
+            return cached
+
+        while True:
+            try:
+                self._breaker.check()
+                response = self._client_no_retry.responses.create(**call.request())
+                self._breaker.record_success()
+                result, entry = call.parse(response)
+                cache_service.set_json(call.cache_key, entry, config.LLM_CACHE_TTL)
+                return result
+            except Exception as e:
+                delay = call.retry_delay(e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def a_get_json_response(self, system_prompt: str, user_prompt: str, max_retries: int = 3, text_format: dict = None, store: bool = False, previous_response_id: str = None, model: str = None):
+        """
+        Async version of _get_json_response using AsyncOpenAI.
+        Transient API errors back off with asyncio.sleep instead of blocking the loop.
+        """
+        self._bind_loop()
+        call = JsonCall(self, system_prompt, user_prompt, max_retries, text_format, store, previous_response_id, model)
+        cached = call.from_cache(await asyncio.to_thread(cache_service.get_json, call.cache_key))
+        if cached is not None:
+            return cached
+
+        while True:
+            try:
+                self._breaker.check()
+                # Semaphore caps in-flight requests, limiter keeps us under the TPM budget
+                async with self._sem:
+                    await self._rate_limiter.acquire(len(call.combined_prompt) // 4 + ESTIMATED_OUTPUT_TOKENS)
+                    response = await self._aclient_no_retry.responses.create(**call.request())
+                self._breaker.record_success()
+                result, entry = call.parse(response)
+                await asyncio.to_thread(cache_service.set_json, call.cache_key, entry, config.LLM_CACHE_TTL)
+                return result
+            except Exception as e:
+                delay = call.retry_delay(e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _a_create_with_backoff(self, request: dict):
+        """
+        One responses.create call behind the breaker, semaphore and TPM limiter;
+        transient API errors back off through _retry_delay like a_get_json_response.
+        """
+        self._bind_loop()
+        api_attempt = 0
+        while True:
+            try:
+                self._breaker.check()
+                async with self._sem:
+                    await self._rate_limiter.acquire(len(request["input"]) // 4 + ESTIMATED_OUTPUT_TOKENS)
+                    response = await self._aclient_no_retry.responses.create(**request)
+                self._breaker.record_success()
+                return response
+            except Exception as e:
+                delay = self._retry_delay(e, api_attempt)
+                if delay is None:
+                    raise
+                api_attempt += 1
+                logger.warning("Transient OpenAI error (attempt %d/%d), retrying in %.1fs: %s", api_attempt, MAX_API_RETRIES, delay, e)
+                await asyncio.sleep(delay)
+
+    async def _a_stream_array(self, request: dict, array_key: str, final: dict) -> AsyncIterator[dict]:
+        """
+        Stream a responses request and yield each completed element of result[array_key].
+        Transient errors back off like a_get_json_response, but only until the first element
+        has been yielded (a retry after that would repeat items). The full output text is
+        left in final["output_text"] once the stream ends.
+        """
+        self._bind_loop()
+        api_attempt = 0
+        while True:
+            parser = JsonArrayStreamParser(array_key)
+            yielded = False
+            try:
+                self._breaker.check()
+                async with self._sem:
+                    await self._rate_limiter.acquire(len(request["input"]) // 4 + ESTIMATED_OUTPUT_TOKENS)
+                    async with self._aclient_no_retry.responses.stream(**request) as stream:
+                        async for event in stream:
+                            if event.type == "response.output_text.delta":
+                                for item in parser.feed(event.delta):
+                                    yielded = True
+                                    yield item
+                        final_response = await stream.get_final_response()
+                self._breaker.record_success()
+                final["output_text"] = final_response.output_text
+                return
+            except Exception as e:
+                delay = self._retry_delay(e, api_attempt)
+                if delay is None or yielded:
+                    raise
+                api_attempt += 1
+                logger.warning("Transient OpenAI stream error (attempt %d/%d), retrying in %.1fs: %s", api_attempt, MAX_API_RETRIES, delay, e)
+                await asyncio.sleep(delay)
+
+    async def _a_single_call(self, model: str, system_prompt: str, user_prompt: str, text_format: dict = None) -> dict:
+        """One async request to a specific model, no JSON retries (used for racing)"""
+        combined_prompt = f"{system_prompt}\n\n{user_prompt}" if text_format else f"{system_prompt}\n\n{user_prompt}\n\n{JSON_ONLY_INSTRUCTION}"
+        response = await self._a_create_with_backoff(self._json_request(combined_prompt, text_format, model))
+        return orjson.loads(response.output_text)
+
+    async def a_race_json(self, system_prompt: str, user_prompt: str, models: tuple = ("gpt-4o-mini", "gpt-5"), text_format: dict = None) -> dict:
+        """
+        Send the same prompt to several models at once and return the first valid JSON.
+        The remaining requests are cancelled; if the fastest model fails, the next one to finish is used.
+        """
+        tasks = {asyncio.create_task(self._a_single_call(model, system_prompt, user_prompt, text_format)): model for model in models}
+        pending = set(tasks)
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning("Race candidate %s failed: %s", tasks[task], e)
+                        continue
+                    if result:
+                        logger.info("Race won by %s", tasks[task])
+                        return result
+        finally:
+            for task in pending:
+                task.cancel()
+        raise Exception(f"All raced models failed: {last_error}")
+
+    async def a_get_json_streaming(self, system_prompt: str, user_prompt: str, array_key: str, on_item: Callable[[dict], Any], text_format: dict = None) -> dict:
+        """
+        Streaming variant of a_get_json_response: on_item is called (or awaited) with each
+        element of result[array_key] as soon as it is complete in the output stream, so
+        downstream work can start while later items are still being generated.
+
+        Args:
+            array_key: Top-level array whose elements are delivered early (e.g. "scenes")
+            on_item: Sync or async callback receiving each completed element
+            text_format: Optional structured output format
+
+        Returns:
+            parsed_json: The complete response, parsed once the stream ends
+        """
+        combined_prompt = f"{system_prompt}\n\n{user_prompt}" if text_format else f"{system_prompt}\n\n{user_prompt}\n\n{JSON_ONLY_INSTRUCTION}"
+        self._bind_loop()
+
+        async def deliver(item: dict):
+            result = on_item(item)
+            if inspect.isawaitable(result):
+                await result
+
+        # Same cache key as a_get_json_response, so streamed and non-streamed calls share results
+        request = self._json_request(combined_prompt, text_format, model=self.quality_model)
+        cache_key = cache_service.make_key("llm", request)
+        cached = await asyncio.to_thread(cache_service.get_json, cache_key)
+        if cached is not None:
+            for item in cached.get(array_key, []):
+                await deliver(item)
+            return cached
+
+        final = {}
+        async for item in self._a_stream_array(request, array_key, final):
+            await deliver(item)
+
+        # Items already went out, so a malformed tail is raised rather than silently retried
+        parsed_json = self._parse_json_output(final["output_text"].strip(), 0)
+        await asyncio.to_thread(cache_service.set_json, cache_key, parsed_json, config.LLM_CACHE_TTL)
+        return parsed_json
+
+    async def a_batch_get_json(self, pairs: List[Tuple[str, str]], return_exceptions: bool = False) -> list:
+        """
+        Submit many (system_prompt, user_prompt) pairs at once.
+        The semaphore in a_get_json_response schedules them, so callers don't need to loop.
+        """
+        return await asyncio.gather(
+            *[self.a_get_json_response(system_prompt, user_prompt) for system_prompt, user_prompt in pairs],
+            return_exceptions=return_exceptions
+        )
+
+    def _get_json_batch(self, system_prompt: str, user_prompts: List[str], item_schema: dict = None) -> list:
+        """
+        Answer several independent prompts that share one system prompt in a single request,
+        so the shared prefix is paid once instead of once per item. Results are cached like
+        _get_json_response, so re-running the same items (e.g. repairing the same narration
+        lines on every LLM cache hit) costs nothing.
+
+        Args:
+            system_prompt: Shared instructions
+            user_prompts: Independent items to answer
+            item_schema: Optional JSON schema for one result object (enables strict structured output)
+
+        Returns:
+            List of result objects, parallel to user_prompts
+        """
+        n = len(user_prompts)
+        if n == 0:
+            return []
+
+        items = "\n".join(f"{i + 1}. {prompt}" for i, prompt in enumerate(user_prompts))
+        combined_prompt = (
+            f"{system_prompt}\n\n"
+            f"Return a JSON object {{\"results\": [...]}} with exactly {n} objects, one per item below, in the same order:\n"
+            f"{items}"
+        )
+
+        if item_schema:
+            text_format = json_schema_format("BatchResults", _object({"results": {"type": "array", "items": item_schema}}))
+        else:
+            text_format = {"type": "json_object"}
+
+        request = self._json_request(combined_prompt, text_format, model=self.quality_model)
+        cache_key = cache_service.make_key("llm", request)
+        cached = cache_service.get_json(cache_key)
+        if cached is not None:
+            logger.debug("LLM cache hit %s", cache_key)
+            return cached
+
+        response = self.client.responses.create(**request)
+        results = orjson.loads(response.output_text)["results"]
+
+        # Structured output guarantees shape, not item count
+        if len(results) != n:
+            raise Exception(f"Batched JSON response returned {len(results)} results for {n} prompts")
+
+        logger.info("Batched %d prompts into one request", n)
+        cache_service.set_json(cache_key, results, config.LLM_CACHE_TTL)
+        return results
+
+    # ===== BATCH API (offline, 50% cheaper, results within 24h) =====
+
+    def submit_blueprint_batch(self, jobs: List[Dict[str, Any]]) -> str:
+        """
+        Submit many Story Director requests through the OpenAI Batch API.
+
+        Args:
+            jobs: List of create_story_blueprint keyword arguments (one per story)
+
+        Returns:
+            Batch ID to pass to poll_batch
+        """
+        lines = []
+        for i, job in enumerate(jobs):
+            system_prompt, user_prompt = self._story_blueprint_prompts(**job)
+            lines.append(orjson.dumps({
+                "custom_id": f"scene_{i}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": self._json_request(
+                    f"{system_prompt}\n\n{user_prompt}",
+                    json_schema_format("StoryBlueprint", STORY_BLUEPRINT_SCHEMA),
+                    model=self.quality_model
+                )
+            }).decode())
+
+        batch_file = self.client.files.create(
+            file=("blueprint_batch.jsonl", io.BytesIO("\n".join(lines).encode("utf-8"))),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/responses",
+            completion_window="24h"
+        )
+        logger.info("Submitted blueprint batch %s with %d jobs", batch.id, len(jobs))
+        return batch.id
+
+    def poll_batch(self, batch_id: str, poll_interval: float = 10, max_interval: float = 300, timeout: float = 24 * 3600) -> Dict[str, Any]:
+        """
+        Wait for a batch to finish (exponential backoff between checks) and download its results.
+
+        Returns:
+            Dict mapping custom_id to parsed JSON (or None if that request failed)
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            logger.info("Batch %s status: %s", batch_id, batch.status)
+
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise Exception(f"Batch {batch_id} ended with status: {batch.status}")
+            if time.monotonic() > deadline:
+                raise Exception(f"Batch {batch_id} did not complete within {timeout} seconds")
+
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_interval)
+
+        results = {}
+        if batch.output_file_id:
+            content = self.client.files.content(batch.output_file_id).text
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    logger.warning("Batch request %s failed: %s", item.get('custom_id'), item.get('error'))
+                    results[item["custom_id"]] = None
+                    continue
+                try:
+                    results[item["custom_id"]] = orjson.loads(self._batch_output_text(response["body"]))
+                except json.JSONDecodeError as e:
+                    logger.warning("Batch request %s returned invalid JSON: %s", item['custom_id'], e)
+                    results[item["custom_id"]] = None
+
+        logger.info("Batch %s completed: %d results", batch_id, len(results))
+        return results
+
+    def _batch_output_text(self, body: dict) -> str:
+        """Extract output text from a raw Responses API body (batch output has no output_text helper)"""
+        texts = []
+        for output in body.get("output", []):
+            if output.get("type") != "message":
+                continue
+            for content in output.get("content", []):
+                if content.get("type") == "output_text":
+                    texts.append(content.get("text", ""))
+        return "".join(texts).strip()
+
+    def _character_description_messages(self, image_url: str) -> list:
+        return [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": CHARACTER_DESCRIPTION_REQUEST
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
+                    }
+                ]
+            }
+        ]
+
+    def describe_uploaded_character(self, image_url: str) -> str:
+        """
+        Use GPT-4 Vision to analyze an uploaded character image and return a detailed description.
+        This description is used to create better prompts for character generation.
+        """
+        # Re-uploads of the same image never get re-described
+        cache_key = cache_service.make_key("vision", "gpt-4o", image_url)
+        cached = cache_service.get_json(cache_key)
+        if cached is not None:
+            logger.info("Character description cache hit for %s", image_url)
+            return cached
+
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o",
+                messages=self._character_description_messages(image_url),
+                max_tokens=300
+            )
+            description = response.choices[0].message.content
+            cache_service.set_json(cache_key, description, config.LLM_CACHE_TTL)
+            return description
+        except Exception as e:
+            logger.error("Error in describe_uploaded_character (%s): %s", type(e).__name__, e)
+            raise
+
+    async def _a_inline_image(self, image_url: str) -> str:
+        """
+        Download an image and return it as a base64 data URL, so OpenAI doesn't have to fetch it
+        server-side. Falls back to the original URL if the download fails.
+        """
+        self._bind_loop()
+        try:
+            response = await self._http.get(image_url, headers={"Accept-Encoding": "gzip"})
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning("Could not prefetch %s, sending URL instead: %s", image_url, e)
+            return image_url
+
+        mime = response.headers.get("content-type", "").split(";")[0].strip()
+        if not mime.startswith("image/"):
+            mime = mimetypes.guess_type(image_url)[0] or "image/png"
+        return f"data:{mime};base64,{base64.b64encode(response.content).decode('ascii')}"
+
+    async def a_describe_uploaded_character(self, image_url: str) -> str:
+        """Async version of describe_uploaded_character (image bytes are inlined as a data URL)"""
+        cache_key = cache_service.make_key("vision", "gpt-4o", image_url)
+        cached = await asyncio.to_thread(cache_service.get_json, cache_key)
+        if cached is not None:
+            logger.info("Character description cache hit for %s", image_url)
+            return cached
+
+        try:
+            inline_url = await self._a_inline_image(image_url)
+            response = await self.aclient.chat.completions.create(
+                model="gpt-4o",
+                messages=self._character_description_messages(inline_url),
+                max_tokens=300
+            )
+            description = response.choices[0].message.content
+            await asyncio.to_thread(cache_service.set_json, cache_key, description, config.LLM_CACHE_TTL)
+            return description
+        except Exception as e:
+            logger.error("Error in a_describe_uploaded_character (%s): %s", type(e).__name__, e)
+            raise
+
+    async def a_describe_many(self, image_urls: List[str]) -> List[str]:
+        """Describe several uploaded images concurrently (downloads and vision calls overlap)"""
+        return await asyncio.gather(*[self.a_describe_uploaded_character(url) for url in image_urls])
+
+    # ===== MULTI-AGENT SYSTEM =====
+
+    def create_story_summary(self, character_name: str, character_type: str, personality: str, themes: str, num_scenes: int, return_response_id: bool = False):
+        """
+        AGENT 0.5: Story Planner - Creates a complete story summary BEFORE breaking into scenes
+        This ensures story cohesion and prevents random elements from appearing
+
+        With return_response_id=True the response is stored server-side and (summary, response_id)
+        is returned; pass the id to create_story_blueprint(planner_response_id=...) to chain on it.
+        """
+        return self._get_json_response(*self._story_summary_prompts(character_name, character_type, personality, themes, num_scenes), text_format=json_schema_format("StorySummary", STORY_SUMMARY_SCHEMA), store=return_response_id)
+
+    async def a_create_story_summary(self, character_name: str, character_type: str, personality: str, themes: str, num_scenes: int, race: bool = False, return_response_id: bool = False):
+        """
+        Async version of create_story_summary (AGENT 0.5)
+        With race=True, gpt-4o-mini and gpt-5 run in parallel and the first valid plan wins.
+        Racing does not store responses, so it cannot be combined with return_response_id.
+        """
+        prompts = self._story_summary_prompts(character_name, character_type, personality, themes, num_scenes)
+        text_format = json_schema_format("StorySummary", STORY_SUMMARY_SCHEMA)
+        if race and not return_response_id:
+            return await self.a_race_json(*prompts, text_format=text_format)
+        return await self.a_get_json_response(*prompts, text_format=text_format, store=return_response_id)
+
+    def _story_summary_prompts(self, character_name: str, character_type: str, personality: str, themes: str, num_scenes: int) -> tuple:
+        """Build (system_prompt, user_prompt) for the Story Planner"""
+
+        # Determine story complexity based on scene count
+        if num_scenes <= 6:
+            complexity = "SHORT & SIMPLE"
+            detail_level = "Keep it very simple - straightforward beginning, middle, end with minimal complications"
+        elif num_scenes <= 10:
+            complexity = "MEDIUM DETAIL"
+            detail_level = "Include some challenges and development, but keep plot manageable"
+        else:  # 12-15 scenes
+            complexity = "MORE DETAILED"
+            detail_level = "Can include more plot points and character development, but still clear and followable"
+
+        # Static rules first (cacheable prefix), per-story details last
+        system_prompt = STORY_SUMMARY_RULES + STORY_SUMMARY_REQUEST_TMPL.format_map({
+            "num_scenes": num_scenes,
+            "character_name": character_name,
+            "character_type": character_type,
+            "personality": personality,
+            "themes": themes,
+            "complexity": complexity,
+            "detail_level": detail_level
+        })
+
+        user_prompt = STORY_SUMMARY_USER_TMPL.format_map({
+            "num_scenes": num_scenes,
+            "character_name": character_name,
+            "character_type": character_type,
+            "themes": themes
+        })
+
+        return system_prompt, user_prompt
+
+    def create_story_blueprint(self, character_name: str, character_type: str, character_prompt: str, personality: str, themes: str, num_scenes: int, story_summary: dict = None, language: str = "English", planner_response_id: str = None) -> dict:
+        """
+        AGENT 1: Story Director - Creates detailed scene-by-scene story breakdown
+        This is the MOST IMPORTANT agent - it creates the foundation for all others
+
+        With planner_response_id the request chains on the stored Story Planner response
+        instead of re-embedding story_summary in the prompt.
+        """
+        return self._get_json_response(*self._story_blueprint_prompts(
+            character_name, character_type, character_prompt, personality, themes, num_scenes, story_summary, language, planner_response_id
+        ), text_format=json_schema_format("StoryBlueprint", STORY_BLUEPRINT_SCHEMA), previous_response_id=planner_response_id)
+
+    async def a_create_story_blueprint(self, character_name: str, character_type: str, character_prompt: str, personality: str, themes: str, num_scenes: int, story_summary: dict = None, language: str = "English", planner_response_id: str = None) -> dict:
+        """Async version of create_story_blueprint (AGENT 1)"""
+        return await self.a_get_json_response(*self._story_blueprint_prompts(
+            character_name, character_type, character_prompt, personality, themes, num_scenes, story_summary, language, planner_response_id
+        ), text_format=json_schema_format("StoryBlueprint", STORY_BLUEPRINT_SCHEMA), previous_response_id=planner_response_id)
+
+    async def a_stream_blueprint(self, character_name: str, character_type: str, character_prompt: str, personality: str, themes: str, num_scenes: int, story_summary: dict = None, language: str = "English") -> AsyncIterator[dict]:
+        """
+        Streaming AGENT 1: yields each scene blueprint as soon as it is complete in the output stream.
+        The full blueprint is cached under the same key a_create_story_blueprint uses,
+        so a follow-up call for side_characters/story_summary costs nothing.
+        """
+        system_prompt, user_prompt = self._story_blueprint_prompts(
+            character_name, character_type, character_prompt, personality, themes, num_scenes, story_summary, language
+        )
+        text_format = json_schema_format("StoryBlueprint", STORY_BLUEPRINT_SCHEMA)
+        request = self._json_request(f"{system_prompt}\n\n{user_prompt}", text_format, model=self.quality_model)
+        cache_key = cache_service.make_key("llm", request)
+
+        cached = await asyncio.to_thread(cache_service.get_json, cache_key)
+        if cached is not None:
+            for scene in cached.get("scene_blueprints", []):
+                yield scene
+            return
+
+        final = {}
+        async for scene in self._a_stream_array(request, "scene_blueprints", final):
+            yield scene
+
+        blueprint = orjson.loads(final["output_text"])
+        await asyncio.to_thread(cache_service.set_json, cache_key, blueprint, config.LLM_CACHE_TTL)
+
+    def _story_blueprint_prompts(self, character_name: str, character_type: str, character_prompt: str, personality: str, themes: str, num_scenes: int, story_summary: dict = None, language: str = "English", planner_response_id: str = None) -> tuple:
+        """Build (system_prompt, user_prompt) for the Story Director"""
+        character_visual_context = f"\n- Visual Details: {character_prompt}" if character_prompt else ""
+
+        # Include story summary if provided (from Agent 0.5)
+        story_context = ""
+        if planner_response_id:
+            # The plan is already in the chained conversation, only point at it
+            story_context = STORY_CONTEXT_CHAINED_TMPL.format_map({"num_scenes": num_scenes})
+        elif story_summary:
+            # Key-sorted so equal summaries share the _build_story_context cache entry
+            story_context = _build_story_context(_prompt_json(story_summary, sort_keys=True), num_scenes)
+        else:
+            story_context = "**YOUR JOB:** Create an original story and break it into scenes."
+
+        # Static rules first (cacheable prefix), per-story details last
+        system_prompt = STORY_BLUEPRINT_RULES + STORY_BLUEPRINT_REQUEST_TMPL.format_map({
+            "num_scenes": num_scenes,
+            "character_name": character_name,
+            "character_type": character_type,
+            "character_visual_context": character_visual_context,
+            "personality": personality,
+            "themes": themes,
+            "story_context": story_context
+        })
+
+        user_prompt = STORY_BLUEPRINT_USER_TMPL.format_map({
+            "num_scenes": num_scenes,
+            "character_name": character_name,
+            "character_type": character_type,
+            "personality": personality,
+            "themes": themes,
+            "language": language
+        })
+        return system_prompt, user_prompt
+
+    def write_scene_narrations(self, blueprint: dict, character_name: str, character_type: str, character_prompt: str, personality: str, language: str = "Korean") -> dict:
+        """
+        AGENT 2: Script Writer - Converts story scenes into TTS-ready narration
+        Takes the "what_happens" from Agent 1 and turns it into spoken storytelling
+
+        THIS IS A CRITICAL AGENT - The narration is the ONLY way listeners understand the story!
+        """
+        system_prompt, user_prompt = self._scene_narration_prompts(
+            blueprint, character_name, character_type, character_prompt, personality, language, self._use_slim_narration_prompt()
+        )
+        text_format = json_schema_format("SceneNarrations", NARRATION_SCHEMA)
+        cached = self._narration_cached(system_prompt, user_prompt, text_format)
+        script_data = self._get_json_response(system_prompt, user_prompt, text_format=text_format)
+        return self._repair_narrations(script_data, record_compliance=not cached)
+
+    async def a_write_scene_narrations(self, blueprint: dict, character_name: str, character_type: str, character_prompt: str, personality: str, language: str = "Korean", window_size: int = None, on_scene: Callable[[dict], Any] = None) -> dict:
+        """
+        Async version of write_scene_narrations (AGENT 2)
+
+        Args:
+            window_size: Scenes per request (defaults to NARRATION_WINDOW_SIZE, 0 = one request).
+                Windows run in parallel; each sees the full blueprint for continuity but only
+                writes its own scenes, so a failed window is retried without re-billing the rest.
+            on_scene: Optional sync/async callback receiving each finished scene while the
+                response is still streaming (single-request mode only). Lines that fail the
+                length check are delivered after they have been repaired.
+
+        Returns:
+            script_data: {"story_title": ..., "scenes": [...]} as from write_scene_narrations
+        """
+        slim = await asyncio.to_thread(self._use_slim_narration_prompt)
+        system_prompt, user_prompt = self._scene_narration_prompts(
+            blueprint, character_name, character_type, character_prompt, personality, language, slim
+        )
+        text_format = json_schema_format("SceneNarrations", NARRATION_SCHEMA)
+        if window_size is None:
+            window_size = config.NARRATION_WINDOW_SIZE
+
+        scene_numbers = [scene.get("scene_number", i + 1) for i, scene in enumerate(blueprint.get("scene_blueprints", []))]
+
+        if on_scene is not None:
+            # Stream valid lines straight to the caller; hold back the ones that need repair
+            held_back = []
+
+            async def deliver_if_valid(scene: dict):
+                if self._narration_ok(scene.get("narration_text", "")):
+                    result = on_scene(scene)
+                    if inspect.isawaitable(result):
+                        await result
+                else:
+                    held_back.append(scene.get("scene_number"))
+
+            cached = await asyncio.to_thread(self._narration_cached, system_prompt, user_prompt, text_format)
+            script_data = await self.a_get_json_streaming(system_prompt, user_prompt, "scenes", deliver_if_valid, text_format=text_format)
+            script_data = await asyncio.to_thread(self._repair_narrations, script_data, not cached)
+            for scene in script_data.get("scenes", []):
+                if scene.get("scene_number") in held_back:
+                    result = on_scene(scene)
+                    if inspect.isawaitable(result):
+                        await result
+            return script_data
+
+        if window_size <= 0 or len(scene_numbers) <= window_size:
+            cached = await asyncio.to_thread(self._narration_cached, system_prompt, user_prompt, text_format)
+            script_data = await self.a_get_json_response(system_prompt, user_prompt, text_format=text_format)
+            return await asyncio.to_thread(self._repair_narrations, script_data, not cached)
+
+        windows = [scene_numbers[i:i + window_size] for i in range(0, len(scene_numbers), window_size)]
+        window_prompts = [
+            user_prompt + NARRATION_WINDOW_TMPL.format_map({
+                "first_scene": window[0],
+                "last_scene": window[-1]
+            })
+            for window in windows
+        ]
+        cached = await asyncio.gather(*[
+            asyncio.to_thread(self._narration_cached, system_prompt, window_prompt, text_format)
+            for window_prompt in window_prompts
+        ])
+        results = await asyncio.gather(*[
+            self._a_narration_window(system_prompt, window_prompt, window, text_format)
+            for window, window_prompt in zip(windows, window_prompts)
+        ])
+
+        scenes = [scene for result in results for scene in result["scenes"]]
+        scenes.sort(key=lambda scene: scene.get("scene_number", 0))
+
+        script_data = {"story_title": results[0].get("story_title", "Untitled Story"), "scenes": scenes}
+        # Only a fully fresh set of windows says anything about the current rules
+        return await asyncio.to_thread(self._repair_narrations, script_data, not any(cached))
+
+    async def _a_narration_window(self, system_prompt: str, window_prompt: str, window: list, text_format: dict) -> dict:
+        """
+        Run one narration window and keep only the scenes it was asked for.
+        A window missing any of its scenes is re-requested (with the missing numbers spelled out,
+        which also gives it a fresh cache key) and raises once NARRATION_WINDOW_RETRIES is used up.
+        """
+        wanted = set(window)
+        prompt = window_prompt
+        for attempt in range(NARRATION_WINDOW_RETRIES + 1):
+            result = await self.a_get_json_response(system_prompt, prompt, text_format=text_format)
+            scenes = [scene for scene in result.get("scenes", []) if scene.get("scene_number") in wanted]
+            missing = sorted(wanted - {scene.get("scene_number") for scene in scenes})
+            if not missing:
+                return {"story_title": result.get("story_title", "Untitled Story"), "scenes": scenes}
+            logger.warning("Narration window %s-%s is missing scene(s) %s (attempt %d/%d)",
+                           window[0], window[-1], missing, attempt + 1, NARRATION_WINDOW_RETRIES + 1)
+            prompt = window_prompt + NARRATION_WINDOW_MISSING_TMPL.format_map({
+                "missing_scenes": ", ".join(str(n) for n in missing),
+                "first_scene": window[0],
+                "last_scene": window[-1]
+            })
+        raise Exception(f"Narration window {window[0]}-{window[-1]} is missing scene(s) {missing}")
+
+    def _use_slim_narration_prompt(self) -> bool:
+        """Slim prompt once the model has produced NARRATION_SLIM_AFTER clean outputs in a row"""
+        if config.NARRATION_SLIM_AFTER <= 0:
+            return False
+        return cache_service.get_int(self._narration_compliance_key()) >= config.NARRATION_SLIM_AFTER
+
+    def _record_narration_compliance(self, passed: bool):
+        """Extend the clean streak, or reset it (back to the full prompt) on any failing line"""
+        if config.NARRATION_SLIM_AFTER <= 0:
+            return
+        if passed:
+            cache_service.incr(self._narration_compliance_key())
+        else:
+            cache_service.delete(self._narration_compliance_key())
+
+    def _narration_compliance_key(self) -> str:
+        """Streak key for the current quality model and narration rules, so a new model or edited rules start back on the full prompt"""
+        return NARRATION_COMPLIANCE_KEY_TMPL.format_map({"model": self.quality_model, "version": NARRATION_RULES_VERSION})
+
+    def _narration_cached(self, system_prompt: str, user_prompt: str, text_format: dict = None) -> bool:
+        """Whether this Script Writer request will be served from the LLM cache (cached outputs never count toward the streak)"""
+        combined_prompt = f"{system_prompt}\n\n{user_prompt}" if text_format else f"{system_prompt}\n\n{user_prompt}\n\n{JSON_ONLY_INSTRUCTION}"
+        request = self._json_request(combined_prompt, text_format, model=self.quality_model)
+        return cache_service.exists(cache_service.make_key("llm", request))
+
+    def _narration_ok(self, text: str) -> bool:
+        """Inside the narration length window, ending with a period and free of romanized names"""
+        return _check_narration(text)[0]
+
+    def _repair_narrations(self, script_data: dict, record_compliance: bool = True) -> dict:
+        """
+        Check every narration against the length window, trailing period and Latin-name rule locally,
+        and rewrite only the failing lines in one small batched request.
+
+        Args:
+            script_data: Script Writer output ({"story_title": ..., "scenes": [...]})
+            record_compliance: Update the compliance streak (False for outputs served from the LLM cache)
+
+        Returns:
+            script_data: Same object, with failing narration_text values replaced
+        """
+        bad_scenes = []
+        for scene in script_data.get("scenes", []):
+            ok, reasons = _check_narration(scene.get("narration_text", ""))
+            if not ok:
+                bad_scenes.append((scene, reasons))
+        if record_compliance:
+            self._record_narration_compliance(not bad_scenes)
+
+        if not bad_scenes:
+            return script_data
+
+        logger.info("Repairing %d narration(s) that break the length, period or Korean-name rules", len(bad_scenes))
+        try:
+            repaired = self._get_json_batch(
+                NARRATION_REPAIR_RULES,
+                [f"Scene {scene.get('scene_number')} ({'; '.join(reasons)}): {scene.get('narration_text', '')}" for scene, reasons in bad_scenes],
+                item_schema=_object({"narration_text": STRING})
+            )
+        except Exception as e:
+            # Best effort: an off-length line is still usable, so keep the originals
+            logger.warning("Narration repair failed, keeping original lines: %s", e)
+            return script_data
+
+        for (scene, _), result in zip(bad_scenes, repaired):
+            scene["narration_text"] = result["narration_text"].strip()
+        return script_data
+
+    def _scene_narration_prompts(self, blueprint: dict, character_name: str, character_type: str, character_prompt: str, personality: str, language: str = "Korean", slim: bool = False) -> tuple:
+        """Build (system_prompt, user_prompt) for the Script Writer (slim = rules without the few-shot examples)"""
+        character_visual_context = f"\n- Visual Details: {character_prompt}" if character_prompt else ""
+
+        # Static rules first (cacheable prefix), per-story details last
+        system_prompt = _render_prompt(NARRATION_RULES_SLIM if slim else NARRATION_RULES, (NARRATION_REQUEST_TMPL, {
+            "character_name": character_name,
+            "character_type": character_type,
+            "character_visual_context": character_visual_context,
+            "personality": personality,
+            "reference_examples": _narration_reference_block(character_type or "", personality or "")
+        }))
+
+        # Format blueprint for context
+        blueprint_str = _prompt_json(blueprint)
+
+        user_prompt = _render_prompt((NARRATION_USER_TMPL, {
+            "blueprint_str": blueprint_str,
+            "character_name": character_name,
+            "language": language
+        }))
+        return system_prompt, user_prompt
+
+    def create_visual_blueprint(self, story_blueprint: dict, style: str) -> dict:
+        """
+        AGENT 2.5: Visual Blueprint Director - Creates detailed visual asset library
+        Analyzes the full story and identifies all locations, objects, and visual elements
+        Creates reusable, consistent descriptions for visual consistency
+        Pure extraction over a finished story, so it runs on the fast model tier
+
+        The asset library carries no style tag, so it is memoized on the story alone:
+        re-rendering the same story in another style reuses it.
+        """
+        memo_key = self._visual_blueprint_key(story_blueprint)
+        visual_blueprint = cache_service.get_json(memo_key)
+        if visual_blueprint is not None:
+            logger.info("Reusing memoized visual blueprint")
+            return visual_blueprint
+
+        visual_blueprint = self._get_json_response(*self._visual_blueprint_prompts(story_blueprint, style), text_format=json_schema_format("VisualBlueprint", VISUAL_BLUEPRINT_SCHEMA), model=self.fast_model)
+        cache_service.set_json(memo_key, visual_blueprint, config.LLM_CACHE_TTL)
+        return visual_blueprint
+
+    async def a_create_visual_blueprint(self, story_blueprint: dict, style: str) -> dict:
+        """Async version of create_visual_blueprint (AGENT 2.5)"""
+        memo_key = self._visual_blueprint_key(story_blueprint)
+        visual_blueprint = await asyncio.to_thread(cache_service.get_json, memo_key)
+        if visual_blueprint is not None:
+            logger.info("Reusing memoized visual blueprint")
+            return visual_blueprint
+
+        visual_blueprint = await self.a_get_json_response(*self._visual_blueprint_prompts(story_blueprint, style), text_format=json_schema_format("VisualBlueprint", VISUAL_BLUEPRINT_SCHEMA), model=self.fast_model)
+        await asyncio.to_thread(cache_service.set_json, memo_key, visual_blueprint, config.LLM_CACHE_TTL)
+        return visual_blueprint
+
+    def _visual_blueprint_key(self, story_blueprint: dict) -> str:
+        """Cache key from the canonical (key-sorted) story blueprint, the prompt/schema version and the model"""
+        return cache_service.make_key("visual_blueprint", VISUAL_BLUEPRINT_VERSION, self.fast_model, story_blueprint)
+
+    def _visual_blueprint_prompts(self, story_blueprint: dict, style: str) -> tuple:
+        """Build (system_prompt, user_prompt) for the Visual Blueprint Director"""
+        # Sorted keys: the same story always renders the same prompt (and LLM cache key),
+        # whether it comes straight from the Story Director or back from the frontend
+        blueprint_str = _prompt_json(story_blueprint, sort_keys=True)
+
+        # Fully static, so every visual blueprint request shares the cached prefix
+        system_prompt = VISUAL_BLUEPRINT_RULES
+
+        user_prompt = VISUAL_BLUEPRINT_USER_TMPL.format_map({
+            "blueprint_str": blueprint_str,
+            "style": style
+        })
+        return system_prompt, user_prompt
+
+    def create_visual_prompts(self, blueprint: dict, visual_blueprint: dict, scenes_with_narration: list, character_name: str, character_type: str, character_prompt: str, style: str) -> dict:
+        """
+        AGENT 3: Visual Prompt Composer - Creates image generation prompts using visual asset library
+        Composes prompts by referencing pre-defined locations, objects from visual blueprint
+        """
+        character_visual_context = f"\n- Visual Details: {character_prompt}\n  (For character scenes, this will be added via img2img)" if character_prompt else ""
+
+        # Extract side characters info
+        side_characters = blueprint.get("side_characters", [])
+        side_characters_context = ""
+        if side_characters:
+            side_char_list = "\n".join([f"  * {char['name']}: {char['type']} - {char['description']}" for char in side_characters])
+            side_characters_context = f"\n\n**SIDE CHARACTERS IN THIS STORY:**\n{side_char_list}\n  (Use these EXACT descriptions when these characters appear in scenes)"
+
+        # Format visual blueprint for reference
+        visual_blueprint_str = _prompt_json(visual_blueprint)
+
+        # Static rules first (cacheable prefix), per-story details last
+        system_prompt = _render_prompt(VISUAL_PROMPTS_RULES, (VISUAL_PROMPTS_REQUEST_TMPL, {
+            "character_name": character_name,
+            "character_type": character_type,
+            "character_visual_context": character_visual_context,
+            "side_characters_context": side_characters_context,
+            "visual_blueprint_str": visual_blueprint_str,
+            "style": style
+        }))
+
+        # Format context for the agent
+        context = {
+            "scene_blueprints": blueprint.get("scene_blueprints", []),
+            "side_characters": blueprint.get("side_characters", []),
+            "scenes_narration": scenes_with_narration
+        }
+        context_str = _prompt_json(context)
+
+        user_prompt = _render_prompt((VISUAL_PROMPTS_USER_TMPL, {
+            "context_str": context_str,
+            "style": style,
+            "character_name": character_name,
+            "character_type": character_type,
+            "num_scenes": len(scenes_with_narration)
+        }))
+        return self._get_json_response(system_prompt, user_prompt, text_format=json_schema_format("VisualPrompts", VISUAL_PROMPTS_SCHEMA))
 
     def create_video_prompts(self, blueprint: dict, scenes_with_narration: list, image_prompts: list, character_prompt: str, style: str) -> dict:
         """
@@ -1456,7 +2702,7 @@ You are a Motion Director creating animation prompts for image-to-video generati
             "scenes": scenes_with_narration,
             "image_prompts": image_prompts
         }
-        context_str = json.dumps(context, indent=2, ensure_ascii=False)
+        context_str = _prompt_json(context)
 
         user_prompt = f"""Create simple, direct motion prompts for image-to-video generation.
 
@@ -1714,6 +2960,18 @@ Each prompt creates a slight variation of the SAME character (different expressi
         """
         Generate a detailed image prompt for a side character that matches the main character's visual style.
         """
+        system_prompt, user_prompt = self._side_character_prompts(character_name, character_type, character_description, style, main_character_prompt)
+        response = self._get_json_response(system_prompt, user_prompt)
+        return response.get("prompt", f"{character_description}, {style}, front view, full body, white background")
+
+    async def a_create_side_character_image_prompt(self, character_name: str, character_type: str, character_description: str, style: str, main_character_prompt: str = "") -> str:
+        """Async version of create_side_character_image_prompt"""
+        system_prompt, user_prompt = self._side_character_prompts(character_name, character_type, character_description, style, main_character_prompt)
+        response = await self.a_get_json_response(system_prompt, user_prompt)
+        return response.get("prompt", f"{character_description}, {style}, front view, full body, white background")
+
+    def _side_character_prompts(self, character_name: str, character_type: str, character_description: str, style: str, main_character_prompt: str = "") -> tuple:
+        """Build (system_prompt, user_prompt) for a side character image prompt"""
         main_char_context = ""
         if main_character_prompt:
             main_char_context = f"\n\n**Main Character's Visual Style Reference:**\n{main_character_prompt}\n\nThe side character should match this visual style and rendering quality."
@@ -1777,8 +3035,7 @@ WRONG: "{style}, front view, kind old man..." ❌ (Lost details!)
 DO NOT include any explanations, only the JSON output.
 """
         user_prompt = f"Generate the image prompt for side character: {character_name} ({character_type})"
-        response = self._get_json_response(system_prompt, user_prompt)
-        return response.get("prompt", f"{character_description}, {style}, front view, full body, white background")
+        return system_prompt, user_prompt
 
     def create_style_conversion_prompts(self, style: str, character_description: str = "") -> list[str]:
         """
@@ -1846,64 +3103,15 @@ DO NOT include any explanations, only the JSON output.
         context-aware run to ensure visual and narrative cohesion.
         ENFORCES: Only main character consistency, no secondary characters.
         """
-        system_prompt = f"""
-You are a world-class Director of Photography for an AI animation studio. Your task is to take a complete story script and a style guide and generate a full storyboard with all the necessary prompts.
-
-**CRITICAL GOAL: VISUAL COHESION & CHARACTER CONSISTENCY**
-The prompts must create a sequence of images and videos that feel like they are from the SAME film. Lighting and color must transition logically.
-
-**SCENE TYPE HANDLING:**
-
-1. **"character" scene (uses img2img with character reference):**
-   - Character reference images will be provided to the AI
-   - Your prompt should describe the SCENE, ENVIRONMENT, and ACTIONS
-   - DO NOT describe character appearances (they're in the reference images)
-   - You can mention generic background elements: "surrounded by butterflies", "trees swaying", "flowers blooming"
-   - Example GOOD: "{style}, Character playing in a sunny meadow with butterflies flying around – Bright daylight – Medium shot; Character jumping joyfully among wildflowers."
-
-2. **"scenery" scene (pure environment, NO img2img):**
-   - NO characters should be visible AT ALL
-   - Focus only on environment, mood, atmosphere
-   - Sets up the location/mood for the next scene
-   - Example: "{style}, Deep forest with sunlight filtering through leaves – Dappled light – Wide shot; Peaceful forest clearing with morning mist."
-
-**IMAGE PROMPT FORMAT:**
--   You MUST generate one image prompt for every scene provided.
--   The art style is fixed: **{style}**. This MUST be the first part of every prompt.
--   Format: `{style}, [Setting/Action] – [Lighting] – [Camera Shot]; [Composition details].`
--   Keep prompts focused on environment and mood
--   Avoid introducing secondary characters that would appear across multiple scenes
-
-**VIDEO PROMPT RULES:**
--   You MUST generate one video prompt for every scene provided.
--   The prompt must describe a SINGLE, simple, continuous camera movement
--   Focus on camera motion, not character actions
--   Examples: "The camera slowly dollies forward", "The camera gently pans right", "The camera tilts up to reveal the sky"
--   Keep it simple and cinematic
-
-**CONSISTENCY RULES:**
--   Maintain consistent lighting mood throughout the story (unless intentional transition)
--   Color palette should feel cohesive across all scenes
--   Camera shot variety: mix wide shots, medium shots, and close-ups
--   Transitions should feel natural (don't jump from night to day abruptly)
-
-**Your output MUST be a single, valid JSON object with two keys:**
-1.  `image_prompts`: A list of strings, one for each scene.
-2.  `video_prompts`: A list of strings, one for each scene.
-"""
-        full_context = json.dumps(story_data, indent=2)
-        user_prompt = f"""Here is the complete story data and style guide. Generate the master storyboard JSON based on it.
+        # Static rules first (cacheable prefix), per-request style and story data last
+        system_prompt = _render_prompt(MASTER_STORYBOARD_RULES, (MASTER_STORYBOARD_REQUEST_TMPL, {"style": style}))
+        user_prompt = _render_prompt((MASTER_STORYBOARD_USER_TMPL, {"full_context": _prompt_json(_without_urls(story_data))}))
+        return self._get_json_response(system_prompt, user_prompt)
 
-CRITICAL REMINDERS:
-- main_character scenes: Focus on environment and action, NOT character appearance (reference image provides that)
-- scenery scenes: Pure environment only, NO characters
-- NO secondary characters that need visual consistency
-- Generic elements only (butterflies, trees, flowers, etc.)
+@functools.lru_cache(maxsize=1)
+def get_llm_agent() -> LLMAgent:
+    """Process-wide LLMAgent (usable as a FastAPI dependency: Depends(get_llm_agent))"""
+    return LLMAgent()
 
-Story Data:
-```json
-{full_context}
-```"""
-        return self._get_json_response(system_prompt, user_prompt)
 
-llm_agent = LLMAgent()
\ No newline at end of file
+llm_agent = get_llm_agent()
@@ -0,0 +1,81 @@
+"""
+Narration Example Pool for the Script Writer
+Reference lines injected into the narration prompt, picked per story by character type and personality
+"""
+
+# Each example: blueprint sentence -> Korean narration line (23-28 chars, ending with a period).
+# character_types lists the English and Korean words a story's character_type is matched against.
+NARRATION_EXAMPLE_POOL = [
+    {
+        "character_types": ["boy", "child", "소년", "아이"],
+        "personality": "kind dreamy",
+        "blueprint": "There was a kind boy named Ben who lived in Pine Valley and dreamed of seeing Whispering Falls",
+        "narration": "상냥한 소년 벤이 소나무골에서 폭포를 꿈꿨어요."
+    },
+    {
+        "character_types": ["boy", "child", "소년", "아이"],
+        "personality": "curious brave",
+        "blueprint": "Ben meets a cloaked traveler on forest path",
+        "narration": "벤은 숲길에서 망토 입은 나그네를 만났답니다."
+    },
+    {
+        "character_types": ["person", "traveler", "사람", "나그네"],
+        "personality": "friendly",
+        "blueprint": "Traveler introduces himself as Mira",
+        "narration": "나그네가 자신을 미라라고 소개하며 웃었답니다."
+    },
+    {
+        "character_types": ["boy", "child", "소년", "아이"],
+        "personality": "brave careful",
+        "blueprint": "Ben and Mira cross stepping stones together",
+        "narration": "벤과 미라는 함께 조심조심 징검다리를 건넜어요."
+    },
+    {
+        "character_types": ["cat", "kitten", "고양이"],
+        "personality": "curious energetic",
+        "blueprint": "Tom runs and notices a bird on the window",
+        "narration": "톰은 달리다가 창가에 앉은 새를 발견했답니다."
+    },
+    {
+        "character_types": ["cat", "kitten", "고양이"],
+        "personality": "playful mischievous",
+        "blueprint": "There was a playful cat named Coco who lived in a cozy house and wanted to bake a cake",
+        "narration": "장난꾸러기 고양이 코코는 케이크를 굽고 싶었어요."
+    },
+    {
+        "character_types": ["fox", "여우"],
+        "personality": "brave adventurous",
+        "blueprint": "There was a brave fox named Mimi who lived in the forest and wanted to find the rainbow flower",
+        "narration": "용감한 여우 미미는 무지개 꽃을 찾고 싶었어요."
+    },
+    {
+        "character_types": ["bird", "파랑새"],
+        "personality": "shy lonely",
+        "blueprint": "Blue the bird sits on a branch feeling lonely",
+        "narration": "파랑새 블루는 나뭇가지에 혼자 앉아 있었어요."
+    },
+    {
+        "character_types": ["girl", "child", "소녀", "아이"],
+        "personality": "cheerful curious",
+        "blueprint": "Cheerful girl Sora looks for shells at the beach",
+        "narration": "밝은 소녀 소라는 바닷가에서 조개를 찾았어요."
+    },
+    {
+        "character_types": ["rabbit", "bunny", "토끼"],
+        "personality": "gentle kind",
+        "blueprint": "Toby the rabbit shares carrots with his friends",
+        "narration": "토끼 토비는 친구들과 당근을 나눠 먹었답니다."
+    },
+    {
+        "character_types": ["dragon", "용"],
+        "personality": "kind lonely",
+        "blueprint": "Little dragon Puff waits for a friend on the mountain",
+        "narration": "아기 용 퍼프는 산 위에서 친구를 기다렸어요."
+    },
+    {
+        "character_types": ["dog", "puppy", "강아지"],
+        "personality": "loyal energetic",
+        "blueprint": "Max the dog digs in the garden and finds an old key",
+        "narration": "강아지 맥스는 정원에서 오래된 열쇠를 찾았어요."
+    }
+]
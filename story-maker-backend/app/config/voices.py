@@ -76,29 +76,31 @@ VOICE_LIBRARY = {
     }
 }
 
+# Lookup indexes built once at import (VOICE_LIBRARY is static)
+_BY_ID = {config["voice_id"]: config for config in VOICE_LIBRARY.values()}
+
+_ALL_VOICES = [
+    {
+        "voice_id": config["voice_id"],
+        "original_name": config["original_name"],
+        "display_name": config["display_name"],
+        "preview_script": config["preview_script"],
+        "preview_url": config["preview_url"]
+    }
+    for config in VOICE_LIBRARY.values()
+]
+
 def get_voice_by_id(voice_id: str):
     """Get voice configuration by Supertone voice ID"""
-    for name, config in VOICE_LIBRARY.items():
-        if config["voice_id"] == voice_id:
-            return config
-    return None
+    return _BY_ID.get(voice_id)
 
 def get_voice_by_name(display_name: str):
     """Get voice configuration by display name"""
     return VOICE_LIBRARY.get(display_name)
 
 def get_all_voices():
-    """Get list of all available voices"""
-    return [
-        {
-            "voice_id": config["voice_id"],
-            "original_name": config["original_name"],
-            "display_name": config["display_name"],
-            "preview_script": config["preview_script"],
-            "preview_url": config["preview_url"]
-        }
-        for config in VOICE_LIBRARY.values()
-    ]
+    """Get list of all available voices (shared list - do not mutate)"""
+    return _ALL_VOICES
 
 def get_preview_script(voice_name: str) -> str:
     """Get preview script for a voice"""
@@ -10,6 +10,65 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # KIE AI API Key (for image and video generation)
 KIE_API_KEY = os.getenv("KIE_API_KEY")
 
+# Max concurrent KIE createTask calls per process (polling is not limited)
+KIE_MAX_CONCURRENCY = int(os.getenv("KIE_MAX_CONCURRENCY", "8"))
+
+# Max concurrent Supertone TTS requests per process (Supertone rate-limits per minute)
+SUPERTONE_MAX_CONCURRENCY = int(os.getenv("SUPERTONE_MAX_CONCURRENCY", "8"))
+
+# How long (seconds) identical TTS requests reuse the narration audio stored in S3 (0 = disabled)
+TTS_CACHE_TTL = int(os.getenv("TTS_CACHE_TTL", "2592000"))
+
+# Base URL for public object links, e.g. a CloudFront domain (empty = the bucket's S3 URL)
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL", "")
+
+# Use the AWS CRT transfer client for S3 uploads when awscrt is installed (false = pure-Python boto3)
+S3_USE_CRT = os.getenv("S3_USE_CRT", "true").lower() == "true"
+
+# H.264 encoder for the final video render: "auto" (hardware if usable, else libx264) or an encoder name
+VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "auto")
+
+# PostgreSQL connection (async driver URL)
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# SQLAlchemy pool per process: persistent connections plus burst overflow (tune per deployment)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "40"))
+
+# Redis (Celery broker and LLM response cache)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Celery worker processes. Renders are CPU-bound, so default to half the cores
+# (on hardware-encode nodes, set this to the number of GPUs)
+CELERY_CONCURRENCY = int(os.getenv("CELERY_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Recycle a Celery worker process once its resident memory passes this many KB (0 = only the task count limit)
+CELERY_MAX_MEMORY_PER_CHILD = int(os.getenv("CELERY_MAX_MEMORY_PER_CHILD", "0"))
+
+# Seconds job results stay in Redis for /api/job polling
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", "3600"))
+
+# Level for the app.* loggers (DEBUG also dumps KIE payloads and raw LLM output)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# OpenAI model tiers: flagship for writing/composition, smaller model for extract/summarize agents
+OPENAI_QUALITY_MODEL = os.getenv("OPENAI_QUALITY_MODEL", "gpt-5")
+OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-5-mini")
+
+# OpenAI throttling: max in-flight requests per process and tokens-per-minute budget (0 = unlimited)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "0"))
+
+# How long (seconds) identical LLM prompts are served from the Redis response cache (0 = disabled)
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+
+# Scenes per parallel Script Writer request (0 = write all narrations in one request)
+NARRATION_WINDOW_SIZE = int(os.getenv("NARRATION_WINDOW_SIZE", "0"))
+
+# Switch the Script Writer to its slim prompt (no few-shot examples) after this many
+# consecutive outputs pass the local narration check; any failure switches back (0 = always full prompt)
+NARRATION_SLIM_AFTER = int(os.getenv("NARRATION_SLIM_AFTER", "0"))
+
 if not OPENAI_API_KEY:
     print("⚠️ WARNING: OPENAI_API_KEY environment variable is not set!")
 
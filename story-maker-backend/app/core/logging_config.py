@@ -0,0 +1,52 @@
+# app/core/logging_config.py
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+_listener = None
+_queue_handler = None
+_stream_handler = None
+
+
+def setup_logging(level: str = "INFO"):
+    """
+    Route the `app.*` loggers through a QueueHandler so hot paths (concurrent uploads,
+    TTS retries) only enqueue records; a background QueueListener thread does the stdout I/O.
+    Safe to call more than once. Forked children (Celery prefork pool) get their own listener.
+    """
+    global _queue_handler, _stream_handler
+    if _listener is not None:
+        return
+
+    _stream_handler = logging.StreamHandler(sys.stdout)
+    _stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _start_listener()
+    atexit.register(_stop_listener)
+    # Threads don't survive fork, so a child would enqueue into a queue nothing drains
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_start_listener)
+
+    app_logger = logging.getLogger("app")
+    app_logger.addHandler(_queue_handler)
+    app_logger.setLevel(level)
+    # Celery installs its own root handlers; don't print app records twice
+    app_logger.propagate = False
+
+
+def _start_listener():
+    """Start a listener thread on a fresh queue (a child must not re-print the parent's pending records)"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, _stream_handler)
+    _listener.start()
+
+
+def _stop_listener():
+    """Flush and stop this process's listener"""
+    if _listener is not None:
+        _listener.stop()
@@ -1,11 +1,8 @@
-import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from dotenv import load_dotenv
+from app.core import config
 
-load_dotenv()
-
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = config.DATABASE_URL
 
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable is not set!")
@@ -13,9 +10,17 @@ if not DATABASE_URL:
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
     pool_pre_ping=True,
+    pool_recycle=1800,
+    connect_args={
+        # Keep prepared statements for the handful of repeated project/scene queries
+        "statement_cache_size": 1024,
+        "prepared_statement_cache_size": 1024,
+        # Short OLTP queries never benefit from JIT compilation
+        "server_settings": {"jit": "off"},
+    },
 )
 
 AsyncSessionLocal = async_sessionmaker(
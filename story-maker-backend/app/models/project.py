@@ -1,15 +1,52 @@
+import os
+import time
 import uuid
-from datetime import datetime
-from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, JSON, Boolean
+import operator
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, JSON, Boolean, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
 
 
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit millisecond timestamp + 74 random bits.
+    New primary keys land at the right edge of the B-tree instead of random pages.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+# Plain columns serialized as-is by to_dict(), fetched with one attrgetter call
+_PROJECT_KEYS = (
+    "title", "style", "themes", "custom_theme", "character_name", "character_type", "personality",
+    "character_description", "character_image_url", "character_creation_method", "character_creation_step",
+    "character_options", "character_prompt", "selected_character_id", "is_character_uploaded",
+    "uploaded_character_url", "scene_count", "narration_voice", "final_video_url", "status", "current_step",
+)
+_PROJECT_GET = operator.attrgetter(*_PROJECT_KEYS)
+
+# Columns the project list view needs (list_projects loads only these)
+PROJECT_LIST_KEYS = (
+    "title", "style", "status", "character_name", "character_image_url", "scene_count", "current_step",
+)
+_PROJECT_LIST_GET = operator.attrgetter(*PROJECT_LIST_KEYS)
+
+_SCENE_KEYS = (
+    "scene_number", "scene_type", "script_text", "image_prompt", "video_prompt",
+    "image_url", "video_url", "narration_url",
+)
+_SCENE_GET = operator.attrgetter(*_SCENE_KEYS)
+
+# Naive UTC timestamps generated by Postgres (same values datetime.utcnow produced, no per-row Python call)
+UTC_NOW = func.timezone("utc", func.now())
+
+
 class Project(Base):
     __tablename__ = "projects"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     title = Column(String(255), nullable=True)
     style = Column(String(100), nullable=True)
     themes = Column(JSON, nullable=True)
@@ -31,45 +68,58 @@ class Project(Base):
     final_video_url = Column(Text, nullable=True)
     status = Column(String(20), default="draft")
     current_step = Column(String(50), default="style")  # style, category, character, scene, final
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
+    updated_at = Column(DateTime, server_default=UTC_NOW, onupdate=UTC_NOW)
 
     scenes = relationship("Scene", back_populates="project", cascade="all, delete-orphan")
 
-    def to_dict(self):
+    # list_projects orders by newest first
+    __table_args__ = (Index("ix_projects_created_at", created_at.desc()),)
+    # Fetch DB-generated timestamps via RETURNING so they're loaded after flush (no lazy load under async)
+    __mapper_args__ = {"eager_defaults": True}
+
+    # (updated_at, column dict) from the last to_dict() on this instance
+    _dict_cache = None
+
+    def to_dict(self, scenes=None):
+        # Column values only change together with updated_at; scenes have no change marker,
+        # so they're always re-serialized. Pass scenes to serialize rows already in hand
+        # instead of the (possibly unloaded) relationship.
+        if self._dict_cache is None or self._dict_cache[0] != self.updated_at:
+            self._dict_cache = (self.updated_at, self._columns_dict())
+        if scenes is None:
+            scenes = self.scenes
+        return {
+            **self._dict_cache[1],
+            "scenes": [scene.to_dict() for scene in scenes] if scenes else [],
+        }
+
+    def to_list_dict(self):
+        """Lightweight list view: summary columns plus each scene's image_url (for the thumbnail)"""
         return {
             "id": str(self.id),
-            "title": self.title,
-            "style": self.style,
-            "themes": self.themes,
-            "custom_theme": self.custom_theme,
-            "character_name": self.character_name,
-            "character_type": self.character_type,
-            "personality": self.personality,
-            "character_description": self.character_description,
-            "character_image_url": self.character_image_url,
-            "character_creation_method": self.character_creation_method,
-            "character_creation_step": self.character_creation_step,
-            "character_options": self.character_options,
-            "character_prompt": self.character_prompt,
-            "selected_character_id": self.selected_character_id,
-            "is_character_uploaded": self.is_character_uploaded,
-            "uploaded_character_url": self.uploaded_character_url,
-            "scene_count": self.scene_count,
-            "narration_voice": self.narration_voice,
-            "final_video_url": self.final_video_url,
-            "status": self.status,
-            "current_step": self.current_step,
+            **dict(zip(PROJECT_LIST_KEYS, _PROJECT_LIST_GET(self))),
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "scenes": [
+                {"scene_number": scene.scene_number, "image_url": scene.image_url}
+                for scene in sorted(self.scenes, key=lambda scene: scene.scene_number)
+            ],
+        }
+
+    def _columns_dict(self):
+        return {
+            "id": str(self.id),
+            **dict(zip(_PROJECT_KEYS, _PROJECT_GET(self))),
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "scenes": [scene.to_dict() for scene in self.scenes] if self.scenes else [],
         }
 
 
 class Scene(Base):
     __tablename__ = "scenes"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     project_id = Column(UUID(as_uuid=True), ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     scene_number = Column(Integer, nullable=False)
     scene_type = Column(String(50), nullable=True)
@@ -79,21 +129,18 @@ class Scene(Base):
     image_url = Column(Text, nullable=True)
     video_url = Column(Text, nullable=True)
     narration_url = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=UTC_NOW)
 
     project = relationship("Project", back_populates="scenes")
 
+    # Scene lookups and replacement are always by (project_id, scene_number)
+    __table_args__ = (Index("ix_scenes_project_number", "project_id", "scene_number"),)
+    __mapper_args__ = {"eager_defaults": True}
+
     def to_dict(self):
         return {
             "id": str(self.id),
             "project_id": str(self.project_id),
-            "scene_number": self.scene_number,
-            "scene_type": self.scene_type,
-            "script_text": self.script_text,
-            "image_prompt": self.image_prompt,
-            "video_prompt": self.video_prompt,
-            "image_url": self.image_url,
-            "video_url": self.video_url,
-            "narration_url": self.narration_url,
+            **dict(zip(_SCENE_KEYS, _SCENE_GET(self))),
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
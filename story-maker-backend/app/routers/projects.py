@@ -2,17 +2,22 @@ from uuid import UUID
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
-from pydantic import BaseModel
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import selectinload, load_only
+from pydantic import BaseModel, ConfigDict
 from app.database import get_db
-from app.models.project import Project, Scene
+from app.models.project import Project, Scene, PROJECT_LIST_KEYS
 
 router = APIRouter(prefix="/api/projects", tags=["projects"])
 
 
 # Pydantic models for request/response
-class SceneCreate(BaseModel):
+class RequestModel(BaseModel):
+    # Unknown client fields are dropped rather than stored; validators are built on first use, not at import
+    model_config = ConfigDict(extra="ignore", defer_build=True)
+
+
+class SceneCreate(RequestModel):
     scene_number: int
     scene_type: Optional[str] = None
     script_text: Optional[str] = None
@@ -23,13 +28,13 @@ class SceneCreate(BaseModel):
     narration_url: Optional[str] = None
 
 
-class CharacterOption(BaseModel):
+class CharacterOption(RequestModel):
     id: int
     url: str
     prompt: str
 
 
-class ProjectCreate(BaseModel):
+class ProjectCreate(RequestModel):
     title: Optional[str] = None
     style: Optional[str] = None
     themes: Optional[List[str]] = None
@@ -53,7 +58,7 @@ class ProjectCreate(BaseModel):
     current_step: Optional[str] = "style"
 
 
-class ProjectUpdate(BaseModel):
+class ProjectUpdate(RequestModel):
     title: Optional[str] = None
     style: Optional[str] = None
     themes: Optional[List[str]] = None
@@ -77,7 +82,7 @@ class ProjectUpdate(BaseModel):
     current_step: Optional[str] = None
 
 
-class ScenesUpdate(BaseModel):
+class ScenesUpdate(RequestModel):
     scenes: List[SceneCreate]
 
 
@@ -114,7 +119,8 @@ async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_
     )
     db.add(db_project)
     await db.commit()
-    await db.refresh(db_project)
+    # No refresh: id and column defaults are set in Python at flush, the timestamps come back
+    # via RETURNING (eager_defaults), and expire_on_commit=False keeps them on the instance
 
     # Return simple dict without lazy-loaded scenes (new project has no scenes)
     return {
@@ -152,14 +158,17 @@ async def create_project(project: ProjectCreate, db: AsyncSession = Depends(get_
 
 @router.get("")
 async def list_projects(db: AsyncSession = Depends(get_db)):
-    """List all projects, ordered by created_at descending."""
+    """List all projects, ordered by created_at descending (summary fields only; GET /{id} has the full project)."""
     result = await db.execute(
         select(Project)
-        .options(selectinload(Project.scenes))
+        .options(
+            load_only(*[getattr(Project, key) for key in PROJECT_LIST_KEYS], Project.created_at, Project.updated_at),
+            selectinload(Project.scenes).load_only(Scene.scene_number, Scene.image_url),
+        )
         .order_by(Project.created_at.desc())
     )
     projects = result.scalars().all()
-    return {"projects": [p.to_dict() for p in projects]}
+    return {"projects": [p.to_list_dict() for p in projects]}
 
 
 @router.get("/{project_id}")
@@ -193,15 +202,9 @@ async def update_project(project_id: UUID, project_update: ProjectUpdate, db: As
         setattr(project, key, value)
 
     await db.commit()
-    await db.refresh(project)
 
-    # Reload with scenes to avoid lazy loading issue
-    result = await db.execute(
-        select(Project)
-        .options(selectinload(Project.scenes))
-        .where(Project.id == project_id)
-    )
-    project = result.scalar_one_or_none()
+    # expire_on_commit=False keeps the columns and the scenes loaded above; ProjectUpdate never
+    # touches scenes, so no refresh/reload is needed (updated_at comes back via RETURNING)
     return {"id": str(project.id), "status": "updated", "project": project.to_dict()}
 
 
@@ -229,31 +232,18 @@ async def save_scenes(project_id: UUID, scenes_data: ScenesUpdate, db: AsyncSess
     # Delete existing scenes
     await db.execute(delete(Scene).where(Scene.project_id == project_id))
 
-    # Create new scenes
-    for scene_data in scenes_data.scenes:
-        scene = Scene(
-            project_id=project_id,
-            scene_number=scene_data.scene_number,
-            scene_type=scene_data.scene_type,
-            script_text=scene_data.script_text,
-            image_prompt=scene_data.image_prompt,
-            video_prompt=scene_data.video_prompt,
-            image_url=scene_data.image_url,
-            video_url=scene_data.video_url,
-            narration_url=scene_data.narration_url,
+    # Create new scenes in one bulk INSERT (same transaction as the DELETE above);
+    # RETURNING hands back the new rows, so the response needs no second SELECT
+    scenes = []
+    if scenes_data.scenes:
+        result = await db.scalars(
+            insert(Scene).returning(Scene),
+            [{"project_id": project_id, **scene_data.model_dump()} for scene_data in scenes_data.scenes]
         )
-        db.add(scene)
+        scenes = result.all()
 
     await db.commit()
-
-    # Refresh project with scenes
-    result = await db.execute(
-        select(Project)
-        .options(selectinload(Project.scenes))
-        .where(Project.id == project_id)
-    )
-    project = result.scalar_one_or_none()
-    return {"id": str(project_id), "status": "scenes_saved", "project": project.to_dict()}
+    return {"id": str(project_id), "status": "scenes_saved", "project": project.to_dict(scenes=scenes)}
 
 
 @router.put("/{project_id}/scenes/{scene_number}")
@@ -0,0 +1,86 @@
+import json
+import hashlib
+import logging
+import redis
+from typing import Any, Optional
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheService:
+    """
+    Small JSON cache on top of the Redis instance Celery already uses.
+    Every operation degrades to a cache miss if Redis is unavailable.
+    """
+
+    def __init__(self):
+        self.redis_url = config.REDIS_URL
+        self.client = redis.Redis.from_url(
+            self.redis_url,
+            socket_timeout=2,
+            socket_connect_timeout=2
+        )
+
+    @staticmethod
+    def make_key(namespace: str, *parts: Any) -> str:
+        """
+        Build a content-addressed cache key
+
+        Args:
+            namespace: Key prefix (e.g. "llm", "vision")
+            parts: Any JSON-serializable values that identify the cached item
+
+        Returns:
+            key: "<namespace>:<sha256 of parts>"
+        """
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get_json(self, key: str) -> Optional[Any]:
+        try:
+            raw = self.client.get(key)
+            return json.loads(raw) if raw is not None else None
+        except (redis.RedisError, ValueError) as e:
+            logger.warning("⚠️ Cache read failed for %s: %s", key, e)
+            return None
+
+    def exists(self, key: str) -> bool:
+        """Whether key is cached, without fetching or decoding the value"""
+        try:
+            return bool(self.client.exists(key))
+        except redis.RedisError as e:
+            logger.warning("⚠️ Cache read failed for %s: %s", key, e)
+            return False
+
+    def set_json(self, key: str, value: Any, ttl: int):
+        if ttl <= 0:
+            return
+        try:
+            self.client.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+        except (redis.RedisError, TypeError) as e:
+            logger.warning("⚠️ Cache write failed for %s: %s", key, e)
+
+    def get_int(self, key: str) -> int:
+        try:
+            return int(self.client.get(key) or 0)
+        except (redis.RedisError, ValueError) as e:
+            logger.warning("⚠️ Cache read failed for %s: %s", key, e)
+            return 0
+
+    def incr(self, key: str) -> int:
+        try:
+            return self.client.incr(key)
+        except redis.RedisError as e:
+            logger.warning("⚠️ Cache write failed for %s: %s", key, e)
+            return 0
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(key)
+        except redis.RedisError as e:
+            logger.warning("⚠️ Cache write failed for %s: %s", key, e)
+
+
+# Global instance
+cache_service = CacheService()
@@ -6,15 +6,23 @@ Supports multiple models:
 - Kling v2-1-pro (image-to-video)
 """
 
-import os
+import time
+import random
+import logging
 import asyncio
 import aiohttp
-import json
+import orjson
 from typing import Optional, List
+from app.core import config
+
+logger = logging.getLogger(__name__)
+
+# Longest failure payload echoed to the console
+MAX_LOGGED_PAYLOAD_CHARS = 2000
 
 class KIEService:
     def __init__(self):
-        self.api_key = os.getenv("KIE_API_KEY")
+        self.api_key = config.KIE_API_KEY
         if not self.api_key:
             raise ValueError("KIE_API_KEY environment variable not set")
 
@@ -24,6 +32,31 @@ class KIEService:
             "Content-Type": "application/json"
         }
 
+        # Pooled session + submit limiter, created lazily per event loop (Celery tasks run a fresh loop per asyncio.run)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        self._submit_sem: Optional[asyncio.Semaphore] = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Shared ClientSession that keeps TCP+TLS connections to api.kie.ai alive between jobs"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=50, ttl_dns_cache=300, keepalive_timeout=60)
+            )
+            # Callers fan out whole stories at once; keep createTask bursts under KIE's rate limit
+            self._submit_sem = asyncio.Semaphore(config.KIE_MAX_CONCURRENCY or 8)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        """Close the pooled session if it belongs to the running event loop"""
+        if self._session is not None and self._session_loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
     # ===== Generic Task Management =====
 
     async def create_task(self, model: str, input_params: dict) -> str:
@@ -42,91 +75,99 @@ class KIEService:
             "input": input_params
         }
 
-        print(f"📤 Sending request to KIE API:")
-        print(f"   Model: {model}")
-        print(f"   Payload: {json.dumps(payload, indent=2)}")
+        # Lazy: the payload is only formatted if DEBUG logging is enabled
+        logger.debug("KIE request model=%s payload=%s", model, payload)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/createTask",
-                headers=self.headers,
-                json=payload
-            ) as response:
-                response_text = await response.text()
+        session = await self._get_session()
+        async with self._submit_sem, session.post(
+            f"{self.base_url}/createTask",
+            data=orjson.dumps(payload)
+        ) as response:
+            response_body = await response.read()
 
-                if response.status != 200:
-                    print(f"❌ KIE API HTTP Error {response.status}: {response_text}")
-                    raise Exception(f"KIE API error: {response.status} - {response_text}")
+            if response.status != 200:
+                response_text = response_body.decode("utf-8", errors="replace")
+                print(f"❌ KIE API HTTP Error {response.status}: {response_text}")
+                raise Exception(f"KIE API error: {response.status} - {response_text}")
 
-                try:
-                    result = json.loads(response_text)
-                except json.JSONDecodeError:
-                    print(f"❌ Invalid JSON response: {response_text}")
-                    raise Exception(f"Invalid JSON response from KIE API")
+            try:
+                result = orjson.loads(response_body)
+            except orjson.JSONDecodeError:
+                print(f"❌ Invalid JSON response: {response_body.decode('utf-8', errors='replace')}")
+                raise Exception(f"Invalid JSON response from KIE API")
 
-                print(f"📥 KIE API Response: {json.dumps(result, indent=2)}")
+            logger.debug("KIE response model=%s result=%s", model, result)
 
-                if result.get("code") != 200:
-                    raise Exception(f"KIE API returned error: {result.get('msg')}")
+            if result.get("code") != 200:
+                raise Exception(f"KIE API returned error: {result.get('msg')}")
 
-                task_id = result["data"]["taskId"]
-                print(f"✅ KIE task created ({model}): {task_id}")
-                return task_id
+            task_id = result["data"]["taskId"]
+            print(f"✅ KIE task created ({model}): {task_id}")
+            return task_id
 
     async def poll_task(
         self,
         task_id: str,
         max_attempts: int = 120,
-        poll_interval: int = 5
+        initial_interval: float = 1.0,
+        max_interval: float = 10.0,
+        max_wait_seconds: float = 600.0
     ) -> List[str]:
         """
-        Poll for task completion
+        Poll for task completion, backing off from initial_interval to max_interval
+        so fast tasks return quickly and slow ones cost fewer round-trips
 
         Args:
             task_id: The task ID to poll
             max_attempts: Maximum number of polling attempts
-            poll_interval: Seconds between polls
+            initial_interval: Seconds before the second poll
+            max_interval: Cap on the seconds between polls
+            max_wait_seconds: Total time budget before giving up
 
         Returns:
             result_urls: List of generated file URLs
         """
-        async with aiohttp.ClientSession() as session:
-            for attempt in range(max_attempts):
-                async with session.get(
-                    f"{self.base_url}/recordInfo",
-                    headers=self.headers,
-                    params={"taskId": task_id}
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"KIE poll error: {response.status} - {error_text}")
-
-                    result = await response.json()
-
-                    if result.get("code") != 200:
-                        raise Exception(f"KIE poll returned error: {result.get('msg')}")
-
-                    data = result["data"]
-                    state = data["state"]
-
-                    if state == "success":
-                        result_json = json.loads(data["resultJson"])
-                        result_urls = result_json["resultUrls"]
-                        print(f"✅ KIE task completed: {len(result_urls)} results")
-                        return result_urls
-
-                    elif state == "fail":
-                        fail_msg = data.get("failMsg", "Unknown error")
-                        fail_code = data.get("failCode", "Unknown")
-                        print(f"❌ KIE task failed - Code: {fail_code}, Message: {fail_msg}")
-                        print(f"Full error data: {json.dumps(data, indent=2)}")
-                        raise Exception(f"KIE task failed: {fail_code} - {fail_msg}")
-
-                    # Still waiting
-                    print(f"⏳ KIE task {task_id} processing... (attempt {attempt + 1}/{max_attempts})")
-                    await asyncio.sleep(poll_interval)
-
-            raise Exception(f"KIE task {task_id} timed out after {max_attempts * poll_interval} seconds")
+        session = await self._get_session()
+        started = time.monotonic()
+        for attempt in range(max_attempts):
+            async with session.get(
+                f"{self.base_url}/recordInfo",
+                params={"taskId": task_id}
+            ) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise Exception(f"KIE poll error: {response.status} - {error_text}")
+
+                result = orjson.loads(await response.read())
+
+                if result.get("code") != 200:
+                    raise Exception(f"KIE poll returned error: {result.get('msg')}")
+
+                data = result["data"]
+                state = data["state"]
+
+                if state == "success":
+                    result_json = orjson.loads(data["resultJson"])
+                    result_urls = result_json["resultUrls"]
+                    print(f"✅ KIE task completed: {len(result_urls)} results")
+                    return result_urls
+
+                elif state == "fail":
+                    fail_msg = data.get("failMsg", "Unknown error")
+                    fail_code = data.get("failCode", "Unknown")
+                    print(f"❌ KIE task failed - Code: {fail_code}, Message: {fail_msg}")
+                    print(f"Full error data: {orjson.dumps(data).decode()[:MAX_LOGGED_PAYLOAD_CHARS]}")
+                    raise Exception(f"KIE task failed: {fail_code} - {fail_msg}")
+
+                # Still waiting
+                elapsed = time.monotonic() - started
+                if elapsed >= max_wait_seconds:
+                    break
+                print(f"⏳ KIE task {task_id} processing... (attempt {attempt + 1}/{max_attempts}, {elapsed:.0f}s elapsed)")
+                delay = min(max_interval, initial_interval * 1.5 ** attempt) + random.uniform(0, 0.5)
+                await asyncio.sleep(min(delay, max_wait_seconds - elapsed))
+
+        raise Exception(f"KIE task {task_id} timed out after {time.monotonic() - started:.0f} seconds")
 
     # ===== Nano Banana (Text-to-Image) =====
 
@@ -235,7 +276,7 @@ class KIEService:
             input_params["tail_image_url"] = tail_image_url
 
         task_id = await self.create_task("kling/v2-1-pro", input_params)
-        result_urls = await self.poll_task(task_id, max_attempts=120, poll_interval=5)
+        result_urls = await self.poll_task(task_id, initial_interval=1, max_interval=10)
         return result_urls[0]
 
 
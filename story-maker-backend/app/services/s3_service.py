@@ -1,6 +1,48 @@
+import io
 import os
+import asyncio
+import logging
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from typing import BinaryIO, Union
+from app.core import config
+
+try:
+    # Installed by boto3[crt]: C S3 client that does chunking, signing and TLS off the GIL
+    import awscrt  # noqa: F401
+    HAS_CRT = True
+except ImportError:
+    HAS_CRT = False
+
+logger = logging.getLogger(__name__)
+
+# Multipart above 8 MB, uploading up to 10 parts in parallel (final videos run to hundreds of MB).
+# Managed transfers go through the CRT client when available, else the pure-Python transfer manager
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+    preferred_transfer_client="crt" if HAS_CRT and config.S3_USE_CRT else "classic"
+)
+
+# S3 verifies every PUT (and each multipart part) against this checksum, computed once while streaming.
+# CRC32C is hardware-accelerated through awscrt; botocore needs awscrt for it, so fall back to zlib CRC32
+CHECKSUM_ALGORITHM = "CRC32C" if HAS_CRT else "CRC32"
+
+# Lifecycle rule that discards parts of multipart uploads that were never completed or aborted
+MULTIPART_CLEANUP_RULE_ID = "abort-incomplete-multipart-uploads"
+
+# Connection pool sized for multipart fan-out plus concurrent narration/image uploads (botocore default is 10)
+CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 10, "mode": "adaptive"},
+    tcp_keepalive=True,
+    s3={"use_accelerate_endpoint": False, "addressing_style": "virtual"}
+)
 
 class S3Service:
     def __init__(self):
@@ -12,12 +54,50 @@ class S3Service:
             's3',
             aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID"),
             aws_secret_access_key=os.getenv("S3_SECRET_ACCESS_KEY"),
-            region_name=self.region
+            region_name=self.region,
+            config=CLIENT_CONFIG
         )
 
         if not self.bucket_name:
             raise ValueError("BUCKET_NAME environment variable is not set")
 
+        # Host part of every public URL, built once (S3_PUBLIC_BASE_URL can point at a CDN in front of the bucket)
+        self._url_prefix = (
+            config.S3_PUBLIC_BASE_URL.rstrip("/") + "/" if config.S3_PUBLIC_BASE_URL
+            else f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/"
+        )
+
+    def _upload_fileobj(self, fileobj, key: str, content_type: str):
+        """Managed (multipart when large) upload; raises ClientError / S3UploadFailedError"""
+        self.s3_client.upload_fileobj(
+            fileobj,
+            self.bucket_name,
+            key,
+            ExtraArgs={"ContentType": content_type, "ChecksumAlgorithm": CHECKSUM_ALGORITHM},
+            Config=TRANSFER_CONFIG
+        )
+
+    def upload_stream(self, source: Union[str, BinaryIO], key: str, content_type: str):
+        """
+        Stream a file to S3 without loading it into memory
+        (peak RAM is multipart_chunksize * max_concurrency, not the file size)
+
+        Args:
+            source: Local file path, or a binary file-like object opened for reading
+            key: Full S3 key
+            content_type: MIME type of the file
+        """
+        if isinstance(source, str):
+            self.s3_client.upload_file(
+                source,
+                self.bucket_name,
+                key,
+                ExtraArgs={"ContentType": content_type, "ChecksumAlgorithm": CHECKSUM_ALGORITHM},
+                Config=TRANSFER_CONFIG
+            )
+        else:
+            self._upload_fileobj(source, key, content_type)
+
     def upload_image(self, file_bytes: bytes, file_name: str, content_type: str = "image/png") -> str:
         """
         Upload image to S3 and return public URL
@@ -32,20 +112,15 @@ class S3Service:
         """
         try:
             # Upload to S3 without ACL (bucket must have public access policy configured)
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=file_name,
-                Body=file_bytes,
-                ContentType=content_type
-            )
+            self._upload_fileobj(io.BytesIO(file_bytes), file_name, content_type)
 
             # Generate public URL
-            public_url = f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{file_name}"
-            print(f"✅ Image uploaded to S3: {public_url}")
+            public_url = self._url_prefix + file_name
+            logger.info("✅ Image uploaded to S3: %s", public_url)
             return public_url
 
-        except ClientError as e:
-            print(f"❌ S3 upload error: {e}")
+        except (ClientError, S3UploadFailedError) as e:
+            logger.error("❌ S3 upload error: %s", e)
             raise Exception(f"Failed to upload to S3: {e}")
 
     def upload_audio_data(self, audio_data: bytes, filename: str, folder: str = "", content_type: str = "audio/mpeg") -> str:
@@ -66,28 +141,23 @@ class S3Service:
             key = f"{folder}/{filename}" if folder else filename
 
             # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=audio_data,
-                ContentType=content_type
-            )
+            self._upload_fileobj(io.BytesIO(audio_data), key, content_type)
 
             # Generate public URL
-            public_url = f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
-            print(f"✅ Audio uploaded to S3: {public_url}")
+            public_url = self._url_prefix + key
+            logger.info("✅ Audio uploaded to S3: %s", public_url)
             return public_url
 
-        except ClientError as e:
-            print(f"❌ S3 upload error: {e}")
+        except (ClientError, S3UploadFailedError) as e:
+            logger.error("❌ S3 upload error: %s", e)
             raise Exception(f"Failed to upload audio to S3: {e}")
 
-    def upload_video_data(self, video_data: bytes, filename: str, folder: str = "", content_type: str = "video/mp4") -> str:
+    def upload_video_data(self, video_data: Union[bytes, str, BinaryIO], filename: str, folder: str = "", content_type: str = "video/mp4") -> str:
         """
         Upload video data to S3 and return public URL
 
         Args:
-            video_data: Video file bytes
+            video_data: Video file bytes, or a local path / file-like object to stream from
             filename: Name for the file in S3
             folder: Optional folder path (e.g., "final_videos")
             content_type: MIME type of the video
@@ -99,23 +169,115 @@ class S3Service:
             # Create full key with folder if provided
             key = f"{folder}/{filename}" if folder else filename
 
-            # Upload to S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=key,
-                Body=video_data,
-                ContentType=content_type
-            )
+            # Upload to S3 (bytes are wrapped once; paths and file objects are streamed)
+            if isinstance(video_data, (bytes, bytearray)):
+                video_data = io.BytesIO(video_data)
+            self.upload_stream(video_data, key, content_type)
 
             # Generate public URL
-            public_url = f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
-            print(f"✅ Video uploaded to S3: {public_url}")
+            public_url = self._url_prefix + key
+            logger.info("✅ Video uploaded to S3: %s", public_url)
             return public_url
 
-        except ClientError as e:
-            print(f"❌ S3 upload error: {e}")
+        except (ClientError, S3UploadFailedError) as e:
+            logger.error("❌ S3 upload error: %s", e)
             raise Exception(f"Failed to upload video to S3: {e}")
 
+    def public_url(self, key: str) -> str:
+        """Public URL of an object in the bucket"""
+        return self._url_prefix + key
+
+    def exists(self, key: str) -> bool:
+        """
+        Check whether an object exists with a HEAD request (no body transfer)
+
+        Args:
+            key: Full S3 key
+
+        Returns:
+            True if the object exists, False on 404 (other errors are treated as a miss)
+        """
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                logger.warning("⚠️ S3 head_object failed for %s: %s", key, e)
+            return False
+
+    def presign_upload(self, key: str, content_type: str, expires_in: int = 900) -> str:
+        """
+        Create a presigned PUT URL so a client can upload straight to S3 (bytes never pass through the backend)
+
+        Args:
+            key: Full S3 key the client will write
+            content_type: MIME type the client must send as its Content-Type header
+            expires_in: Seconds the URL stays valid
+
+        Returns:
+            upload_url: Presigned PUT URL (signing is local, no request to S3)
+        """
+        return self.s3_client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket_name, "Key": key, "ContentType": content_type},
+            ExpiresIn=expires_in
+        )
+
+    # ===== Async wrappers =====
+    # boto3 is blocking; run uploads in a worker thread so async routes/tasks keep serving other I/O.
+    # The client is thread-safe, so concurrent uploads share its connection pool.
+
+    async def a_upload_image(self, file_bytes: bytes, file_name: str, content_type: str = "image/png") -> str:
+        """Async version of upload_image"""
+        return await asyncio.to_thread(self.upload_image, file_bytes, file_name, content_type)
+
+    async def a_upload_audio_data(self, audio_data: bytes, filename: str, folder: str = "", content_type: str = "audio/mpeg") -> str:
+        """Async version of upload_audio_data"""
+        return await asyncio.to_thread(self.upload_audio_data, audio_data, filename, folder, content_type)
+
+    async def a_upload_video_data(self, video_data: Union[bytes, str, BinaryIO], filename: str, folder: str = "", content_type: str = "video/mp4") -> str:
+        """Async version of upload_video_data"""
+        return await asyncio.to_thread(self.upload_video_data, video_data, filename, folder, content_type)
+
+    async def a_exists(self, key: str) -> bool:
+        """Async version of exists"""
+        return await asyncio.to_thread(self.exists, key)
+
+    def ensure_multipart_cleanup_rule(self, days: int = 1) -> bool:
+        """
+        Make sure the bucket aborts incomplete multipart uploads after `days`
+        (parts of an upload that died mid-stream are otherwise stored and billed indefinitely)
+
+        Args:
+            days: Days after initiation before S3 discards the unfinished upload's parts
+
+        Returns:
+            True if the rule was added, False if the bucket already had it
+        """
+        try:
+            rules = self.s3_client.get_bucket_lifecycle_configuration(Bucket=self.bucket_name)["Rules"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "NoSuchLifecycleConfiguration":
+                raise
+            rules = []
+
+        if any(rule.get("ID") == MULTIPART_CLEANUP_RULE_ID for rule in rules):
+            return False
+
+        # PUT replaces the whole lifecycle configuration, so keep the existing rules
+        rules.append({
+            "ID": MULTIPART_CLEANUP_RULE_ID,
+            "Filter": {"Prefix": ""},
+            "Status": "Enabled",
+            "AbortIncompleteMultipartUpload": {"DaysAfterInitiation": days}
+        })
+        self.s3_client.put_bucket_lifecycle_configuration(
+            Bucket=self.bucket_name,
+            LifecycleConfiguration={"Rules": rules}
+        )
+        logger.info("✅ Added lifecycle rule %s to %s", MULTIPART_CLEANUP_RULE_ID, self.bucket_name)
+        return True
+
     def delete_image(self, file_name: str):
         """Delete image from S3"""
         try:
@@ -123,9 +285,9 @@ class S3Service:
                 Bucket=self.bucket_name,
                 Key=file_name
             )
-            print(f"🗑️ Deleted from S3: {file_name}")
+            logger.info("🗑️ Deleted from S3: %s", file_name)
         except ClientError as e:
-            print(f"❌ S3 delete error: {e}")
+            logger.error("❌ S3 delete error: %s", e)
 
 
 # Global instance
@@ -4,15 +4,84 @@ Handles text-to-speech conversion using Supertone API
 """
 
 import os
+import uuid
+import random
 import asyncio
+import logging
 import httpx
-import base64
+import hashlib
+import orjson
 from typing import Optional, Dict, Any
+from app.core import config
+from app.services.cache_service import cache_service
+
+try:
+    # SIMD base64 (drop-in for the stdlib functions used here); audio payloads are 100 KB - 1 MB
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+logger = logging.getLogger(__name__)
 
 SUPERTONE_API_URL = "https://supertoneapi.com"
 SUPERTONE_API_KEY = os.getenv("SUPERTONE_API_KEY")
 SUPERTONE_DEFAULT_VOICE_ID = os.getenv("SUPERTONE_VOICE_ID", "default_voice_id")
 
+# Keep-alive pool shared by every TTS request on a loop (no TLS handshake per scene/retry)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+SUPERTONE_MODEL = "sona_speech_1"
+
+# Default voice settings (callers' voice_settings are merged on top)
+DEFAULT_VOICE_SETTINGS = {
+    "pitch_shift": 0,
+    "pitch_variance": 1,
+    "speed": 1,
+    "duration": 0,
+    "similarity": 3,
+    "text_guidance": 1,
+    "subharmonic_amplitude_control": 1
+}
+
+# Phoneme responses larger than this are parsed/decoded in a worker thread instead of on the event loop
+PARSE_OFFLOAD_BYTES = 256 * 1024
+
+# S3 folder for content-addressed narration audio (identical requests share one object)
+TTS_CACHE_FOLDER = "tts_cache"
+
+# Decorrelated-jitter backoff bounds (seconds), so parallel scene requests don't retry in lockstep
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 20.0
+
+
+def _parse_phoneme_response(body: bytes, return_bytes: bool) -> Dict[str, Any]:
+    """
+    Parse a JSON (include_phonemes=True) response straight from the body bytes:
+    response.json() first decodes the whole (mostly base64 audio) body into a str, an extra full-size copy
+    """
+    response_data = orjson.loads(body)
+    audio_base64 = response_data.pop("audio_base64", None)
+    result = {"phonemes": response_data.get("phonemes")}
+    if return_bytes:
+        result["audio_bytes"] = base64.b64decode(audio_base64)
+    else:
+        result["audio_base64"] = audio_base64
+    return result
+
+
+def _next_retry_delay(previous: float) -> float:
+    """AWS-style decorrelated jitter: random in [base, 3 * previous], capped"""
+    return min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, previous * 3))
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Server-requested wait from a numeric Retry-After header, if any"""
+    try:
+        return min(RETRY_MAX_DELAY, float(response.headers["retry-after"]))
+    except (KeyError, ValueError):
+        return None
+
 
 class SupertoneTTSService:
     """Service for converting text to speech using Supertone API"""
@@ -22,6 +91,33 @@ class SupertoneTTSService:
             raise ValueError("SUPERTONE_API_KEY environment variable is not set")
         self.api_key = SUPERTONE_API_KEY
         self.default_voice_id = SUPERTONE_DEFAULT_VOICE_ID
+        # Loop-bound resources, created lazily per event loop (Celery tasks run a fresh loop per asyncio.run)
+        self._loop = None
+        self._sem = None
+        self._client = None
+
+    def _bind_loop(self):
+        """(Re)create loop-bound resources when the running event loop changes"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Caps in-flight Supertone requests across every caller (scene batches fan out at once)
+            self._sem = asyncio.Semaphore(config.SUPERTONE_MAX_CONCURRENCY or 8)
+            self._client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                limits=HTTP_LIMITS,
+                http2=True,
+                headers={"x-sup-api-key": self.api_key}
+            )
+            self._loop = loop
+
+    async def aclose(self):
+        """Close the loop-bound HTTP client before the event loop that owns it shuts down"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        await self._client.aclose()
+        self._loop = None
+        self._sem = None
+        self._client = None
 
     async def generate_speech(
         self,
@@ -31,7 +127,8 @@ class SupertoneTTSService:
         style: Optional[str] = None,
         voice_settings: Optional[Dict[str, Any]] = None,
         output_format: str = "mp3",
-        include_phonemes: bool = False
+        include_phonemes: bool = False,
+        return_bytes: bool = False
     ) -> Dict[str, Any]:
         """
         Generate speech from text using Supertone API
@@ -44,10 +141,11 @@ class SupertoneTTSService:
             voice_settings: Optional voice settings (pitch_shift, speed, etc.)
             output_format: Output format ('wav' or 'mp3')
             include_phonemes: Whether to include phoneme timing data for subtitles
+            return_bytes: Return raw audio_bytes instead of audio_base64 (for callers that upload it)
 
         Returns:
             Dict containing:
-            - audio_base64: Base64 encoded audio data
+            - audio_base64: Base64 encoded audio data (audio_bytes if return_bytes=True)
             - content_type: MIME type of the audio
             - format: Output format
             - phonemes: (optional) Phoneme timing data if include_phonemes=True
@@ -59,28 +157,16 @@ class SupertoneTTSService:
         if len(text) > 300:
             raise ValueError(f"Text length ({len(text)}) exceeds maximum of 300 characters")
 
-        # Default voice settings
-        default_settings = {
-            "pitch_shift": 0,
-            "pitch_variance": 1,
-            "speed": 1,
-            "duration": 0,
-            "similarity": 3,
-            "text_guidance": 1,
-            "subharmonic_amplitude_control": 1
-        }
-
-        # Merge with provided settings
-        if voice_settings:
-            default_settings.update(voice_settings)
+        # Merge provided settings over the defaults
+        settings = {**DEFAULT_VOICE_SETTINGS, **(voice_settings or {})}
 
         # Prepare request body
         request_body = {
             "text": text,
             "language": language,
-            "model": "sona_speech_1",
+            "model": SUPERTONE_MODEL,
             "output_format": output_format,
-            "voice_settings": default_settings,
+            "voice_settings": settings,
             "include_phonemes": include_phonemes
         }
 
@@ -90,67 +176,69 @@ class SupertoneTTSService:
 
         # Make API request
         url = f"{SUPERTONE_API_URL}/v1/text-to-speech/{voice_id}"
-        headers = {
-            "x-sup-api-key": self.api_key,
-            "Content-Type": "application/json"
-        }
 
         # Retry logic for handling temporary API failures
         max_retries = 3
-        retry_delay = 2  # seconds
+        retry_delay = RETRY_BASE_DELAY
 
+        self._bind_loop()
         for attempt in range(max_retries):
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(url, json=request_body, headers=headers)
-
-                    if response.status_code == 200:
-                        # Get content type
-                        content_type = response.headers.get("content-type", "audio/mpeg")
-
-                        # If phonemes requested, response will be JSON with audio_base64 and phonemes
-                        if include_phonemes:
-                            response_data = response.json()
-                            return {
-                                "audio_base64": response_data.get("audio_base64"),
-                                "content_type": "audio/mpeg" if output_format == "mp3" else "audio/wav",
-                                "format": output_format,
-                                "phonemes": response_data.get("phonemes")
-                            }
+                async with self._sem:
+                    response = await self._client.post(url, json=request_body)
+
+                if response.status_code == 200:
+                    # Get content type
+                    content_type = response.headers.get("content-type", "audio/mpeg")
+
+                    # If phonemes requested, response will be JSON with audio_base64 and phonemes
+                    if include_phonemes:
+                        body = response.content
+                        if len(body) > PARSE_OFFLOAD_BYTES:
+                            # Scene batches land many of these at once; keep the loop serving other responses
+                            result = await asyncio.to_thread(_parse_phoneme_response, body, return_bytes)
                         else:
-                            # Binary audio response
-                            audio_data = response.content
-                            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-
-                            return {
-                                "audio_base64": audio_base64,
-                                "content_type": content_type,
-                                "format": output_format
-                            }
-                    elif response.status_code >= 500:
-                        # Server error - retry
-                        error_detail = response.text
-                        print(f"❌ Supertone API server error on attempt {attempt + 1}/{max_retries}: {response.status_code}")
-
-                        if attempt < max_retries - 1:
-                            print(f"🔄 Retrying in {retry_delay} seconds...")
-                            await asyncio.sleep(retry_delay)
-                            retry_delay *= 2  # Exponential backoff
-                            continue
+                            result = _parse_phoneme_response(body, return_bytes)
+                        result["content_type"] = "audio/mpeg" if output_format == "mp3" else "audio/wav"
+                        result["format"] = output_format
+                        return result
+                    else:
+                        # Binary audio response (only base64-encoded if the caller wants text)
+                        audio_data = response.content
+                        result = {
+                            "content_type": content_type,
+                            "format": output_format
+                        }
+                        if return_bytes:
+                            result["audio_bytes"] = audio_data
                         else:
-                            raise Exception(f"Supertone API error ({response.status_code}): {error_detail}")
+                            result["audio_base64"] = base64.b64encode(audio_data).decode('ascii')
+                        return result
+                elif response.status_code >= 500 or response.status_code == 429:
+                    # Server error / rate limited - retry (honoring Retry-After when given)
+                    error_detail = response.text
+                    logger.warning("❌ Supertone API server error on attempt %d/%d: %d", attempt + 1, max_retries, response.status_code)
+
+                    if attempt < max_retries - 1:
+                        retry_delay = _next_retry_delay(retry_delay)
+                        wait = _retry_after(response) or retry_delay
+                        logger.info("🔄 Retrying in %.1f seconds...", wait)
+                        await asyncio.sleep(wait)
+                        continue
                     else:
-                        # Client error (4xx) - don't retry
-                        error_detail = response.text
                         raise Exception(f"Supertone API error ({response.status_code}): {error_detail}")
+                else:
+                    # Client error (400/401/403/413...) - never retryable
+                    error_detail = response.text
+                    raise Exception(f"Supertone API error ({response.status_code}): {error_detail}")
 
             except httpx.TimeoutException:
-                print(f"❌ Supertone API timeout on attempt {attempt + 1}/{max_retries}")
+                logger.warning("❌ Supertone API timeout on attempt %d/%d", attempt + 1, max_retries)
 
                 if attempt < max_retries - 1:
-                    print(f"🔄 Retrying in {retry_delay} seconds...")
+                    retry_delay = _next_retry_delay(retry_delay)
+                    logger.info("🔄 Retrying in %.1f seconds...", retry_delay)
                     await asyncio.sleep(retry_delay)
-                    retry_delay *= 2
                     continue
                 else:
                     raise Exception("Supertone API timeout after multiple retries")
@@ -158,55 +246,171 @@ class SupertoneTTSService:
             except Exception as e:
                 # For other exceptions, only retry if it's a network/connection error
                 if "connection" in str(e).lower() or "network" in str(e).lower():
-                    print(f"❌ Network error on attempt {attempt + 1}/{max_retries}: {str(e)}")
+                    logger.warning("❌ Network error on attempt %d/%d: %s", attempt + 1, max_retries, e)
 
                     if attempt < max_retries - 1:
-                        print(f"🔄 Retrying in {retry_delay} seconds...")
+                        retry_delay = _next_retry_delay(retry_delay)
+                        logger.info("🔄 Retrying in %.1f seconds...", retry_delay)
                         await asyncio.sleep(retry_delay)
-                        retry_delay *= 2
                         continue
 
                 # Re-raise if not retryable or last attempt
                 raise
 
+    async def generate_speech_to_s3(
+        self,
+        s3_service,
+        text: str,
+        language: str = "ko",
+        voice_id: Optional[str] = None,
+        style: Optional[str] = None,
+        voice_settings: Optional[Dict[str, Any]] = None,
+        output_format: str = "mp3",
+        include_phonemes: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Generate speech and store it in S3, reusing the stored audio for identical requests
+
+        The S3 key is a hash of everything that determines the audio, so re-rendering a scene with
+        unchanged text/voice costs a cache lookup instead of a Supertone round trip. Phonemes are not
+        stored in S3, so they are kept next to the URL in Redis; without them a HEAD request is enough.
+        An existing object is never overwritten: re-synthesized audio is not byte-identical, so it goes
+        to a fresh key instead of desyncing timings (or CDN copies) that earlier projects still use.
+
+        Args:
+            s3_service: S3Service used to look up and upload the audio
+            text: The text to convert to speech (max 300 characters)
+            language: Language code ('en', 'ko', 'ja')
+            voice_id: Voice ID to use (defaults to SUPERTONE_DEFAULT_VOICE_ID)
+            style: Style of character for TTS conversion
+            voice_settings: Optional voice settings (pitch_shift, speed, etc.)
+            output_format: Output format ('wav' or 'mp3')
+            include_phonemes: Whether to include phoneme timing data for subtitles
+
+        Returns:
+            Dict containing:
+            - audio_url: Public S3 URL of the audio
+            - content_type: MIME type of the audio
+            - format: Output format
+            - phonemes: Phoneme timing data (None unless include_phonemes=True)
+        """
+        voice_id = voice_id or self.default_voice_id
+        settings = {**DEFAULT_VOICE_SETTINGS, **(voice_settings or {})}
+        digest = hashlib.blake2b(
+            orjson.dumps(
+                [text, voice_id, language, style, settings, output_format, include_phonemes, SUPERTONE_MODEL],
+                option=orjson.OPT_SORT_KEYS
+            ),
+            digest_size=16
+        ).hexdigest()
+        filename = f"{digest}.{output_format}"
+        key = f"{TTS_CACHE_FOLDER}/{filename}"
+        cache_key = f"tts:{digest}"
+        content_type = "audio/mpeg" if output_format == "mp3" else "audio/wav"
+
+        if config.TTS_CACHE_TTL > 0:
+            cached = await asyncio.to_thread(cache_service.get_json, cache_key)
+            if cached:
+                logger.info("♻️ TTS cache hit: %s", cached["audio_url"])
+                return cached
+            if await s3_service.a_exists(key):
+                if not include_phonemes:
+                    logger.info("♻️ TTS cache hit (S3): %s", key)
+                    return {
+                        "audio_url": s3_service.public_url(key),
+                        "content_type": content_type,
+                        "format": output_format,
+                        "phonemes": None
+                    }
+                # The audio is there but its phoneme timings expired from Redis
+                filename = f"{digest}-{uuid.uuid4().hex[:12]}.{output_format}"
+        else:
+            # Cache disabled: nothing is reused, and the shared content-addressed key is left alone
+            filename = f"{digest}-{uuid.uuid4().hex[:12]}.{output_format}"
+
+        speech = await self.generate_speech(
+            text=text,
+            language=language,
+            voice_id=voice_id,
+            style=style,
+            voice_settings=voice_settings,
+            output_format=output_format,
+            include_phonemes=include_phonemes,
+            return_bytes=True
+        )
+
+        audio_url = await s3_service.a_upload_audio_data(
+            audio_data=speech["audio_bytes"],
+            filename=filename,
+            folder=TTS_CACHE_FOLDER,
+            content_type=content_type
+        )
+
+        result = {
+            "audio_url": audio_url,
+            "content_type": content_type,
+            "format": output_format,
+            "phonemes": speech.get("phonemes")
+        }
+        await asyncio.to_thread(cache_service.set_json, cache_key, result, config.TTS_CACHE_TTL)
+        return result
+
     async def generate_narrations_for_scenes(
         self,
         scenes: list,
         language: str = "ko",
         voice_id: Optional[str] = None,
-        style: Optional[str] = None
+        style: Optional[str] = None,
+        s3_service=None
     ) -> list:
         """
-        Generate narrations for multiple scenes
+        Generate narrations for multiple scenes in parallel
 
         Args:
             scenes: List of scene objects with 'script_text'
             language: Language code
             voice_id: Voice ID to use
             style: Style for TTS
+            s3_service: If given, each scene's audio is uploaded as soon as its own TTS call returns
+                (see generate_speech_to_s3), so uploads overlap the remaining synthesis
 
         Returns:
-            List of dicts with audio_base64 for each scene
+            List of dicts for each scene (None where generation failed): raw audio_bytes,
+            or audio_url when s3_service is given
         """
-        narrations = []
-
-        for scene in scenes:
-            text = scene.get("script_text", "")
+        async def generate_one(text: str):
             if not text:
-                narrations.append(None)
-                continue
-
-            try:
-                result = await self.generate_speech(
+                return None
+            if s3_service:
+                return await self.generate_speech_to_s3(
+                    s3_service,
                     text=text,
                     language=language,
                     voice_id=voice_id,
                     style=style,
                     output_format="mp3"
                 )
-                narrations.append(result)
-            except Exception as e:
-                print(f"❌ Error generating narration for scene: {e}")
-                narrations.append(None)
+            return await self.generate_speech(
+                text=text,
+                language=language,
+                voice_id=voice_id,
+                style=style,
+                output_format="mp3",
+                return_bytes=True
+            )
+
+        # One request per scene: the text-to-speech endpoint takes a single text per call, so the
+        # RTTs overlap instead of being batched. Concurrency is bounded by the semaphore in generate_speech
+        results = await asyncio.gather(
+            *[generate_one(scene.get("script_text", "")) for scene in scenes],
+            return_exceptions=True
+        )
+
+        narrations = []
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("❌ Error generating narration for scene: %s", result)
+                result = None
+            narrations.append(result)
 
         return narrations
@@ -4,11 +4,67 @@ Handles video composition, subtitle generation, and final video rendering
 """
 
 import os
+import sys
+import errno
+import asyncio
 import subprocess
+import shutil
 import tempfile
-from typing import List, Dict, Any, Optional
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 import httpx
 import uuid
+from app.core import config
+
+try:
+    # PyAV reads container metadata in-process (no ffprobe fork/exec per file)
+    import av
+except ImportError:
+    av = None
+
+# Shared keep-alive pool for downloading scene videos/narrations (all files of a job fetch at once)
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+HTTP_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+
+# Process-wide pool for blocking probes/subprocesses/PIL work in the async pipeline. Each Celery task
+# runs its own event loop, whose default executor would be created and torn down per task
+BLOCKING_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="video")
+
+# H.264 encoders for the final render, hardware first. Each entry:
+# (global input args, filter appended to the output chain, encoder + rate-control args)
+H264_ENCODERS = {
+    "h264_videotoolbox": ([], None, ['-c:v', 'h264_videotoolbox', '-q:v', '50']),
+    "h264_nvenc": ([], None, ['-c:v', 'h264_nvenc', '-preset', 'p4', '-tune', 'hq', '-b:v', '6M']),
+    "h264_vaapi": (['-vaapi_device', '/dev/dri/renderD128'], "format=nv12,hwupload", ['-c:v', 'h264_vaapi', '-b:v', '6M']),
+    # veryfast is ~2.5x medium's fps at 1080p; -threads 0 = frame threads on every core
+    "libx264": ([], None, ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23', '-threads', '0']),
+}
+
+# libass style for the master SRT, matching the drawtext look (56px white text with a soft shadow,
+# ~64px above the bottom edge at 1080p). SRT cues are laid out on a 288-line canvas and scaled to the video
+SUBTITLE_ASS_STYLE = (
+    "FontName=양진체,FontSize=15,PrimaryColour=&H00FFFFFF,BackColour=&H4D000000,"
+    "BorderStyle=1,Outline=0,Shadow=1,Alignment=2,MarginV=17"
+)
+
+# Chunk size for streaming downloads to disk (memory stays flat regardless of file size)
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Fade transition durations and pause between segments (in seconds)
+FADE_IN_DURATION = 0.5
+FADE_OUT_DURATION = 0.5
+PAUSE_BETWEEN_SEGMENTS = 0.5  # Reduced pause between segments for natural pacing
+
+# Filters identical for every segment, built once instead of per segment
+VIDEO_FADE_IN_FILTER = f"fade=t=in:st=0:d={FADE_IN_DURATION}"
+AUDIO_FADE_IN_FILTER = "afade=t=in:st=0:d=0.1"
+
+# RAM-backed tmpfs for the render's working files (downloads are read by ffmpeg seconds later, then deleted)
+SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+
+# Working-set estimate per scene (clip + narration + its share of the render) when checking tmpfs headroom
+WORK_BYTES_PER_SCENE = 128 * 1024 * 1024
 
 
 class VideoService:
@@ -17,13 +73,90 @@ class VideoService:
     def __init__(self, s3_service):
         self.s3_service = s3_service
 
+        # Probed on the first render, then reused for the life of the process
+        self._encoder: Optional[str] = None
+        self._libass: Optional[bool] = None
+
+        # Created on first use, per event loop (Celery tasks each run their own loop)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+
+    def _h264_encoder(self) -> str:
+        """
+        Pick the H.264 encoder for the final render, probing once per process
+
+        VIDEO_ENCODER forces one by name; "auto" tries the hardware encoders this ffmpeg
+        was built with (a 1-frame test encode, since being listed doesn't mean the device exists)
+        and falls back to libx264.
+        """
+        if self._encoder:
+            return self._encoder
+
+        if config.VIDEO_ENCODER in H264_ENCODERS:
+            self._encoder = config.VIDEO_ENCODER
+            return self._encoder
+
+        candidates = ["h264_videotoolbox"] if sys.platform == "darwin" else ["h264_nvenc", "h264_vaapi"]
+        self._encoder = "libx264"
+        try:
+            listed = subprocess.run(
+                ['ffmpeg', '-hide_banner', '-encoders'], check=True, capture_output=True, text=True
+            ).stdout
+            for name in candidates:
+                if name not in listed:
+                    continue
+                input_args, hw_filter, encoder_args = H264_ENCODERS[name]
+                test_cmd = [
+                    'ffmpeg', '-hide_banner', *input_args,
+                    '-f', 'lavfi', '-i', 'color=s=256x256:d=0.1',
+                    *(['-vf', hw_filter] if hw_filter else []),
+                    '-frames:v', '1', *encoder_args, '-f', 'null', '-'
+                ]
+                if subprocess.run(test_cmd, capture_output=True).returncode == 0:
+                    self._encoder = name
+                    break
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"⚠️ Could not probe ffmpeg encoders, using libx264: {e}")
+
+        print(f"🎞️ Final render encoder: {self._encoder}")
+        return self._encoder
+
+    def _has_subtitles_filter(self) -> bool:
+        """Whether this ffmpeg was built with libass (the `subtitles` filter), checked once per process"""
+        if self._libass is None:
+            try:
+                filters = subprocess.run(
+                    ['ffmpeg', '-hide_banner', '-filters'], check=True, capture_output=True, text=True
+                ).stdout
+                self._libass = any(line.split()[1:2] == ["subtitles"] for line in filters.splitlines())
+            except (OSError, subprocess.CalledProcessError):
+                self._libass = False
+            print(f"📝 Subtitle renderer: {'libass (subtitles filter)' if self._libass else 'drawtext'}")
+        return self._libass
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Shared HTTP/2 client for the running loop (connections are reused across downloads)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        """Close the loop-bound HTTP client before the event loop that owns it shuts down"""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        await self._client.aclose()
+        self._client = None
+        self._loop = None
+
     async def download_file(self, url: str, local_path: str):
-        """Download a file from URL to local path"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        """Download a file from URL to local path, streaming it to disk in chunks"""
+        async with self._get_client().stream("GET", url) as response:
             response.raise_for_status()
             with open(local_path, 'wb') as f:
-                f.write(response.content)
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
 
     def create_srt_subtitles(self, text: str, phonemes: Optional[Dict[str, Any]], duration: float, fade_in_duration: float = 0.0, time_offset: float = 0.0) -> str:
         """
@@ -76,12 +209,171 @@ class VideoService:
 
         return srt_path
 
+    def _probe_duration(self, path: str) -> float:
+        """
+        Get a media file's container duration in seconds
+
+        Uses PyAV when installed, else one ffprobe call. Raises if the duration can't be read.
+        """
+        if av is not None:
+            with av.open(path) as container:
+                if container.duration is not None:
+                    return container.duration / av.time_base
+
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            check=True, capture_output=True, text=True
+        )
+        return float(result.stdout.strip())
+
+    def _probe_frame_rate(self, path: str) -> float:
+        """Get a video's average frame rate (PyAV when installed, else one ffprobe call)"""
+        if av is not None:
+            with av.open(path) as container:
+                rate = container.streams.video[0].average_rate
+                if rate:
+                    return float(rate)
+
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=avg_frame_rate', '-of', 'default=noprint_wrappers=1:nokey=1', path],
+            check=True, capture_output=True, text=True
+        )
+        numerator, _, denominator = result.stdout.strip().partition('/')
+        return float(numerator) / float(denominator or 1)
+
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call on BLOCKING_EXECUTOR without freezing the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(BLOCKING_EXECUTOR, functools.partial(func, *args))
+
+    async def _run_ffmpeg(self, cmd: List[str]):
+        """
+        Run an ffmpeg command without blocking the event loop
+
+        Raises:
+            subprocess.CalledProcessError: On a non-zero exit (stderr attached), like subprocess.run(check=True)
+        """
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, cmd, stderr=stderr.decode('utf-8', errors='replace')
+            )
+
+    def _make_work_dir(self, scene_count: int) -> str:
+        """
+        Create the render's temp directory, in /dev/shm when it has room for the job
+        (container tmpfs is often only 64 MB), else in the default temp location.
+        The check is not a reservation, so each job only counts on its share of the free
+        space across CELERY_CONCURRENCY concurrent renders (tmpfs pages also count as memory).
+        """
+        if SHM_DIR:
+            needed = scene_count * WORK_BYTES_PER_SCENE
+            if shutil.disk_usage(SHM_DIR).free // max(1, config.CELERY_CONCURRENCY) >= needed:
+                return tempfile.mkdtemp(dir=SHM_DIR)
+            print(f"⚠️ /dev/shm too small for {scene_count} scenes, using disk temp dir")
+        return tempfile.mkdtemp()
+
+    @staticmethod
+    def _out_of_space(e: Exception) -> bool:
+        """Whether a write (ours or ffmpeg's) failed because the filesystem is full"""
+        if isinstance(e, OSError):
+            return e.errno == errno.ENOSPC
+        return isinstance(e, subprocess.CalledProcessError) and "No space left on device" in (e.stderr or "")
+
+    def _build_subtitle_entries(
+        self,
+        subtitle_data_list: List[Tuple[str, Optional[Dict[str, Any]], float]],
+        segment_durations: List[float],
+        audio_durations: List[float],
+        fade_in_duration: float
+    ) -> List[Tuple[float, float, str]]:
+        """
+        Compute each segment's subtitle window in the concatenated video
+
+        Args:
+            subtitle_data_list: (subtitle_text, phonemes, passed_duration) per segment
+            segment_durations: Final duration of each segment (sets the cumulative offsets)
+            audio_durations: ACTUAL probed narration durations (used without phoneme timing)
+            fade_in_duration: Video fade-in at the start of each segment
+
+        Returns:
+            List of (start_time, end_time, text) in seconds
+        """
+        entries = []
+        cumulative_offset = 0.0
+
+        for (subtitle_text, phonemes, _passed_duration), segment_duration, audio_duration in zip(
+            subtitle_data_list, segment_durations, audio_durations
+        ):
+            start_times = durations_list = None
+            if phonemes and isinstance(phonemes, dict) and phonemes.get("symbols"):
+                start_times = phonemes.get("start_times_seconds")
+                durations_list = phonemes.get("durations_seconds")
+
+            if start_times and durations_list:
+                # Use phoneme timing
+                start_time = cumulative_offset + start_times[0] + fade_in_duration
+                end_time = cumulative_offset + start_times[-1] + durations_list[-1] + fade_in_duration
+            else:
+                # Simple timing
+                start_time = cumulative_offset + fade_in_duration
+                end_time = cumulative_offset + audio_duration
+
+            entries.append((start_time, end_time, subtitle_text))
+            cumulative_offset += segment_duration
+
+        return entries
+
+    def _format_srt(self, entries: List[Tuple[float, float, str]]) -> str:
+        """Serialize (start_time, end_time, text) entries as one SRT document"""
+        return "".join(
+            f"{i}\n{self._seconds_to_srt_time(start)} --> {self._seconds_to_srt_time(end)}\n{text}\n\n"
+            for i, (start, end, text) in enumerate(entries, 1)
+        )
+
+    def _render_subtitle_images(self, entries: List[Tuple[float, float, str]], font_file: str, temp_dir: str) -> List[str]:
+        """
+        Pre-render each subtitle cue to a transparent PNG matching the drawtext style
+        (56px white text, black@0.7 shadow offset by 3px), cropped to the text
+
+        Args:
+            entries: (start_time, end_time, text) per cue
+            font_file: Path to the font file
+            temp_dir: Directory for the PNGs
+
+        Returns:
+            List of PNG paths, one per entry
+        """
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.truetype(font_file, 56)
+        shadow_offset = 3
+        paths = []
+
+        for i, (_start, _end, text) in enumerate(entries):
+            left, top, right, bottom = font.getbbox(text or " ")
+            image = Image.new("RGBA", (right + shadow_offset, bottom + shadow_offset), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(image)
+            draw.text((shadow_offset, shadow_offset), text, font=font, fill=(0, 0, 0, 178))
+            draw.text((0, 0), text, font=font, fill=(255, 255, 255, 255))
+
+            path = os.path.join(temp_dir, f"subtitle_{i}.png")
+            image.save(path)
+            paths.append(path)
+
+        return paths
+
     def _seconds_to_srt_time(self, seconds: float) -> str:
         """Convert seconds to SRT timestamp format (HH:MM:SS,mmm)"""
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        millis = int((seconds % 1) * 1000)
+        # One rounding to integer milliseconds, then integer divmods (no repeated float modulo,
+        # and 1.9999s no longer truncates to 00:00:01,999)
+        minutes, millis = divmod(round(seconds * 1000), 60_000)
+        hours, minutes = divmod(minutes, 60)
+        secs, millis = divmod(millis, 1000)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
     def _calculate_tts_speedup(self, text: str) -> float:
@@ -134,8 +426,27 @@ class VideoService:
         Returns:
             S3 URL of the final combined video
         """
-        temp_dir = tempfile.mkdtemp()
+        args = (video_urls, narration_urls, subtitle_texts, phonemes_list, durations)
+        temp_dir = self._make_work_dir(len(video_urls))
+        try:
+            return await self._combine_in_dir(temp_dir, *args)
+        except (OSError, subprocess.CalledProcessError) as e:
+            # Concurrent renders can still fill the tmpfs between the headroom check and the writes
+            if not (SHM_DIR and temp_dir.startswith(SHM_DIR) and self._out_of_space(e)):
+                raise
+            print("⚠️ /dev/shm filled up mid-render, retrying in the disk temp dir")
+        return await self._combine_in_dir(tempfile.mkdtemp(), *args)
 
+    async def _combine_in_dir(
+        self,
+        temp_dir: str,
+        video_urls: List[str],
+        narration_urls: List[str],
+        subtitle_texts: List[str],
+        phonemes_list: List[Optional[Dict[str, Any]]],
+        durations: List[float]
+    ) -> str:
+        """Render and upload the final video using temp_dir as the working directory (removed afterwards)"""
         try:
             # Download all videos and audio files
             video_paths = []
@@ -144,11 +455,6 @@ class VideoService:
 
             print(f"📥 Downloading {len(video_urls)} videos and audio files in parallel...")
 
-            # Define fade transition durations and pause between segments (in seconds)
-            FADE_IN_DURATION = 0.5
-            FADE_OUT_DURATION = 0.5
-            PAUSE_BETWEEN_SEGMENTS = 0.5  # Reduced pause between segments for natural pacing
-
             # Track cumulative time for subtitle timing in final concatenated video
             cumulative_time = 0.0
             segment_durations = []  # Store actual segment durations for later
@@ -172,13 +478,24 @@ class VideoService:
                 download_tasks.append(self.download_file(audio_url, audio_path))
 
             # Download ALL files in parallel for maximum speed
-            import asyncio
             await asyncio.gather(*download_tasks)
             print(f"✅ All {len(video_urls)} videos and audio files downloaded")
 
-            # Create segments with video + audio + fade (NO subtitles yet)
-            print(f"🎬 Creating {len(video_paths)} video segments with narration...")
-            segment_paths = []
+            # Probe every downloaded file at once (worker threads) instead of one by one while planning
+            probe_results = await asyncio.gather(
+                *[self._run_blocking(self._probe_duration, path) for path in video_paths + audio_paths],
+                return_exceptions=True
+            )
+            probed_video_durations = probe_results[:len(video_paths)]
+            probed_audio_durations = probe_results[len(video_paths):]
+
+            # Build ONE filter graph for the whole video: per-segment video+audio filters, in-graph concat,
+            # then the subtitle burn. libx264 runs once and no intermediate segment files are written.
+            # Input 2i is segment i's video and input 2i+1 its narration audio
+            print(f"🎬 Building filter graph for {len(video_paths)} video segments with narration...")
+            ffmpeg_inputs = []
+            filter_parts = []
+            concat_inputs = []
             subtitle_data_list = subtitle_paths  # Rename for clarity
             actual_audio_durations = []  # Store ACTUAL probed audio durations for subtitle timing
             cumulative_time = 0.0
@@ -186,40 +503,20 @@ class VideoService:
             for i, (video_path, audio_path, (subtitle_text, phonemes, passed_audio_duration)) in enumerate(
                 zip(video_paths, audio_paths, subtitle_data_list)
             ):
-                segment_path = os.path.join(temp_dir, f"segment_{i}.mp4")
-
-                # Get video duration using ffprobe
-                probe_cmd = [
-                    'ffprobe',
-                    '-v', 'error',
-                    '-show_entries', 'format=duration',
-                    '-of', 'default=noprint_wrappers=1:nokey=1',
-                    video_path
-                ]
-                try:
-                    result = subprocess.run(probe_cmd, check=True, capture_output=True, text=True)
-                    video_duration = float(result.stdout.strip())
-                except:
+                # Get video duration
+                video_duration = probed_video_durations[i]
+                if isinstance(video_duration, Exception):
                     video_duration = 5.0  # Fallback if probe fails
                     print(f"⚠️ Could not probe video duration, using fallback")
 
-                # CRITICAL: Probe ACTUAL audio duration - don't trust passed value!
+                # CRITICAL: Use the ACTUAL probed audio duration - don't trust passed value!
                 # The passed duration might be wrong (e.g., defaulting to 5s)
-                audio_probe_cmd = [
-                    'ffprobe',
-                    '-v', 'error',
-                    '-show_entries', 'format=duration',
-                    '-of', 'default=noprint_wrappers=1:nokey=1',
-                    audio_path
-                ]
-                try:
-                    audio_result = subprocess.run(audio_probe_cmd, check=True, capture_output=True, text=True)
-                    audio_duration = float(audio_result.stdout.strip())
-                    if abs(audio_duration - passed_audio_duration) > 0.5:
-                        print(f"⚠️  Audio duration mismatch! Passed: {passed_audio_duration:.2f}s, Actual: {audio_duration:.2f}s - USING ACTUAL")
-                except:
+                audio_duration = probed_audio_durations[i]
+                if isinstance(audio_duration, Exception):
                     audio_duration = passed_audio_duration  # Fallback to passed value
                     print(f"⚠️ Could not probe audio duration, using passed value: {audio_duration:.2f}s")
+                elif abs(audio_duration - passed_audio_duration) > 0.5:
+                    print(f"⚠️  Audio duration mismatch! Passed: {passed_audio_duration:.2f}s, Actual: {audio_duration:.2f}s - USING ACTUAL")
 
                 print(f"📹 Segment {i+1}: Video={video_duration:.2f}s, Audio={audio_duration:.2f}s (passed: {passed_audio_duration:.2f}s)")
 
@@ -254,21 +551,31 @@ class VideoService:
                     extend_duration = base_duration - video_duration
                     slowdown_factor = base_duration / video_duration
 
-                    if slowdown_factor <= 1.10:
-                        # ≤10% slowdown: Simple setpts (fast, looks fine)
+                    source_fps = None
+                    if 1.25 < slowdown_factor <= 1.5 and base_duration <= 7.0:
+                        try:
+                            source_fps = await self._run_blocking(self._probe_frame_rate, video_path)
+                        except Exception:
+                            print(f"⚠️ Could not probe video frame rate, using simple slowdown")
+
+                    if slowdown_factor <= 1.25 or (slowdown_factor <= 1.5 and base_duration <= 7.0 and not source_fps):
+                        # ≤25% slowdown: Simple setpts (retimes frames, no per-frame filter work, looks fine)
                         video_filters.append(f"setpts=PTS*{slowdown_factor:.4f}")
                         print(f"   🎬 Simple slowdown by {(slowdown_factor-1)*100:.1f}% ({video_duration:.2f}s → {base_duration:.2f}s)")
-                    elif base_duration <= 7.0:
-                        # >10% slowdown AND target ≤ 7s: Use frame blending for smooth slow motion
-                        video_filters.append(f"tblend=all_mode=average,setpts=PTS*{slowdown_factor:.4f}")
-                        print(f"   🎬 Smooth slowdown with frame blending: extending by {extend_duration:.2f}s ({video_duration:.2f}s → {base_duration:.2f}s, {(slowdown_factor-1)*100:.1f}% slower)")
+                    elif slowdown_factor <= 1.5 and base_duration <= 7.0:
+                        # 25-50% slowdown AND target ≤ 7s: motion-compensated interpolation back to the
+                        # source frame rate (no ghosting, unlike frame blending)
+                        video_filters.append(
+                            f"setpts=PTS*{slowdown_factor:.4f},minterpolate=fps={source_fps:.3f}:mi_mode=mci:me_mode=bidir:vsbmc=1"
+                        )
+                        print(f"   🎬 Smooth slowdown with motion interpolation: extending by {extend_duration:.2f}s ({video_duration:.2f}s → {base_duration:.2f}s, {(slowdown_factor-1)*100:.1f}% slower)")
                     else:
-                        # Target > 7 seconds: Use freeze frame at the end
+                        # >50% slowdown or target > 7 seconds: Use freeze frame at the end
                         video_filters.append(f"tpad=stop_mode=clone:stop_duration={extend_duration}")
                         print(f"   🎬 Extending video by {extend_duration:.2f}s with freeze frame to match audio + buffer")
 
                 # Add fade transitions (within base_duration)
-                video_filters.append(f"fade=t=in:st=0:d={FADE_IN_DURATION}")
+                video_filters.append(VIDEO_FADE_IN_FILTER)
                 video_filters.append(f"fade=t=out:st={base_duration-FADE_OUT_DURATION}:d={FADE_OUT_DURATION}")
 
                 # Determine if we need to add pause (not for last segment)
@@ -318,7 +625,7 @@ class VideoService:
                     print(f"   🔇 Padding audio with {pad_to_base:.2f}s silence to match base duration")
 
                 # Step 2: Add gentle audio fade-in only (NO fade-out to preserve TTS)
-                audio_filters.append(f"afade=t=in:st=0:d=0.1")
+                audio_filters.append(AUDIO_FADE_IN_FILTER)
                 print(f"   🔊 Adding gentle audio fade-in (no fade-out to preserve TTS)")
 
                 # Step 3: Add additional pause if needed
@@ -328,119 +635,33 @@ class VideoService:
 
                 audio_filter = ",".join(audio_filters)
 
-                combine_cmd = [
-                    'ffmpeg',
-                    '-i', video_path,
-                    '-i', audio_path,
-                    '-vf', video_filter,
-                    '-af', audio_filter,
-                    '-c:v', 'libx264',
-                    '-c:a', 'aac',
-                    '-y',
-                    segment_path
-                ]
+                ffmpeg_inputs += ['-i', video_path, '-i', audio_path]
+                filter_parts.append(f"[{2 * i}:v:0]{video_filter}[v{i}]")
+                filter_parts.append(f"[{2 * i + 1}:a:0]{audio_filter}[a{i}]")
+                concat_inputs.append(f"[v{i}][a{i}]")
 
-                try:
-                    result = subprocess.run(combine_cmd, check=True, capture_output=True, text=True)
-                    segment_paths.append(segment_path)
-
-                    # CRITICAL: Probe the ACTUAL duration of the created segment
-                    # Don't rely on calculated duration - use what FFmpeg actually created
-                    probe_segment_cmd = [
-                        'ffprobe',
-                        '-v', 'error',
-                        '-show_entries', 'format=duration',
-                        '-of', 'default=noprint_wrappers=1:nokey=1',
-                        segment_path
-                    ]
-
-                    try:
-                        probe_result = subprocess.run(probe_segment_cmd, check=True, capture_output=True, text=True)
-                        actual_segment_duration = float(probe_result.stdout.strip())
-
-                        # Compare calculated vs actual
-                        if abs(actual_segment_duration - segment_duration_with_pause) > 0.01:
-                            print(f"⚠️  Duration mismatch! Calculated: {segment_duration_with_pause:.3f}s, Actual: {actual_segment_duration:.3f}s")
-
-                        # Use ACTUAL duration for timing calculations
-                        segment_durations.append(actual_segment_duration)
-                        print(f"✅ Segment {i+1} created (actual duration: {actual_segment_duration:.3f}s, cumulative: {cumulative_time:.3f}s)")
-                        cumulative_time += actual_segment_duration
-
-                    except Exception as probe_error:
-                        print(f"⚠️  Could not probe segment duration, using calculated: {segment_duration_with_pause:.3f}s")
-                        segment_durations.append(segment_duration_with_pause)
-                        cumulative_time += segment_duration_with_pause
-
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ FFmpeg error creating segment {i}:")
-                    print(f"Command: {' '.join(combine_cmd)}")
-                    print(f"stderr: {e.stderr}")
-                    raise
-
-            # Concatenate all segments (WITHOUT subtitles)
-            print(f"🔗 Concatenating {len(segment_paths)} segments...")
-            concat_file = os.path.join(temp_dir, 'concat_list.txt')
-            with open(concat_file, 'w') as f:
-                for segment_path in segment_paths:
-                    f.write(f"file '{segment_path}'\n")
-
-            concatenated_video = os.path.join(temp_dir, 'concatenated_no_subs.mp4')
-            concat_cmd = [
-                'ffmpeg',
-                '-f', 'concat',
-                '-safe', '0',
-                '-i', concat_file,
-                '-c', 'copy',
-                '-y',
-                concatenated_video
-            ]
+                # Both streams of the segment end exactly at base_duration (+ pause) inside the graph,
+                # and concat follows the longer stream of each segment, so this is the real offset
+                segment_durations.append(segment_duration_with_pause)
+                print(f"✅ Segment {i+1} planned (duration: {segment_duration_with_pause:.3f}s, starts at: {cumulative_time:.3f}s)")
+                cumulative_time += segment_duration_with_pause
 
-            subprocess.run(concat_cmd, check=True, capture_output=True)
-            print(f"✅ Segments concatenated")
+            # Concatenate all segments inside the graph (WITHOUT subtitles)
+            filter_parts.append(f"{''.join(concat_inputs)}concat=n={len(video_paths)}:v=1:a=1[vcat][acat]")
+
+            # Subtitle timings for the concatenated video, computed once for both the SRT and drawtext
+            subtitle_entries = self._build_subtitle_entries(
+                subtitle_data_list, segment_durations, actual_audio_durations, FADE_IN_DURATION
+            )
 
             # Create master SRT file with correct cumulative timings
             print(f"📝 Creating master subtitle file with cumulative timings...")
             master_srt = os.path.join(temp_dir, 'master_subtitles.srt')
-            cumulative_offset = 0.0
-
             with open(master_srt, 'w', encoding='utf-8') as f:
-                for i, (subtitle_text, phonemes, _passed_duration) in enumerate(subtitle_data_list):
-                    segment_duration = segment_durations[i]
-                    # Use ACTUAL probed audio duration, not passed value
-                    audio_duration = actual_audio_durations[i]
-
-                    # Calculate subtitle timing for this segment
-                    # Start: cumulative_offset + fade_in_duration
-                    # End: cumulative_offset + segment_duration (or end of audio if shorter)
-                    if phonemes and isinstance(phonemes, dict):
-                        symbols = phonemes.get("symbols", [])
-                        start_times = phonemes.get("start_times_seconds", [])
-                        durations_list = phonemes.get("durations_seconds", [])
-
-                        if symbols and start_times and durations_list:
-                            # Use phoneme timing
-                            start_time = cumulative_offset + start_times[0] + FADE_IN_DURATION
-                            end_time = cumulative_offset + start_times[-1] + durations_list[-1] + FADE_IN_DURATION
-                        else:
-                            # Fallback
-                            start_time = cumulative_offset + FADE_IN_DURATION
-                            end_time = cumulative_offset + audio_duration
-                    else:
-                        # Simple timing
-                        start_time = cumulative_offset + FADE_IN_DURATION
-                        end_time = cumulative_offset + audio_duration
-
-                    # Write SRT entry
-                    f.write(f"{i+1}\n")
-                    f.write(f"{self._seconds_to_srt_time(start_time)} --> {self._seconds_to_srt_time(end_time)}\n")
-                    f.write(f"{subtitle_text}\n\n")
-
-                    print(f"   Subtitle {i+1}: {start_time:.2f}s - {end_time:.2f}s")
-
-                    # Update cumulative offset for next segment
-                    cumulative_offset += segment_duration
+                f.write(self._format_srt(subtitle_entries))
 
+            for i, (start_time, end_time, _text) in enumerate(subtitle_entries):
+                print(f"   Subtitle {i+1}: {start_time:.2f}s - {end_time:.2f}s")
             print(f"✅ Master subtitle file created")
 
             # Use custom Korean font (양진체)
@@ -448,89 +669,92 @@ class VideoService:
             custom_font_path = os.path.join(base_dir, 'fonts', '양진체v0.93.otf')
 
             if os.path.exists(custom_font_path):
+                font_file = custom_font_path
                 font_param = f":fontfile={custom_font_path}"
                 print(f"🎨 Using custom Korean font: 양진체")
             elif os.path.exists('/System/Library/Fonts/AppleSDGothicNeo.ttc'):
+                font_file = '/System/Library/Fonts/AppleSDGothicNeo.ttc'
                 font_param = ":fontfile=/System/Library/Fonts/AppleSDGothicNeo.ttc"
                 print(f"📝 Using system font: AppleSDGothicNeo")
             else:
+                font_file = None
                 font_param = ":font='Arial Unicode MS'"
                 print(f"⚠️ Using fallback font")
 
-            # Burn master subtitles into final video using drawtext (subtitles filter not available)
-            print(f"🔥 Burning subtitles into final video...")
-
-            # Build drawtext filter chain from SRT entries
-            drawtext_filters = []
-            cumulative_offset = 0.0
-
-            for i, (subtitle_text, phonemes, _passed_duration) in enumerate(subtitle_data_list):
-                segment_duration = segment_durations[i]
-                # Use ACTUAL probed audio duration, not passed value
-                audio_duration = actual_audio_durations[i]
-
-                # Calculate timing (same as SRT creation)
-                if phonemes and isinstance(phonemes, dict):
-                    symbols = phonemes.get("symbols", [])
-                    start_times = phonemes.get("start_times_seconds", [])
-                    durations_list = phonemes.get("durations_seconds", [])
-
-                    if symbols and start_times and durations_list:
-                        start_time = cumulative_offset + start_times[0] + FADE_IN_DURATION
-                        end_time = cumulative_offset + start_times[-1] + durations_list[-1] + FADE_IN_DURATION
-                    else:
-                        start_time = cumulative_offset + FADE_IN_DURATION
-                        end_time = cumulative_offset + audio_duration
-                else:
-                    start_time = cumulative_offset + FADE_IN_DURATION
-                    end_time = cumulative_offset + audio_duration
-
-                # Escape subtitle text for drawtext
-                subtitle_escaped = subtitle_text.replace("'", "'\\\\\\''").replace(":", "\\:")
-
-                # Create drawtext filter with timing
-                # enable='between(t,start,end)' shows text only during specified time range
-                drawtext_filter = (
-                    f"drawtext=text='{subtitle_escaped}'{font_param}:"
-                    f"fontsize=56:fontcolor=white:"
-                    f"shadowcolor=black@0.7:shadowx=3:shadowy=3:"
-                    f"x=(w-text_w)/2:y=h-120:"
-                    f"enable='between(t,{start_time},{end_time})'"
+            print(f"🔥 Rendering final video with subtitles in a single FFmpeg pass...")
+            video_label = "[vcat]"
+
+            if await self._run_blocking(self._has_subtitles_filter):
+                # libass renders every cue from the master SRT in one filter (proper Korean shaping)
+                fonts_dir = f":fontsdir={os.path.dirname(custom_font_path)}" if os.path.exists(custom_font_path) else ""
+                subtitle_filters = [f"subtitles=filename={master_srt}{fonts_dir}:force_style='{SUBTITLE_ASS_STYLE}'"]
+            elif font_file:
+                # No libass: rasterize each cue ONCE with PIL and overlay the image during its window
+                # (drawtext would re-shape the glyphs with freetype on every frame)
+                subtitle_filters = []
+                subtitle_images = await self._run_blocking(
+                    self._render_subtitle_images, subtitle_entries, font_file, temp_dir
                 )
-                drawtext_filters.append(drawtext_filter)
-
-                cumulative_offset += segment_duration
-
-            # Combine all drawtext filters
-            video_filter = ",".join(drawtext_filters)
+                for image_path, (start_time, end_time, _text) in zip(subtitle_images, subtitle_entries):
+                    input_index = len(ffmpeg_inputs) // 2
+                    ffmpeg_inputs += ['-i', image_path]
+                    filter_parts.append(
+                        f"{video_label}[{input_index}:v]overlay=x=(main_w-overlay_w)/2:y=main_h-120:"
+                        f"enable='between(t,{start_time},{end_time})'[sub{input_index}]"
+                    )
+                    video_label = f"[sub{input_index}]"
+            else:
+                # Build drawtext filter chain from SRT entries (this ffmpeg has no libass, no font file for PIL)
+                subtitle_filters = []
+
+                for start_time, end_time, subtitle_text in subtitle_entries:
+                    # Escape subtitle text for drawtext
+                    subtitle_escaped = subtitle_text.replace("'", "'\\\\\\''").replace(":", "\\:")
+
+                    # Create drawtext filter with timing
+                    # enable='between(t,start,end)' shows text only during specified time range
+                    drawtext_filter = (
+                        f"drawtext=text='{subtitle_escaped}'{font_param}:"
+                        f"fontsize=56:fontcolor=white:"
+                        f"shadowcolor=black@0.7:shadowx=3:shadowy=3:"
+                        f"x=(w-text_w)/2:y=h-120:"
+                        f"enable='between(t,{start_time},{end_time})'"
+                    )
+                    subtitle_filters.append(drawtext_filter)
+
+            # Apply the subtitle filters to the concatenated video (plus the upload to GPU memory for VAAPI)
+            encoder_input_args, encoder_filter, encoder_args = H264_ENCODERS[await self._run_blocking(self._h264_encoder)]
+            output_filters = subtitle_filters + ([encoder_filter] if encoder_filter else [])
+            filter_parts.append(f"{video_label}{','.join(output_filters) or 'null'}[vout]")
+            filter_complex = ";".join(filter_parts)
 
             final_output = os.path.join(temp_dir, 'final_video.mp4')
-            burn_subs_cmd = [
+            render_cmd = [
                 'ffmpeg',
-                '-i', concatenated_video,
-                '-vf', video_filter,
-                '-c:v', 'libx264',
-                '-c:a', 'copy',
+                *encoder_input_args,
+                *ffmpeg_inputs,
+                '-filter_complex', filter_complex,
+                '-map', '[vout]',
+                '-map', '[acat]',
+                *encoder_args,
+                '-c:a', 'aac',
                 '-y',
                 final_output
             ]
 
             try:
-                subprocess.run(burn_subs_cmd, check=True, capture_output=True, text=True)
+                await self._run_ffmpeg(render_cmd)
                 print(f"✅ Final video with subtitles created")
             except subprocess.CalledProcessError as e:
-                print(f"❌ FFmpeg error burning subtitles:")
-                print(f"Command: {' '.join(burn_subs_cmd)}")
+                print(f"❌ FFmpeg error rendering final video:")
+                print(f"Command: {' '.join(render_cmd)}")
                 print(f"stderr: {e.stderr}")
                 raise
 
-            # Upload to S3
-            with open(final_output, 'rb') as f:
-                video_data = f.read()
-
+            # Upload to S3 (streamed from disk instead of reading the whole render into memory)
             final_filename = f"final_video_{uuid.uuid4()}.mp4"
-            final_url = self.s3_service.upload_video_data(
-                video_data=video_data,
+            final_url = await self.s3_service.a_upload_video_data(
+                video_data=final_output,
                 filename=final_filename,
                 folder="final_videos",
                 content_type="video/mp4"
@@ -541,5 +765,4 @@ class VideoService:
 
         finally:
             # Cleanup temp files
-            import shutil
             shutil.rmtree(temp_dir, ignore_errors=True)
@@ -1,12 +1,12 @@
-import os
 from celery import Celery
-from dotenv import load_dotenv
+from app.core import config
+from app.core.logging_config import setup_logging
 
-# Load environment variables from .env file (for local development)
-load_dotenv()
+# Queue-backed app.* logging for worker processes
+setup_logging(config.LOG_LEVEL)
 
-# Get Redis URL from environment (Railway will provide this)
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Redis URL from environment (Railway will provide this)
+REDIS_URL = config.REDIS_URL
 
 # Create Celery app
 celery_app = Celery(
@@ -18,14 +18,23 @@ celery_app = Celery(
 
 # Celery configuration
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # msgpack: smaller/faster than JSON for the phoneme timing arrays in task args and results.
+    # JSON is still accepted so messages queued by an older deploy keep working during rollout
+    task_serializer="msgpack",
+    accept_content=["msgpack", "json"],
+    result_serializer="msgpack",
+    result_accept_content=["msgpack", "json"],
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
     task_time_limit=600,  # 10 minutes max per task
     task_soft_time_limit=540,  # 9 minutes soft limit
     worker_prefetch_multiplier=1,  # Process one task at a time
+    worker_concurrency=config.CELERY_CONCURRENCY,  # Worker processes (each runs its own ffmpeg render)
     worker_max_tasks_per_child=50,  # Restart worker after 50 tasks to prevent memory leaks
+    worker_max_memory_per_child=config.CELERY_MAX_MEMORY_PER_CHILD or None,  # ...or once its RSS (KB) passes this
+    task_acks_late=True,  # Ack after the task finishes, so a crashed worker's task is redelivered
+    task_reject_on_worker_lost=True,  # Requeue tasks whose worker process was killed (OOM, SIGKILL)
+    broker_connection_retry_on_startup=True,  # Wait for Redis on boot instead of exiting
+    result_expires=config.CELERY_RESULT_EXPIRES,  # Drop job results from Redis after this many seconds
 )
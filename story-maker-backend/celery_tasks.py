@@ -1,6 +1,4 @@
 import asyncio
-import uuid
-import base64
 from celery_config import celery_app
 from typing import List, Optional, Dict, Any
 
@@ -18,6 +16,23 @@ tts_service = SupertoneTTSService()
 print("✅ celery_tasks.py loaded successfully")
 
 
+def run_async(coro):
+    """
+    asyncio.run() for task bodies. The pooled KIE/OpenAI/Supertone/download connections are bound to the
+    loop asyncio.run creates, so close them cleanly before that loop is torn down.
+    """
+    async def run_and_close():
+        try:
+            return await coro
+        finally:
+            await kie_service.close()
+            await llm_agent.aclose()
+            await tts_service.aclose()
+            await video_service.aclose()
+
+    return asyncio.run(run_and_close())
+
+
 @celery_app.task(bind=True, name="tasks.generate_story_script")
 def generate_story_script_task(
     self,
@@ -97,15 +112,38 @@ def generate_story_script_task(
             meta={"current": 3, "total": 3, "status": "Script Writer creating narration..."}
         )
 
-        # AGENT 2: Write narration based on blueprint
-        script_data = llm_agent.write_scene_narrations(
-            blueprint=blueprint,
-            character_name=character_name,
-            character_type=character_type,
-            character_prompt=character_prompt,
-            personality=personality,
-            language=narration_language
-        )
+        # AGENT 2 + AGENT 2.5 in parallel: both only need the blueprint.
+        # The visual blueprint is built from the same subset the frontend later sends to
+        # /generate-image-prompts, so that task gets it from the LLM cache instead of waiting on it.
+        visual_story_blueprint = {
+            "scene_blueprints": blueprint.get("scene_blueprints", []),
+            "side_characters": blueprint.get("side_characters", [])
+        }
+
+        async def write_narrations_and_visual_blueprint():
+            return await asyncio.gather(
+                llm_agent.a_write_scene_narrations(
+                    blueprint=blueprint,
+                    character_name=character_name,
+                    character_type=character_type,
+                    character_prompt=character_prompt,
+                    personality=personality,
+                    language=narration_language
+                ),
+                llm_agent.a_create_visual_blueprint(
+                    story_blueprint=visual_story_blueprint,
+                    style=style
+                ),
+                return_exceptions=True
+            )
+
+        script_data, visual_blueprint = run_async(write_narrations_and_visual_blueprint())
+
+        # The narration is required; the visual blueprint is only a head start for the image prompts task
+        if isinstance(script_data, Exception):
+            raise script_data
+        if isinstance(visual_blueprint, Exception):
+            print(f"⚠️ Visual blueprint prefetch failed, image prompts will build it: {visual_blueprint}")
 
         print(f"✅ Narration completed: {script_data.get('story_title', 'Untitled')}")
 
@@ -163,7 +201,7 @@ def generate_single_video_task(
                 cfg_scale=0.5
             )
 
-        video_url = asyncio.run(generate())
+        video_url = run_async(generate())
 
         print(f"✅ Video generated successfully: {video_url}")
 
@@ -255,7 +293,7 @@ def generate_videos_task(
 
             return results
 
-        video_urls = asyncio.run(generate_all_videos())
+        video_urls = run_async(generate_all_videos())
 
         successful_count = len([v for v in video_urls if v])
         print(f"✅ All videos generated: {successful_count}/{total_videos} successful")
@@ -304,7 +342,7 @@ def generate_final_video_task(
                 phonemes_list=phonemes_list,
                 durations=durations
             )
-        final_url = asyncio.run(combine_videos())
+        final_url = run_async(combine_videos())
 
         total_duration = sum(durations)
 
@@ -363,7 +401,7 @@ def generate_character_images_task(
                 for prompt in char_prompts
             ])
 
-        image_urls = asyncio.run(generate_images())
+        image_urls = run_async(generate_images())
 
         # Format as character options
         characters = [
@@ -432,7 +470,7 @@ def generate_character_from_upload_task(
                 for prompt in char_prompts
             ])
 
-        image_urls = asyncio.run(generate_variations())
+        image_urls = run_async(generate_variations())
 
         # Format as character options
         characters = [
@@ -515,7 +553,7 @@ def generate_single_scene_image_task(
                     image_size="16:9"
                 )
 
-        image_url = asyncio.run(generate())
+        image_url = run_async(generate())
 
         print(f"✅ Scene {scene_number} image generated successfully: {image_url}")
 
@@ -637,7 +675,7 @@ def generate_scene_images_task(
 
             return results
 
-        image_urls = asyncio.run(generate_all_scenes())
+        image_urls = run_async(generate_all_scenes())
 
         return {
             "scene_images": image_urls,
@@ -677,8 +715,8 @@ def generate_side_character_images_task(
             try:
                 print(f"👤 Generating image for {character['name']} ({character['type']})...")
 
-                # Use LLM agent to create detailed prompt
-                prompt = llm_agent.create_side_character_image_prompt(
+                # Use LLM agent to create detailed prompt (async so all characters share the agent's semaphore)
+                prompt = await llm_agent.a_create_side_character_image_prompt(
                     character_name=character["name"],
                     character_type=character["type"],
                     character_description=character["description"],
@@ -726,7 +764,7 @@ def generate_side_character_images_task(
             tasks = [generate_single_character(i, char) for i, char in enumerate(side_characters)]
             return await asyncio.gather(*tasks)
 
-        character_images = asyncio.run(generate_all_characters())
+        character_images = run_async(generate_all_characters())
 
         return {
             "character_images": character_images,
@@ -910,8 +948,9 @@ def generate_single_narration_task(
         )
 
         async def generate():
-            # Generate speech using Supertone
-            result = await tts_service.generate_speech(
+            # Generate speech using Supertone (identical requests reuse the stored S3 audio)
+            result = await tts_service.generate_speech_to_s3(
+                s3_service,
                 text=scene_text,
                 language=language,
                 voice_id=voice_id,
@@ -919,18 +958,7 @@ def generate_single_narration_task(
                 output_format="mp3",
                 include_phonemes=include_phonemes
             )
-
-            # Decode base64 to bytes for S3 upload
-            audio_bytes = base64.b64decode(result["audio_base64"])
-
-            # Upload to S3
-            audio_filename = f"narration_scene{scene_number}_{uuid.uuid4()}.mp3"
-            audio_url = s3_service.upload_audio_data(
-                audio_data=audio_bytes,
-                filename=audio_filename,
-                folder="narrations",
-                content_type="audio/mpeg"
-            )
+            audio_url = result["audio_url"]
 
             print(f"✅ Scene {scene_number} narration uploaded to S3: {audio_url}")
 
@@ -956,7 +984,7 @@ def generate_single_narration_task(
 
             return response_data
 
-        result = asyncio.run(generate())
+        result = run_async(generate())
 
         return result
 
@@ -995,8 +1023,9 @@ def generate_narrations_task(
                 scene_number = scene_data.get("scene_number", index + 1)
                 script_text = scene_data.get("script_text", "")
 
-                # Generate speech using Supertone
-                result = await tts_service.generate_speech(
+                # Generate speech using Supertone (identical requests reuse the stored S3 audio)
+                result = await tts_service.generate_speech_to_s3(
+                    s3_service,
                     text=script_text,
                     language=language,
                     voice_id=voice_id,
@@ -1004,31 +1033,10 @@ def generate_narrations_task(
                     output_format="mp3",
                     include_phonemes=include_phonemes
                 )
-
-                # Decode base64 to bytes for S3 upload
-                audio_bytes = base64.b64decode(result["audio_base64"])
-
-                # Upload to S3
-                audio_filename = f"narration_scene{scene_number}_{uuid.uuid4()}.mp3"
-                audio_url = s3_service.upload_audio_data(
-                    audio_data=audio_bytes,
-                    filename=audio_filename,
-                    folder="narrations",
-                    content_type="audio/mpeg"
-                )
+                audio_url = result["audio_url"]
 
                 print(f"✅ Scene {scene_number} narration uploaded to S3")
 
-                # Update progress
-                self.update_state(
-                    state="PROGRESS",
-                    meta={
-                        "current": index + 1,
-                        "total": total_scenes,
-                        "status": f"Generated narration {index + 1}/{total_scenes}"
-                    }
-                )
-
                 # Calculate duration from phonemes if available
                 duration = None
                 if "phonemes" in result and result["phonemes"]:
@@ -1048,23 +1056,44 @@ def generate_narrations_task(
                 if "phonemes" in result and result["phonemes"]:
                     response_data["phonemes"] = result["phonemes"]
 
-                return response_data
+                return (index, response_data)
 
             except Exception as e:
                 print(f"❌ Error generating narration for scene {scene_data.get('scene_number', index + 1)}: {e}")
-                return {
+                return (index, {
                     "audio_url": "",
                     "content_type": "audio/mpeg",
                     "format": "mp3",
                     "status": f"Failed: {str(e)}"
-                }
+                })
 
-        # Generate all narrations
+        # Generate all narrations: each scene uploads as soon as its own TTS returns, so S3 uploads
+        # overlap the remaining Supertone calls instead of running as a second phase
         async def generate_all():
+            results = [None] * total_scenes
+            completed = 0
+
             tasks = [generate_single_narration(scene, idx) for idx, scene in enumerate(scenes)]
-            return await asyncio.gather(*tasks)
 
-        narrations = asyncio.run(generate_all())
+            # Process results as they complete (scenes finish out of order)
+            for coro in asyncio.as_completed(tasks):
+                index, narration = await coro
+                results[index] = narration
+                completed += 1
+
+                # Update progress
+                self.update_state(
+                    state="PROGRESS",
+                    meta={
+                        "current": completed,
+                        "total": total_scenes,
+                        "status": f"Generated narration {completed}/{total_scenes}"
+                    }
+                )
+
+            return results
+
+        narrations = run_async(generate_all())
 
         successful_count = sum(1 for n in narrations if n.get("audio_url"))
         print(f"✅ Batch narration complete: {successful_count}/{total_scenes} successful")
@@ -3,14 +3,16 @@ import time
 import uuid
 import shutil
 import asyncio
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import requests
 
-from app.agents.llm_agent import llm_agent
+from app.core import config
+from app.core.logging_config import setup_logging
+from app.agents.llm_agent import LLMAgent, get_llm_agent
 from app.services.kie_service import kie_service
 from app.services.s3_service import s3_service
 from app.services.tts_service import SupertoneTTSService
@@ -25,6 +27,9 @@ from celery.result import AsyncResult
 from app.database import init_db, close_db
 from app.routers.projects import router as projects_router
 
+# Queue-backed app.* logging (log I/O happens on a background thread)
+setup_logging(config.LOG_LEVEL)
+
 # --- CONSTANTS ---
 TEMP_VIDEO_DIR = "temp_videos"
 TEMP_UPLOAD_DIR = "temp_uploads"
@@ -214,6 +219,11 @@ async def lifespan(app: FastAPI):
     print("🛑 Shutting down...")
     await close_db()
     print("✅ Database connection closed")
+    await kie_service.close()
+    await get_llm_agent().aclose()
+    if tts_service:
+        await tts_service.aclose()
+    print("✅ HTTP sessions closed")
 
 app = FastAPI(lifespan=lifespan, title="Story Maker API")
 
@@ -435,7 +445,7 @@ async def upload_character_image(file: UploadFile = File(...)):
         content_type = file.content_type or "image/png"
 
         # Upload to S3
-        character_url = s3_service.upload_image(
+        character_url = await s3_service.a_upload_image(
             file_bytes=content,
             file_name=s3_filename,
             content_type=content_type
@@ -448,6 +458,27 @@ async def upload_character_image(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class CharacterUploadUrlRequest(BaseModel):
+    filename: str
+    content_type: Optional[str] = "image/png"
+
+@app.post("/api/character/upload-url")
+async def create_character_upload_url(request: CharacterUploadUrlRequest):
+    """Presign a direct browser-to-S3 upload for a character image (skips proxying the file through this server)"""
+    try:
+        file_extension = os.path.splitext(request.filename)[1] or ".png"
+        s3_filename = f"uploads/characters/{uuid.uuid4()}{file_extension}"
+        content_type = request.content_type or "image/png"
+
+        return {
+            "upload_url": s3_service.presign_upload(s3_filename, content_type),
+            "character_url": s3_service.public_url(s3_filename),
+            "content_type": content_type,
+            "status": "PUT the file to upload_url with this Content-Type, then use character_url"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Note: Uploaded images are now served directly from S3, no local serving needed
 
 # ===== STEP 4B: Generate Character Variations from Uploaded Image =====
@@ -504,14 +535,14 @@ class StyleConversionResponse(BaseModel):
     status: str
 
 @app.post("/api/character/convert-style", response_model=StyleConversionResponse)
-async def convert_uploaded_image_style(request: StyleConversionRequest):
+async def convert_uploaded_image_style(request: StyleConversionRequest, agent: LLMAgent = Depends(get_llm_agent)):
     """
     Convert an uploaded character image to match the selected art style.
     This ensures consistency between uploaded photos and AI-generated backgrounds.
     """
     try:
         # Generate style conversion prompt using LLM
-        conversion_prompt = llm_agent.create_style_conversion_prompt(request.style)
+        conversion_prompt = agent.create_style_conversion_prompt(request.style)
 
         print(f"🎨 Style conversion prompt: {conversion_prompt}")
 
@@ -862,8 +893,9 @@ async def generate_narration(request: NarrationRequest):
 
         print(f"🎙️  Generating narration for text: {request.scene_text[:50]}...")
 
-        # Generate speech using Supertone
-        result = await tts_service.generate_speech(
+        # Generate speech using Supertone (identical requests reuse the stored S3 audio)
+        result = await tts_service.generate_speech_to_s3(
+            s3_service,
             text=request.scene_text,
             language=request.language,
             voice_id=request.voice_id,
@@ -871,21 +903,7 @@ async def generate_narration(request: NarrationRequest):
             output_format="mp3",
             include_phonemes=request.include_phonemes
         )
-
-        print(f"✅ Narration generated successfully")
-
-        # Decode base64 to bytes for S3 upload
-        import base64
-        audio_bytes = base64.b64decode(result["audio_base64"])
-
-        # Upload to S3
-        audio_filename = f"narration_{uuid.uuid4()}.mp3"
-        audio_url = s3_service.upload_audio_data(
-            audio_data=audio_bytes,
-            filename=audio_filename,
-            folder="narrations",
-            content_type="audio/mpeg"
-        )
+        audio_url = result["audio_url"]
 
         print(f"✅ Narration uploaded to S3: {audio_url}")
 
@@ -0,0 +1,42 @@
+"""
+Migration script to add lookup indexes to existing databases.
+
+Run this script once (new databases get them from init_db):
+  python -m migrations.add_indexes
+
+New indexes:
+  - ix_projects_created_at: projects(created_at DESC) for list_projects
+  - ix_scenes_project_number: scenes(project_id, scene_number) for scene lookups
+"""
+
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core import config
+
+DATABASE_URL = config.DATABASE_URL
+
+async def migrate():
+    """Create the indexes if they don't exist yet."""
+    engine = create_async_engine(DATABASE_URL, echo=True)
+
+    async with engine.begin() as conn:
+        # Add ix_projects_created_at index
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_projects_created_at
+            ON projects (created_at DESC)
+        """))
+        print("✅ Added ix_projects_created_at index")
+
+        # Add ix_scenes_project_number index
+        await conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_scenes_project_number
+            ON scenes (project_id, scene_number)
+        """))
+        print("✅ Added ix_scenes_project_number index")
+
+    await engine.dispose()
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
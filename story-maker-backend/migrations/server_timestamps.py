@@ -0,0 +1,43 @@
+"""
+Migration script to move timestamp defaults into the database.
+
+Run this script once on existing databases (new ones get the defaults from init_db):
+  python -m migrations.server_timestamps
+
+Changed defaults:
+  - projects.created_at, projects.updated_at: timezone('utc', now())
+  - scenes.created_at: timezone('utc', now())
+"""
+
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core import config
+
+DATABASE_URL = config.DATABASE_URL
+
+async def migrate():
+    """Set server-side defaults on the timestamp columns."""
+    engine = create_async_engine(DATABASE_URL, echo=True)
+
+    async with engine.begin() as conn:
+        # projects timestamps
+        await conn.execute(text("""
+            ALTER TABLE projects
+            ALTER COLUMN created_at SET DEFAULT timezone('utc', now()),
+            ALTER COLUMN updated_at SET DEFAULT timezone('utc', now())
+        """))
+        print("✅ Set projects.created_at / updated_at defaults")
+
+        # scenes timestamp
+        await conn.execute(text("""
+            ALTER TABLE scenes
+            ALTER COLUMN created_at SET DEFAULT timezone('utc', now())
+        """))
+        print("✅ Set scenes.created_at default")
+
+    await engine.dispose()
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,37 @@
+"""
+Configure the S3 bucket lifecycle so unfinished multipart uploads are cleaned up
+
+A failed upload is aborted by the transfer manager, but a worker killed mid-upload
+(OOM, deploy, SIGKILL) leaves its parts behind; this rule lets S3 discard them.
+Existing lifecycle rules are preserved.
+
+Usage:
+    python scripts/configure_bucket_lifecycle.py [days]
+"""
+
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+env_path = Path(__file__).parent.parent / '.env'
+load_dotenv(env_path)
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.s3_service import s3_service
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+
+    print(f"🪣 Bucket: {s3_service.bucket_name}")
+    if s3_service.ensure_multipart_cleanup_rule(days):
+        print(f"✅ Incomplete multipart uploads will be aborted after {days} day(s)")
+    else:
+        print("✅ Lifecycle rule already present, nothing to do")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,6 @@ and upload them to S3 in the voice_previews folder
 import os
 import sys
 import asyncio
-import base64
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -32,11 +31,11 @@ async def generate_preview(tts_service, voice_id, display_name, preview_script):
             text=preview_script,
             language="ko",
             voice_id=voice_id,
-            output_format="mp3"
+            output_format="mp3",
+            return_bytes=True
         )
 
-        # Decode base64 audio
-        audio_data = base64.b64decode(result["audio_base64"])
+        audio_data = result["audio_bytes"]
 
         print(f"✅ Generated {len(audio_data)} bytes for {display_name}")
         return audio_data
@@ -54,7 +53,7 @@ async def upload_to_s3(audio_data, display_name):
 
         # Upload to S3 in voice_previews folder
         print(f"📤 Uploading {filename} to S3...")
-        url = s3_service.upload_audio_data(
+        url = await s3_service.a_upload_audio_data(
             audio_data=audio_data,
             filename=filename,
             folder="voice_previews"
@@ -15,12 +15,9 @@ fi
 echo "Starting Celery worker..."
 # Suppress root user warning in containerized environments
 export C_FORCE_ROOT=true
-# Use --pool=solo to run tasks in the main worker process (prevents zombie processes)
-# Use --max-tasks-per-child=50 to restart worker after 50 tasks (prevents memory leaks)
+# Concurrency and per-child recycling come from celery_config.py (CELERY_CONCURRENCY etc.)
 celery -A celery_config.celery_app worker \
     --loglevel=info \
-    --concurrency=2 \
-    --max-tasks-per-child=50 \
     --pool=prefork &
 
 # Store the Celery PID